@@ -2,7 +2,7 @@ import logging
 
 from django.core.exceptions import ValidationError
 
-from rdmo.core.imports import get_value_from_treenode
+from rdmo.core.imports import ImportRegistry, get_value_from_treenode
 from rdmo.domain.models import Attribute
 from rdmo.options.models import Option
 from rdmo.core.utils import get_ns_map, get_ns_tag, get_uri
@@ -13,9 +13,12 @@ from .validators import ConditionUniqueKeyValidator
 log = logging.getLogger(__name__)
 
 
-def import_conditions(conditions_node):
+def import_conditions(conditions_node, registry=None):
     log.info('Importing conditions')
-    nsmap = get_ns_map(conditions_node.getroot())
+    nsmap = get_ns_map(conditions_node)
+
+    if registry is None:
+        registry = ImportRegistry()
 
     for condition_node in conditions_node.findall('condition'):
         condition_uri = get_uri(condition_node, nsmap)
@@ -33,26 +36,22 @@ def import_conditions(conditions_node):
         condition.comment = get_value_from_treenode(condition_node, get_ns_tag('dc:comment', nsmap))
         condition.relation = get_value_from_treenode(condition_node, 'relation')
 
-        try:
-            # condition_source = get_value_from_treenode(condition_node, 'source', 'attrib')
-            # source_uri = str(condition_source[get_ns_tag('dc:uri', nsmap)])
-            source_node = condition_node.find('source')
-            source_uri = source_node.get(get_ns_tag('dc:uri', nsmap))
-            condition.source = Attribute.objects.get(uri=source_uri)
-        except (AttributeError, Attribute.DoesNotExist):
-            condition.source = None
+        source_node = condition_node.find('source')
+        if source_node is not None:
+            condition.source_id = registry.get(Attribute, source_node.get(get_ns_tag('dc:uri', nsmap)))
+        else:
+            condition.source_id = None
 
         if get_value_from_treenode(condition_node, 'target_text') != '':
             condition.target_text = get_value_from_treenode(condition_node, 'target_text')
         else:
             condition.target_text = None
 
-        try:
-            target_option_node = condition_node.find('target_option')
-            target_option_uri = target_option_node.get(get_ns_tag('dc:uri', nsmap))
-            condition.target_option = Option.objects.get(uri=target_option_uri)
-        except (AttributeError, Option.DoesNotExist):
-            condition.target_option = None
+        target_option_node = condition_node.find('target_option')
+        if target_option_node is not None:
+            condition.target_option_id = registry.get(Option, target_option_node.get(get_ns_tag('dc:uri', nsmap)))
+        else:
+            condition.target_option_id = None
 
         try:
             ConditionUniqueKeyValidator(condition).validate()
@@ -62,3 +61,4 @@ def import_conditions(conditions_node):
         else:
             log.info('Condition saving to "' + str(condition_uri) + '"')
             condition.save()
+            registry.add(Condition, condition.uri, condition.pk)
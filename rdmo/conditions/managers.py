@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class ConditionQuerySet(models.QuerySet):
+
+    def resolve_all(self, project, snapshot=None):
+        return self.model.resolve_conditions(self.select_related('source'), project, snapshot)
+
+
+class ConditionManager(models.Manager):
+
+    def get_queryset(self):
+        return ConditionQuerySet(self.model, using=self._db)
+
+    def resolve_all(self, project, snapshot=None):
+        return self.get_queryset().resolve_all(project, snapshot)
@@ -6,12 +6,15 @@ from django.utils.translation import ugettext_lazy as _
 
 from rdmo.core.utils import get_uri_prefix
 
+from .managers import ConditionManager
 from .validators import ConditionUniqueKeyValidator
 
 
 @python_2_unicode_compatible
 class Condition(models.Model):
 
+    objects = ConditionManager()
+
     RELATION_EQUAL = 'eq'
     RELATION_NOT_EQUAL = 'neq'
     RELATION_CONTAINS = 'contains'
@@ -109,9 +112,31 @@ class Condition(models.Model):
         return get_uri_prefix(self) + '/conditions/' + self.key
 
     def resolve(self, project, snapshot=None):
-        # get the values for the given project, the given snapshot and the condition's attribute
-        values = project.values.filter(snapshot=snapshot).filter(attribute=self.source)
+        return self.resolve_conditions([self], project, snapshot)[self.id]
+
+    @classmethod
+    def resolve_conditions(cls, conditions, project, snapshot=None):
+        conditions = list(conditions)
+
+        # get the values for the given project, the given snapshot and the conditions' attributes
+        # in one query and put them in a dict labled by the values attribute id
+        values_dict = {}
+        source_ids = set([condition.source_id for condition in conditions if condition.source_id])
+        if source_ids:
+            for value in project.values.filter(snapshot=snapshot).filter(attribute__in=source_ids):
+                if value.attribute_id not in values_dict:
+                    values_dict[value.attribute_id] = []
+
+                values_dict[value.attribute_id].append(value)
+
+        # evaluate all conditions in memory
+        results = {}
+        for condition in conditions:
+            results[condition.id] = condition.resolve_values(values_dict.get(condition.source_id, []))
+
+        return results
 
+    def resolve_values(self, values):
         if self.relation == self.RELATION_EQUAL:
             return self._resolve_equal(values)
 
@@ -146,8 +171,8 @@ class Condition(models.Model):
         results = []
 
         for value in values:
-            if self.target_option:
-                results.append(value.option == self.target_option)
+            if self.target_option_id:
+                results.append(value.option_id == self.target_option_id)
             else:
                 results.append(value.text == self.target_text)
 
@@ -209,7 +234,7 @@ class Condition(models.Model):
     def _resolve_not_empty(self, values):
 
         for value in values:
-            if bool(value.text) or bool(value.option):
+            if bool(value.text) or bool(value.option_id):
                 return True
 
         return False
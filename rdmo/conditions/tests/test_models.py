@@ -0,0 +1,40 @@
+from django.test import TestCase
+
+from rdmo.projects.models import Project
+
+from ..models import Condition
+
+
+class ConditionsModelTestCase(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'conditions.json',
+        'domain.json',
+        'options.json',
+        'questions.json',
+        'projects.json',
+    )
+
+    project_id = 1
+
+
+class ConditionTests(ConditionsModelTestCase):
+
+    def test_resolve_all(self):
+        project = Project.objects.get(pk=self.project_id)
+
+        results = Condition.objects.resolve_all(project)
+
+        self.assertEqual(set(results.keys()), set(Condition.objects.values_list('id', flat=True)))
+        for condition in Condition.objects.all():
+            self.assertEqual(results[condition.id], condition.resolve(project), msg=('condition', condition.key))
+
+    def test_resolve_all_num_queries(self):
+        project = Project.objects.get(pk=self.project_id)
+
+        # one query for the conditions and one for the values
+        with self.assertNumQueries(2):
+            Condition.objects.resolve_all(project)
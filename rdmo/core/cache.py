@@ -0,0 +1,130 @@
+import time
+
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from rest_framework_extensions.cache.decorators import CacheResponse
+from rest_framework_extensions.cache.mixins import BaseCacheResponseMixin
+from rest_framework_extensions.key_constructor.bits import KeyBitBase
+from rest_framework_extensions.key_constructor.constructors import DefaultObjectKeyConstructor
+
+GENERATION_CACHE_KEY = 'generation_%s'
+HITS_CACHE_KEY = 'metrics_%s_hits'
+MISSES_CACHE_KEY = 'metrics_%s_misses'
+
+
+def get_generations(names, cache_alias='api'):
+    '''
+    Returns the current generation for each of the given names. Cached entries, which include
+    a generation in their key, are invalidated by bumping the generation.
+    '''
+    cache = caches[cache_alias]
+    keys = [GENERATION_CACHE_KEY % name for name in names]
+
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # start with a timestamp so that an evicted generation does not collide with older generations
+            cache.add(key, int(time.time() * 1000000), None)
+            generations[key] = cache.get(key)
+
+    return [generations[key] for key in keys]
+
+
+def bump_generations(names, cache_alias='api'):
+    cache = caches[cache_alias]
+
+    for name in names:
+        key = GENERATION_CACHE_KEY % name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000000), None)
+
+
+def get_cache_metrics(name, cache_alias='api'):
+    cache = caches[cache_alias]
+
+    hits = cache.get(HITS_CACHE_KEY % name, 0)
+    misses = cache.get(MISSES_CACHE_KEY % name, 0)
+    requests = hits + misses
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': (float(hits) / requests) if requests else None
+    }
+
+
+def reset_cache_metrics(name, cache_alias='api'):
+    caches[cache_alias].delete_many([HITS_CACHE_KEY % name, MISSES_CACHE_KEY % name])
+
+
+def count_cache_metrics(name, hit, cache_alias='api'):
+    cache = caches[cache_alias]
+    key = (HITS_CACHE_KEY if hit else MISSES_CACHE_KEY) % name
+
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+class GenerationCacheResponse(CacheResponse):
+
+    def process_cache_response(self, view_instance, view_method, request, args, kwargs):
+        key = self.calculate_key(view_instance=view_instance, view_method=view_method,
+                                 request=request, args=args, kwargs=kwargs)
+
+        response = self.cache.get(key)
+        count_cache_metrics(view_instance.get_cache_metrics_name(), bool(response))
+
+        if not response:
+            response = view_method(view_instance, request, *args, **kwargs)
+            response = view_instance.finalize_response(request, response, *args, **kwargs)
+            response.render()
+
+            if not response.status_code >= 400 or self.cache_errors:
+                self.cache.set(key, (response.rendered_content, response.status_code, response._headers), self.timeout)
+        else:
+            content, status, headers = response
+            response = HttpResponse(content=content, status=status)
+            response._headers = headers
+
+        if not hasattr(response, '_closable_objects'):
+            response._closable_objects = []
+
+        return response
+
+
+class GenerationKeyBit(KeyBitBase):
+
+    def get_data(self, params, view_instance, view_method, request, args, kwargs):
+        return get_generations(view_instance.get_cache_generation_names())
+
+
+class GenerationObjectKeyConstructor(DefaultObjectKeyConstructor):
+    generations = GenerationKeyBit()
+
+
+class RetrieveGenerationCacheResponseMixin(BaseCacheResponseMixin):
+    '''
+    Caches the response of retrieve like RetrieveCacheResponseMixin, but the cache key includes
+    the generations returned by get_cache_generation_names(), so that the cached responses can be
+    invalidated selectively using bump_generations(). The names are computed for every request
+    before the cache is checked, so they should not need the database.
+    '''
+
+    object_cache_key_func = GenerationObjectKeyConstructor()
+
+    @GenerationCacheResponse(key_func='object_cache_key_func')
+    def retrieve(self, request, *args, **kwargs):
+        return super(RetrieveGenerationCacheResponseMixin, self).retrieve(request, *args, **kwargs)
+
+    def get_cache_generation_names(self):
+        # by default, all responses of the viewset share one generation
+        return [self.__class__.__name__]
+
+    def get_cache_metrics_name(self):
+        return self.__class__.__name__
@@ -1,6 +1,226 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 import xml.dom.minidom
 
+import pypandoc
+
+from django.conf import settings
+from django.utils.encoding import force_bytes, force_text
+
+from .cache import count_cache_metrics, get_cache_metrics
+
+log = logging.getLogger(__name__)
+
+EXPORT_JOB_FILENAME = 'job.json'
+EXPORT_ERROR_FILENAME = 'error'
+EXPORT_DOCUMENT_FILENAME = 'document.%s'
+EXPORT_CACHE_METRICS_NAME = 'export_documents'
+
+# the pool of worker processes, it is created lazily and (re-)created in every process which uses it,
+# so EXPORT_MAX_WORKERS limits the conversions per web process, the lock guards the creation of the pool
+# against concurrent requests in threaded servers
+export_pool = None
+export_pool_pid = None
+export_pool_lock = threading.Lock()
+
 
 def prettify_xml(xmlstring):
     xmlobj = xml.dom.minidom.parseString(xmlstring)
     return xmlobj.toprettyxml()
+
+
+def get_export_pool():
+    global export_pool, export_pool_pid
+
+    with export_pool_lock:
+        if export_pool is None or export_pool_pid != os.getpid():
+            export_pool = multiprocessing.Pool(processes=settings.EXPORT_MAX_WORKERS)
+            export_pool_pid = os.getpid()
+
+    return export_pool
+
+
+def get_export_job_path(job_id):
+    return os.path.join(settings.EXPORT_JOBS_ROOT, job_id)
+
+
+def convert_document(html, format, args, outputfile):
+    log.info("Exporting " + format + " document using args " + str(args))
+    pypandoc.convert_text(html, format, format='html', outputfile=outputfile, extra_args=args)
+
+
+def run_export_job(job_path, html, format, args, cache_key=None):
+    '''
+    Converts the html in a worker process. The document is written to a temporary file first and
+    renamed when the conversion is finished, so that a job is never seen with a partial document.
+    '''
+    document_path = os.path.join(job_path, EXPORT_DOCUMENT_FILENAME % format)
+    tmp_path = document_path + '.tmp'
+
+    try:
+        convert_document(html, format, args, tmp_path)
+        os.rename(tmp_path, document_path)
+
+        if cache_key is not None:
+            cache_document(cache_key, document_path)
+    except Exception as e:
+        with open(os.path.join(job_path, EXPORT_ERROR_FILENAME), 'w') as f:
+            f.write(str(e))
+
+
+def submit_export_job(user, html, format, args, title, content_disposition, cache_key=None):
+    cleanup_export_jobs()
+
+    job_id = uuid.uuid4().hex
+    job_path = get_export_job_path(job_id)
+    os.makedirs(job_path)
+
+    with open(os.path.join(job_path, EXPORT_JOB_FILENAME), 'w') as f:
+        json.dump({
+            'user': user.pk,
+            'format': format,
+            'title': force_text(title),
+            'content_disposition': force_text(content_disposition)
+        }, f)
+
+    get_export_pool().apply_async(run_export_job, (job_path, html, format, args, cache_key))
+
+    return job_id
+
+
+def get_export_job(job_id):
+    job_path = get_export_job_path(job_id)
+
+    try:
+        with open(os.path.join(job_path, EXPORT_JOB_FILENAME)) as f:
+            job = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    job['id'] = job_id
+    job['document_path'] = os.path.join(job_path, EXPORT_DOCUMENT_FILENAME % job['format'])
+
+    error_path = os.path.join(job_path, EXPORT_ERROR_FILENAME)
+    if os.path.exists(job['document_path']):
+        job['status'] = 'finished'
+    elif os.path.exists(error_path):
+        job['status'] = 'failed'
+        with open(error_path) as f:
+            job['error'] = f.read()
+    else:
+        job['status'] = 'pending'
+
+    return job
+
+
+def cleanup_export_jobs():
+    # remove the jobs which are older than EXPORT_JOBS_MAX_AGE
+    try:
+        job_ids = os.listdir(settings.EXPORT_JOBS_ROOT)
+    except OSError:
+        return
+
+    max_mtime = time.time() - settings.EXPORT_JOBS_MAX_AGE
+    for job_id in job_ids:
+        job_path = get_export_job_path(job_id)
+        try:
+            if os.path.getmtime(job_path) < max_mtime:
+                shutil.rmtree(job_path)
+        except OSError:
+            pass
+
+
+def get_export_cache_key(html, format, args, refdoc=None):
+    '''
+    Returns the key of a converted document in the cache of exports, which is the hash of everything
+    the conversion depends on: the html, the format, the arguments for pandoc and the reference document.
+    '''
+    sha = hashlib.sha256()
+    sha.update(force_bytes(html))
+    sha.update(b'\0' + force_bytes(format))
+    sha.update(b'\0' + force_bytes(json.dumps(args)))
+
+    if refdoc is not None:
+        with open(refdoc, 'rb') as f:
+            sha.update(b'\0' + f.read())
+
+    return sha.hexdigest()
+
+
+def get_cached_document(cache_key):
+    if not settings.EXPORT_CACHE_MAX_SIZE:
+        return None
+
+    cache_path = os.path.join(settings.EXPORT_CACHE_ROOT, cache_key)
+
+    try:
+        with open(cache_path, 'rb') as f:
+            file_content = f.read()
+
+        # the modification time is used as the time of the last access for the LRU eviction
+        os.utime(cache_path, None)
+    except (IOError, OSError):
+        log.debug('Export cache miss for %s', cache_key)
+        count_cache_metrics(EXPORT_CACHE_METRICS_NAME, False, cache_alias='default')
+        return None
+
+    log.debug('Export cache hit for %s', cache_key)
+    count_cache_metrics(EXPORT_CACHE_METRICS_NAME, True, cache_alias='default')
+    return file_content
+
+
+def cache_document(cache_key, document_path):
+    if not settings.EXPORT_CACHE_MAX_SIZE:
+        return
+
+    try:
+        os.makedirs(settings.EXPORT_CACHE_ROOT)
+    except OSError:
+        pass
+
+    # copy to a temporary file first, so that other processes never read a partial document
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=settings.EXPORT_CACHE_ROOT, suffix='.tmp')
+    os.close(tmp_fd)
+    shutil.copyfile(document_path, tmp_path)
+    os.rename(tmp_path, os.path.join(settings.EXPORT_CACHE_ROOT, cache_key))
+
+    evict_cached_documents()
+
+
+def evict_cached_documents():
+    # remove the least recently used documents until the cache fits in EXPORT_CACHE_MAX_SIZE
+    entries = []
+    for file_name in os.listdir(settings.EXPORT_CACHE_ROOT):
+        if file_name.endswith('.tmp'):
+            continue
+
+        try:
+            stat = os.stat(os.path.join(settings.EXPORT_CACHE_ROOT, file_name))
+        except OSError:
+            continue
+
+        entries.append((stat.st_mtime, stat.st_size, file_name))
+
+    size = sum(entry[1] for entry in entries)
+    for mtime, file_size, file_name in sorted(entries):
+        if size <= settings.EXPORT_CACHE_MAX_SIZE:
+            break
+
+        try:
+            os.remove(os.path.join(settings.EXPORT_CACHE_ROOT, file_name))
+        except OSError:
+            pass
+
+        size -= file_size
+
+
+def get_export_cache_metrics():
+    return get_cache_metrics(EXPORT_CACHE_METRICS_NAME, cache_alias='default')
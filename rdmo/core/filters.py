@@ -0,0 +1,73 @@
+from datetime import datetime, time
+
+from django.db.models import Q
+
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.encoding import force_text
+from django.utils.timezone import get_current_timezone, is_naive, make_aware
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class UpdatedAfterFilterBackend(BaseFilterBackend):
+    '''
+    Filters a queryset for the rows whose updated timestamp is later than the (ISO 8601) date or
+    datetime in the updated_after query parameter, e.g. to fetch only the rows which were created or
+    changed since the last request. Deleted rows are not reported. A view can check further timestamps
+    using updated_after_fields, e.g. the creation of the snapshot of copied values.
+    '''
+
+    updated_after_query_param = 'updated_after'
+    updated_after_query_description = _('Only return the rows whose updated timestamp is later than this '
+                                        'date/datetime. Deleted rows are not reported.')
+
+    def filter_queryset(self, request, queryset, view):
+        updated_after = request.query_params.get(self.updated_after_query_param)
+        if not updated_after:
+            return queryset
+
+        updated_after = self.parse_updated_after(updated_after)
+
+        q = Q()
+        for field_name in getattr(view, 'updated_after_fields', ('updated', )):
+            q |= Q(**{field_name + '__gt': updated_after})
+
+        return queryset.filter(q)
+
+    def parse_updated_after(self, value):
+        try:
+            updated_after = parse_datetime(value)
+            if updated_after is None:
+                date = parse_date(value)
+                if date is not None:
+                    updated_after = datetime.combine(date, time.min)
+        except ValueError:
+            updated_after = None
+
+        if updated_after is None:
+            raise ValidationError({
+                self.updated_after_query_param: [_('Enter a valid date/datetime.')]
+            })
+
+        if is_naive(updated_after):
+            updated_after = make_aware(updated_after, get_current_timezone())
+
+        return updated_after
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, 'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, 'coreschema must be installed to use `get_schema_fields()`'
+        return [
+            coreapi.Field(
+                name=self.updated_after_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Updated after',
+                    description=force_text(self.updated_after_query_description)
+                )
+            )
+        ]
@@ -1,7 +1,7 @@
 import logging
-import time
 import defusedxml.ElementTree as ET
-from random import randint
+from defusedxml import DefusedXmlException
+from xml.etree.ElementTree import ElementTree
 
 log = logging.getLogger(__name__)
 
@@ -45,30 +45,85 @@ def get_value_from_treenode(xml_node, element, what_to_get=None):
     return r
 
 
-def generate_tempfile_name():
-    t = int(round(time.time() * 1000))
-    r = randint(10000, 99999)
-    fn = '/tmp/upload_' + str(t) + '_' + str(r) + '.xml'
-    return fn
+def validate_xml(source, max_size=None):
+    '''
+    Parses an XML file (a path or a file object, e.g. an uploaded file) incrementally into a tree.
+    The namespace map is taken from the start-ns events and stored with the tree (see get_ns_map),
+    files larger than max_size are rejected before parsing.
+    '''
+    if not check_size(source, max_size):
+        return None, None
 
+    nsmap = {}
+    try:
+        parser = ET.iterparse(source, events=('start-ns', ))
+        for event, element in parser:
+            prefix, uri = element
+            nsmap[prefix] = uri
+    except Exception as e:
+        log.error('Xml parsing error: ' + str(e))
+        return None, None
+
+    tree = ElementTree(parser.root)
+    tree.nsmap = nsmap
+    return tree.getroot().tag, tree
 
-def handle_uploaded_file(filedata):
-    tempfilename = generate_tempfile_name()
-    with open(tempfilename, 'wb+') as destination:
-        for chunk in filedata.chunks():
-            destination.write(chunk)
-    return tempfilename
 
+def get_xml_roottag(source, max_size=None):
+    # only the first start event is parsed, so that large files can be imported incrementally
+    if not check_size(source, max_size):
+        return None
 
-def validate_xml(tempfilename):
-    tree = None
-    roottag = None
     try:
-        tree = ET.parse(tempfilename)
-    except Exception as e:
+        for event, element in ET.iterparse(source, events=('start', )):
+            return element.tag
+    except (ET.ParseError, DefusedXmlException) as e:
+        # the error is passed on, so that the caller can report its cause
         log.error('Xml parsing error: ' + str(e))
-        pass
+        raise
+    finally:
+        # file objects are rewound, so that they can be parsed again by the importer
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+
+def check_size(source, max_size):
+    # uploaded files know their size, files given by a path are not limited
+    size = getattr(source, 'size', None)
+    if max_size and size is not None and size > max_size:
+        log.error('Xml parsing error: The file has %i bytes, only %i bytes are allowed.', size, max_size)
+        return False
     else:
-        root = tree.getroot()
-        roottag = root.tag
-    return roottag, tree
+        return True
+
+
+class ImportRegistry(object):
+    '''
+    Maps the uris of the elements of the imported models to their primary keys. The dict for a model is
+    loaded from the database when it is first used and updated by the importers, so that an import of several
+    files resolves the references to elements from earlier files without further queries.
+    '''
+
+    def __init__(self):
+        self.uris = {}
+        self.deferred = {}
+
+    def get_uris(self, model):
+        if model not in self.uris:
+            self.uris[model] = dict(model.objects.values_list('uri', 'pk'))
+        return self.uris[model]
+
+    def get(self, model, uri):
+        return self.get_uris(model).get(uri)
+
+    def add(self, model, uri, pk):
+        # a dict which is not loaded yet will contain the element when it is loaded
+        if model in self.uris:
+            self.uris[model][uri] = pk
+
+        for callback in self.deferred.pop((model, uri), []):
+            callback(pk)
+
+    def defer(self, model, uri, callback):
+        # the element is not imported yet, the callback is called with its pk once it is added
+        self.deferred.setdefault((model, uri), []).append(callback)
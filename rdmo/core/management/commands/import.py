@@ -1,10 +1,15 @@
-import io
 import logging
+import os
+import time
 
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from rdmo.core.imports import validate_xml
+from defusedxml import DefusedXmlException
+from defusedxml.ElementTree import ParseError
+
+from rdmo.core.imports import ImportRegistry, get_xml_roottag, validate_xml
 from rdmo.conditions.imports import import_conditions
 from rdmo.domain.imports import import_domain
 from rdmo.options.imports import import_options
@@ -15,38 +20,81 @@ from rdmo.views.imports import import_views
 
 log = logging.getLogger(__name__)
 
+# the files are imported in this order, so that the references between the elements can be resolved:
+# the conditions need the attributes and options, the catalogs and tasks need the attributes and the
+# conditions, the projects need everything, the conditions of attributes/entities are linked once the
+# conditions are imported (see ImportRegistry.defer)
+IMPORT_ORDER = ('options', 'domain', 'conditions', 'catalog', 'tasks', 'views', 'project')
+
+IMPORTERS = {
+    'options': import_options,
+    'domain': import_domain,
+    'conditions': import_conditions,
+    'catalog': import_catalog,
+    'tasks': import_tasks,
+    'views': import_views
+}
+
 
 class Command(BaseCommand):
 
     def add_arguments(self, parser):
-        parser.add_argument('xmlfile', action='store', default=False, help='RDMO XML export file')
+        parser.add_argument('xmlfiles', nargs='+', help='RDMO XML export files or directories containing them')
         parser.add_argument('--user', action='store', default=False, help='RDMO username for this import')
 
     def handle(self, *args, **options):
+        xmlfiles = []
+        for xmlfile in self.get_xmlfiles(options['xmlfiles']):
+            try:
+                roottag = get_xml_roottag(xmlfile)
+            except (ParseError, DefusedXmlException) as e:
+                raise CommandError('%s is not a valid XML file: %s' % (xmlfile, e))
+
+            if roottag not in IMPORT_ORDER:
+                raise CommandError('%s is not a valid RDMO XML file.' % xmlfile)
+
+            xmlfiles.append((IMPORT_ORDER.index(roottag), xmlfile, roottag))
 
-            roottag, xmltree = validate_xml(options['xmlfile'])
+        user = None
+        if any(roottag == 'project' for _, _, roottag in xmlfiles):
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError('Give a valid username using --user.')
 
-            if roottag == 'conditions':
-                import_conditions(xmltree)
+        # the registry is shared between the files, so that later files resolve the
+        # references to the elements of earlier files without further queries
+        registry = ImportRegistry()
 
-            elif roottag == 'options':
-                import_options(xmltree)
+        start = time.time()
+        with transaction.atomic():
+            for _, xmlfile, roottag in sorted(xmlfiles):
+                file_start = time.time()
 
-            elif roottag == 'domain':
-                import_domain(xmltree)
+                if roottag == 'project':
+                    # projects are parsed incrementally by import_project
+                    import_project(xmlfile, user, registry)
+                else:
+                    roottag, xmltree = validate_xml(xmlfile)
+                    IMPORTERS[roottag](xmltree, registry)
 
-            elif roottag == 'catalog':
-                import_catalog(xmltree)
+                if options['verbosity'] > 0:
+                    self.stdout.write('%s (%s): %.3fs' % (xmlfile, roottag, time.time() - file_start))
 
-            elif roottag == 'tasks':
-                import_tasks(xmltree)
+        # the references to elements which are in none of the files could not be linked
+        for model, uri in sorted(registry.deferred, key=lambda key: (key[0].__name__, key[1])):
+            log.info('%s import failed: %s does not exist' % (model.__name__, uri))
 
-            elif roottag == 'views':
-                import_views(xmltree)
+        if options['verbosity'] > 0:
+            self.stdout.write('Imported %i files (%.3fs).' % (len(xmlfiles), time.time() - start))
 
-            elif roottag == 'project':
-                try:
-                    user = User.objects.get(username=options['user'])
-                except User.DoesNotExist:
-                    raise CommandError('Give a valid username using --user.')
-                import_project(xmltree, user)
+    def get_xmlfiles(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for file_name in sorted(files):
+                        if file_name.endswith('.xml'):
+                            yield os.path.join(root, file_name)
+            else:
+                yield path
@@ -1,53 +1,77 @@
-from lxml import objectify
+import time
 
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import caches
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils.timezone import now
 
 from rdmo.conditions.models import Condition
 from rdmo.options.models import OptionSet, Option
 from rdmo.domain.models import AttributeEntity
+from rdmo.questions.managers import bump_structure_version
 from rdmo.questions.models import Catalog, Section, Subsection, QuestionEntity
 from rdmo.tasks.models import Task
 from rdmo.views.models import View
 
+# the models with the part of the uri after the prefix and the field which completes the uri,
+# the paths are kept up to date when the elements are saved, so that they can be used here
+MODELS = (
+    (Condition, '/conditions/', 'key'),
+    (OptionSet, '/options/', 'key'),
+    (Option, '/options/', 'path'),
+    (AttributeEntity, '/domain/', 'path'),
+    (Catalog, '/questions/', 'key'),
+    (Section, '/questions/', 'path'),
+    (Subsection, '/questions/', 'path'),
+    (QuestionEntity, '/questions/', 'path'),
+    (Task, '/tasks/', 'key'),
+    (View, '/views/', 'key')
+)
+
 
 class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('uri_prefix', action='store', help='URI prefix to be used for all elements.')
+        parser.add_argument('--dry-run', action='store_true', default=False,
+                            help='Only report the number of elements which would be updated.')
 
     def handle(self, *args, **options):
-
-        for obj in Condition.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in OptionSet.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in Option.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in AttributeEntity.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in Catalog.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in Section.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in Subsection.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in QuestionEntity.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in Task.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-        for obj in View.objects.all():
-            self._set_uri_prefix(obj, options['uri_prefix'])
-
-    def _set_uri_prefix(self, obj, uri_prefix):
-        obj.uri_prefix = uri_prefix
-        obj.save()
+        uri_prefix = options['uri_prefix']
+
+        # the uri uses the prefix like get_uri_prefix does
+        base_uri = uri_prefix.rstrip('/') if uri_prefix else settings.DEFAULT_URI_PREFIX
+
+        start = time.time()
+        with transaction.atomic():
+            for model, uri_path, field_name in MODELS:
+                model_start = time.time()
+                queryset = model.objects.all()
+
+                if options['dry_run']:
+                    count = queryset.count()
+                else:
+                    updates = {
+                        'uri_prefix': uri_prefix,
+                        'uri': Concat(Value(base_uri + uri_path), F(field_name))
+                    }
+                    if any(field.name == 'updated' for field in model._meta.get_fields()):
+                        updates['updated'] = now()
+
+                    count = queryset.update(**updates)
+
+                self.stdout.write('%s: %i elements (%.3fs)' % (
+                    model._meta.verbose_name_plural, count, time.time() - model_start
+                ))
+
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing was updated (%.3fs).' % (time.time() - start))
+        else:
+            # the updates do not send signals, so the caches are invalidated once for all elements
+            bump_structure_version()
+            caches['api'].clear()
+
+            self.stdout.write('Set URI prefix to %s (%.3fs).' % (uri_prefix, time.time() - start))
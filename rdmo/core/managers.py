@@ -0,0 +1,50 @@
+import threading
+import uuid
+
+from django.core.signals import request_finished, request_started
+from django.db import models
+
+# the versions which were fetched during the current request of each thread, so that a version is
+# fetched once per request, outside of requests (e.g. in management commands) it is fetched on every access
+request_versions = threading.local()
+
+
+def start_request_versions(**kwargs):
+    request_versions.values = {}
+
+
+def finish_request_versions(**kwargs):
+    request_versions.values = None
+
+
+request_started.connect(start_request_versions)
+request_finished.connect(finish_request_versions)
+
+
+class VersionManager(models.Manager):
+
+    def get_version(self, *names):
+        values = getattr(request_versions, 'values', None)
+
+        if values is None or any(name not in values for name in names):
+            # the versions are stored in the database, so that all processes see the same version,
+            # a name which was never bumped has the empty version
+            versions = dict(self.filter(name__in=names).values_list('name', 'value'))
+            versions = dict((name, versions.get(name, '')) for name in names)
+
+            if values is not None:
+                values.update(versions)
+        else:
+            versions = values
+
+        return '_'.join(versions[name] for name in names)
+
+    def bump_version(self, name):
+        # a random value is used instead of a counter, so that a version which was rolled back
+        # together with a transaction is never used again for different content
+        value = uuid.uuid4().hex
+        self.update_or_create(name=name, defaults={'value': value})
+
+        values = getattr(request_versions, 'values', None)
+        if values is not None:
+            values[name] = value
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 05:13
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Version',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The name of this version.', max_length=64, unique=True, verbose_name='Name')),
+                ('value', models.CharField(help_text='The current value of this version.', max_length=32, verbose_name='Value')),
+            ],
+            options={
+                'verbose_name': 'Version',
+                'verbose_name_plural': 'Versions',
+            },
+        ),
+    ]
@@ -1,12 +1,15 @@
 from __future__ import unicode_literals
 
 from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
 from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import get_language
 
 from rdmo.core.exceptions import RDMOException
 
+from .managers import VersionManager
+
 
 class Model(models.Model):
 
@@ -34,3 +37,31 @@ class TranslationMixin(object):
             return getattr(self, field + '_de')
         else:
             raise RDMOException('Language is not supported.')
+
+
+@python_2_unicode_compatible
+class Version(models.Model):
+    '''
+    A named version of content which is derived from many rows (e.g. the structure of the catalogs),
+    used to invalidate caches and stored renderings in all processes.
+    '''
+
+    objects = VersionManager()
+
+    name = models.CharField(
+        max_length=64, unique=True,
+        verbose_name=_('Name'),
+        help_text=_('The name of this version.')
+    )
+    value = models.CharField(
+        max_length=32,
+        verbose_name=_('Value'),
+        help_text=_('The current value of this version.')
+    )
+
+    class Meta:
+        verbose_name = _('Version')
+        verbose_name_plural = _('Versions')
+
+    def __str__(self):
+        return '%s / %s' % (self.name, self.value)
@@ -0,0 +1,119 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_text
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    '''
+    Paginates a queryset ordered by (updated, id). The cursor is the position of the last element of
+    the previous page, so that every page is fetched using one range query on (updated, id), regardless
+    of how many pages came before it. Elements which are updated while a client walks through the pages
+    move to the end and are returned again, so that nothing is missed.
+    '''
+
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 10000
+
+    cursor_query_param = 'cursor'
+    cursor_query_description = _('The pagination cursor value.')
+    page_size_query_description = _('Number of results to return per page.')
+    invalid_cursor_message = _('Invalid cursor')
+
+    ordering = ('updated', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            updated, pk = position
+            queryset = queryset.filter(Q(updated__gt=updated) | Q(updated=updated, id__gt=pk))
+
+        # one more element is fetched to find out if there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def encode_cursor(self, instance):
+        position = '%s|%s' % (instance.updated.isoformat(), instance.pk)
+        return force_text(b64encode(position.encode('ascii')))
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+
+        try:
+            updated, pk = force_text(b64decode(cursor.encode('ascii'))).split('|')
+            updated, pk = parse_datetime(updated), int(pk)
+        except (TypeError, ValueError, UnicodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if updated is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return updated, pk
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, 'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, 'coreschema must be installed to use `get_schema_fields()`'
+        return [
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Cursor',
+                    description=force_text(self.cursor_query_description)
+                )
+            ),
+            coreapi.Field(
+                name=self.page_size_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.Integer(
+                    title='Page size',
+                    description=force_text(self.page_size_query_description)
+                )
+            )
+        ]
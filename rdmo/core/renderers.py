@@ -6,6 +6,40 @@ from django.utils.encoding import smart_text
 from rest_framework.renderers import BaseRenderer
 
 
+class IndentedXMLGenerator(SimplerXMLGenerator):
+    '''
+    Writes every element on a new line, indented according to its depth,
+    so that the output does not need to be prettified afterwards.
+    '''
+
+    indent = '    '
+
+    def __init__(self, *args, **kwargs):
+        SimplerXMLGenerator.__init__(self, *args, **kwargs)
+        self._depth = 0
+        self._has_children = False
+
+    def startElement(self, name, attrs):
+        if self._depth > 0:
+            self.ignorableWhitespace('\n' + self.indent * self._depth)
+
+        SimplerXMLGenerator.startElement(self, name, attrs)
+        self._depth += 1
+        self._has_children = False
+
+    def endElement(self, name):
+        self._depth -= 1
+        if self._has_children:
+            self.ignorableWhitespace('\n' + self.indent * self._depth)
+
+        SimplerXMLGenerator.endElement(self, name)
+        self._has_children = True
+
+    def endDocument(self):
+        self.ignorableWhitespace('\n')
+        SimplerXMLGenerator.endDocument(self)
+
+
 class BaseXMLRenderer(BaseRenderer):
 
     media_type = 'application/xml'
@@ -24,6 +58,28 @@ class BaseXMLRenderer(BaseRenderer):
         xml.endDocument()
         return stream.getvalue()
 
+    def stream(self, data, chunk_size=65536):
+        '''
+        Renders the document incrementally and yields chunks of about chunk_size characters,
+        render_stream needs to be implemented as a generator which yields after each part.
+        '''
+        stream = StringIO()
+
+        xml = IndentedXMLGenerator(stream, "utf-8")
+        xml.startDocument()
+        for _ in self.render_stream(xml, data):
+            if stream.tell() >= chunk_size:
+                yield self.flush_stream(stream)
+
+        xml.endDocument()
+        yield self.flush_stream(stream)
+
+    def flush_stream(self, stream):
+        chunk = stream.getvalue()
+        stream.seek(0)
+        stream.truncate(0)
+        return chunk
+
     def render_text_element(self, xml, tag, attrs, text):
         # remove None values from attrs
         attrs = dict((key, value) for key, value in attrs.items() if value)
@@ -35,3 +91,7 @@ class BaseXMLRenderer(BaseRenderer):
 
     def render_document(self, xml, data):
         pass
+
+    def render_stream(self, xml, data):
+        self.render_document(xml, data)
+        yield
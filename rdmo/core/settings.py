@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from django.utils.translation import ugettext_lazy as _
 
 INSTALLED_APPS = [
@@ -148,6 +151,7 @@ REST_FRAMEWORK = {
 }
 
 REST_FRAMEWORK_EXTENSIONS = {
+    'DEFAULT_USE_CACHE': 'api',
     'DEFAULT_CACHE_RESPONSE_TIMEOUT': 60
 }
 
@@ -176,6 +180,23 @@ EXPORT_FORMATS = (
     ('tex', _('LaTeX'))
 )
 
+# number of worker processes for the conversion of exports, 0 converts within the request. the pool
+# is created lazily in every web process which converts exports, so the limit applies per process
+# (the total is this number times the number of processes). the pool forks the web process, which
+# should use worker processes rather than threads (e.g. gunicorn sync workers), otherwise set it to 0.
+EXPORT_MAX_WORKERS = 2
+EXPORT_JOBS_ROOT = os.path.join(tempfile.gettempdir(), 'rdmo_exports')
+EXPORT_JOBS_MAX_AGE = 24 * 60 * 60
+
+# size of the cache for converted exports in bytes, 0 disables the cache
+EXPORT_CACHE_MAX_SIZE = 256 * 1024 * 1024
+EXPORT_CACHE_ROOT = os.path.join(tempfile.gettempdir(), 'rdmo_export_cache')
+
+# maximum size of uploaded XML files in bytes, the elements (e.g. a domain) are parsed into a tree,
+# projects are parsed incrementally and can therefore be larger
+IMPORT_MAX_SIZE = 10 * 1024 * 1024
+IMPORT_PROJECT_MAX_SIZE = 100 * 1024 * 1024
+
 DEFAULT_URI_PREFIX = 'http://example.com/terms'
 
 VENDOR_CDN = True
@@ -110,7 +110,11 @@ class TestImportManageMixin(TestMixin):
         except AttributeError:
             call_command('import', self.import_file, stdout=out, stderr=err)
 
-        self.assertFalse(out.getvalue())
+        # only the timings of the file and of the whole import are written to stdout
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith(self.import_file))
+        self.assertTrue(lines[1].startswith('Imported 1 files'))
         self.assertFalse(err.getvalue())
 
     def assert_logfile(self, logfile):
@@ -1,4 +1,9 @@
+import os
 import re
+import sys
+import time
+from contextlib import contextmanager
+from unittest import skipUnless
 
 from django.test import Client
 from django.contrib.auth.models import User
@@ -16,6 +21,39 @@ def get_super_client():
     return client
 
 
+def benchmark(test_case):
+    '''
+    Marks a test case as benchmark, which is skipped unless the RDMO_BENCHMARKS environment variable
+    is set, e.g. RDMO_BENCHMARKS=1 python testing/runtests.py rdmo.projects
+    '''
+    return skipUnless(os.environ.get('RDMO_BENCHMARKS'), 'set RDMO_BENCHMARKS to run the benchmarks')(test_case)
+
+
+@contextmanager
+def measure(label):
+    '''
+    Writes the time needed for the block to stdout, along with the peak memory where tracemalloc is available.
+    '''
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+
+    if tracemalloc:
+        tracemalloc.start()
+
+    start = time.time()
+    try:
+        yield
+    finally:
+        message = '\n%s: %.3fs' % (label, time.time() - start)
+        if tracemalloc:
+            message += ', %.1f MB peak' % (tracemalloc.get_traced_memory()[1] / 1e6)
+            tracemalloc.stop()
+
+        sys.stdout.write(message)
+
+
 def sanitize_xml(xmldata):
     xmldata = xmldata.decode('utf-8')
     xmldata = re.sub('(\n|\t)', '', xmldata)
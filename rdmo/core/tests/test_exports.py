@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from django.utils import translation
+
+from rdmo.accounts.utils import set_group_permissions
+
+from ..cache import reset_cache_metrics
+from ..exports import (
+    EXPORT_CACHE_METRICS_NAME,
+    cache_document,
+    get_cached_document,
+    get_export_cache_key,
+    get_export_cache_metrics
+)
+
+
+class ExportCacheTests(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'domain.json',
+    )
+
+    def setUp(self):
+        translation.activate('en')
+        set_group_permissions()
+        reset_cache_metrics(EXPORT_CACHE_METRICS_NAME, cache_alias='default')
+
+        self.tmp_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            EXPORT_MAX_WORKERS=0,
+            EXPORT_JOBS_ROOT=os.path.join(self.tmp_root, 'jobs'),
+            EXPORT_CACHE_ROOT=os.path.join(self.tmp_root, 'cache'),
+            EXPORT_CACHE_MAX_SIZE=1024 * 1024
+        )
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.tmp_root)
+
+    def create_document(self, content):
+        path = os.path.join(self.tmp_root, 'document')
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_export(self):
+        ''' A repeated export is returned from the cache. '''
+
+        self.client.login(username='admin', password='admin')
+        url = reverse('domain_export', args=['rtf'])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # the converted document is stored in the cache
+        cache_keys = os.listdir(os.path.join(self.tmp_root, 'cache'))
+        self.assertEqual(len(cache_keys), 1)
+        self.assertEqual(get_export_cache_metrics(), {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
+
+        cached_response = self.client.get(url)
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cached_response['Content-Disposition'], response['Content-Disposition'])
+        self.assertEqual(os.listdir(os.path.join(self.tmp_root, 'cache')), cache_keys)
+        self.assertEqual(get_export_cache_metrics(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_export_job(self):
+        ''' A cached export does not need an export job. '''
+
+        self.client.login(username='admin', password='admin')
+        url = reverse('domain_export', args=['rtf'])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        with override_settings(EXPORT_MAX_WORKERS=1):
+            cached_response = self.client.get(url)
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_cache_key(self):
+        ''' The cache key depends on the html, the format, the arguments and the reference document. '''
+
+        refdoc = self.create_document(b'refdoc')
+        cache_key = get_export_cache_key('<p>test</p>', 'docx', [], refdoc)
+
+        self.assertEqual(cache_key, get_export_cache_key('<p>test</p>', 'docx', [], refdoc))
+        self.assertNotEqual(cache_key, get_export_cache_key('<p>test2</p>', 'docx', [], refdoc))
+        self.assertNotEqual(cache_key, get_export_cache_key('<p>test</p>', 'odt', [], refdoc))
+        self.assertNotEqual(cache_key, get_export_cache_key('<p>test</p>', 'docx', ['--toc'], refdoc))
+        self.assertNotEqual(cache_key, get_export_cache_key('<p>test</p>', 'docx', [], None))
+
+        self.create_document(b'changed refdoc')
+        self.assertNotEqual(cache_key, get_export_cache_key('<p>test</p>', 'docx', [], refdoc))
+
+    def test_eviction(self):
+        ''' The least recently used documents are evicted when the cache is full. '''
+
+        with override_settings(EXPORT_CACHE_MAX_SIZE=250):
+            for i, cache_key in enumerate(['a', 'b', 'c']):
+                cache_document(cache_key, self.create_document(b'x' * 100))
+                os.utime(os.path.join(self.tmp_root, 'cache', cache_key), (i, i))
+
+            # 'a' was evicted when 'c' was stored, accessing 'b' makes 'd' evict 'c'
+            self.assertIsNone(get_cached_document('a'))
+            self.assertIsNotNone(get_cached_document('b'))
+
+            cache_document('d', self.create_document(b'x' * 100))
+            self.assertIsNone(get_cached_document('c'))
+            self.assertIsNotNone(get_cached_document('b'))
+            self.assertIsNotNone(get_cached_document('d'))
@@ -0,0 +1,60 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from defusedxml.ElementTree import ParseError
+
+from ..imports import get_xml_roottag, validate_xml
+from ..utils import get_ns_map
+
+
+class ImportTests(TestCase):
+
+    import_file = 'testing/xml/domain.xml'
+
+    def get_uploaded_file(self):
+        with open(self.import_file, 'rb') as f:
+            return SimpleUploadedFile('domain.xml', f.read(), content_type='text/xml')
+
+    def test_validate_xml(self):
+        roottag, xmltree = validate_xml(self.get_uploaded_file())
+
+        self.assertEqual(roottag, 'domain')
+        self.assertEqual(xmltree.getroot().tag, 'domain')
+
+        # the namespace map is taken from the parser
+        self.assertEqual(xmltree.nsmap, {'dc': 'http://purl.org/dc/elements/1.1/'})
+        self.assertEqual(get_ns_map(xmltree), xmltree.nsmap)
+        self.assertEqual(get_ns_map(xmltree.getroot()), xmltree.nsmap)
+
+    def test_validate_xml_path(self):
+        roottag, xmltree = validate_xml(self.import_file)
+
+        self.assertEqual(roottag, 'domain')
+        self.assertEqual(xmltree.nsmap, {'dc': 'http://purl.org/dc/elements/1.1/'})
+
+    def test_validate_xml_max_size(self):
+        uploaded_file = self.get_uploaded_file()
+
+        self.assertEqual(validate_xml(uploaded_file, uploaded_file.size - 1), (None, None))
+        self.assertEqual(validate_xml(uploaded_file, uploaded_file.size)[0], 'domain')
+
+    def test_validate_xml_error(self):
+        uploaded_file = SimpleUploadedFile('domain.xml', b'<domain><entity></domain>', content_type='text/xml')
+
+        self.assertEqual(validate_xml(uploaded_file), (None, None))
+
+    def test_get_xml_roottag(self):
+        uploaded_file = self.get_uploaded_file()
+
+        self.assertEqual(get_xml_roottag(uploaded_file), 'domain')
+        self.assertIsNone(get_xml_roottag(uploaded_file, uploaded_file.size - 1))
+
+        # the uploaded file can be parsed again after the root tag was read
+        self.assertEqual(validate_xml(uploaded_file)[0], 'domain')
+
+    def test_get_xml_roottag_error(self):
+        uploaded_file = SimpleUploadedFile('domain.xml', b'not xml', content_type='text/xml')
+
+        # the parsing error is passed on to the caller
+        with self.assertRaises(ParseError):
+            get_xml_roottag(uploaded_file)
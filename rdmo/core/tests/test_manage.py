@@ -0,0 +1,163 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+
+from rdmo.core.management.commands.set_uri_prefix import MODELS
+from rdmo.core.testing.utils import benchmark, measure
+from rdmo.conditions.models import Condition
+from rdmo.domain.models import AttributeEntity, Attribute
+from rdmo.options.models import OptionSet
+from rdmo.projects.models import Project
+from rdmo.questions.models import Catalog, Section, Subsection, Question, QuestionEntity
+from rdmo.tasks.models import Task
+from rdmo.views.models import View
+
+
+class SetUriPrefixTestCase(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'conditions.json',
+        'domain.json',
+        'options.json',
+        'questions.json',
+        'tasks.json',
+        'views.json',
+    )
+
+    uri_prefix = 'http://example.org/terms/'
+
+    def create_questions(self, count):
+        subsection = Subsection.objects.first()
+        for i in range(count):
+            Question(subsection=subsection, key='question_%i' % i, text_en='', text_de='', widget_type='text').save()
+
+    def assert_uris(self):
+        # the uris are the same as the ones built when the elements are saved, questions in
+        # question sets are left out, since QuestionEntity.save() does not know their parent
+        querysets = (Catalog.objects.all(), Section.objects.all(), Subsection.objects.all(),
+                     QuestionEntity.objects.filter(question__parent=None))
+        for queryset in querysets:
+            for instance in queryset[:20]:
+                uri = instance.uri
+                instance.save()
+                self.assertEqual(queryset.model.objects.get(pk=instance.pk).uri, uri)
+
+
+class SetUriPrefixTests(SetUriPrefixTestCase):
+
+    def test_set_uri_prefix(self):
+        stdout = StringIO()
+        call_command('set_uri_prefix', self.uri_prefix, stdout=stdout)
+
+        for model, uri_path, field_name in MODELS:
+            self.assertIn('%s:' % model._meta.verbose_name_plural, stdout.getvalue())
+
+            for instance in model.objects.all():
+                self.assertEqual(instance.uri_prefix, self.uri_prefix)
+                self.assertEqual(instance.uri, 'http://example.org/terms' + uri_path + getattr(instance, field_name))
+
+    def test_set_uri_prefix_dry_run(self):
+        uris = {model: list(model.objects.order_by('pk').values_list('uri', flat=True)) for model, _, _ in MODELS}
+
+        stdout = StringIO()
+        call_command('set_uri_prefix', self.uri_prefix, dry_run=True, stdout=stdout)
+
+        for model, uri_path, field_name in MODELS:
+            self.assertIn('%s: %i elements' % (model._meta.verbose_name_plural, model.objects.count()), stdout.getvalue())
+            self.assertEqual(list(model.objects.order_by('pk').values_list('uri', flat=True)), uris[model])
+
+    def test_set_uri_prefix_num_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            call_command('set_uri_prefix', self.uri_prefix, stdout=StringIO())
+        self.assert_uris()
+
+        # the number of queries does not depend on the number of elements
+        self.create_questions(20)
+        with self.assertNumQueries(len(context)):
+            call_command('set_uri_prefix', 'http://example.net/terms/', stdout=StringIO())
+        self.assert_uris()
+
+
+@benchmark
+class SetUriPrefixBenchmarks(SetUriPrefixTestCase):
+
+    def test_set_uri_prefix(self):
+        self.create_questions(1000)
+
+        with measure('set_uri_prefix with %i question entities' % QuestionEntity.objects.count()):
+            call_command('set_uri_prefix', self.uri_prefix, stdout=StringIO())
+
+        self.assert_uris()
+
+
+class ImportTests(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+    )
+
+    import_path = 'testing/xml'
+
+    def test_import_directory(self):
+        stdout = StringIO()
+        call_command('import', self.import_path, user='admin', stdout=stdout)
+
+        # the files are imported in the order of their dependencies
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual([line.split()[1] for line in lines[:-1]], [
+            '(options):', '(domain):', '(conditions):', '(catalog):', '(tasks):', '(views):', '(project):'
+        ])
+        self.assertEqual(lines[-1].split('(')[0], 'Imported 7 files ')
+
+        for model in (OptionSet, AttributeEntity, Condition, Catalog, QuestionEntity, Task, View, Project):
+            self.assertTrue(model.objects.exists())
+
+        # the references to the elements of earlier files are resolved
+        self.assertFalse(Condition.objects.filter(source=None).exists())
+        self.assertEqual(QuestionEntity.objects.exclude(attribute_entity=None).count(),
+                         QuestionEntity.objects.count())
+        self.assertTrue(Project.objects.get().values.exists())
+
+        # the conditions of attributes/entities are linked once the conditions are imported
+        self.assertEqual(AttributeEntity.conditions.through.objects.count(), 14)
+
+    def test_import_files(self):
+        xmlfiles = [self.import_path + '/' + file_name for file_name in ('conditions.xml', 'domain.xml', 'options.xml')]
+        call_command('import', *xmlfiles, verbosity=0)
+
+        self.assertEqual(Attribute.objects.get(path='conditions/source/options').optionsets.count(), 1)
+        self.assertFalse(Condition.objects.filter(source=None).exists())
+
+    def test_import_output(self):
+        # the timings are written by default and suppressed with --verbosity 0
+        stdout = StringIO()
+        call_command('import', self.import_path + '/options.xml', stdout=stdout)
+
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0].split()[:2], [self.import_path + '/options.xml', '(options):'])
+        self.assertEqual(lines[1].split('(')[0], 'Imported 1 files ')
+
+        stdout = StringIO()
+        call_command('import', self.import_path + '/options.xml', verbosity=0, stdout=stdout)
+
+        self.assertFalse(stdout.getvalue())
+
+    def test_import_invalid_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import', self.import_path + '/conditions.xml', 'README.rst', verbosity=0)
+
+        self.assertFalse(Condition.objects.exists())
+
+    def test_import_project_without_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import', self.import_path, verbosity=0)
+
+        self.assertFalse(OptionSet.objects.exists())
@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from ..managers import finish_request_versions, start_request_versions
+from ..models import Version
+
+
+class VersionManagerTests(TestCase):
+
+    def test_get_version(self):
+        self.assertEqual(Version.objects.get_version('test'), '')
+
+        Version.objects.bump_version('test')
+        version = Version.objects.get_version('test')
+        self.assertNotEqual(version, '')
+        self.assertEqual(Version.objects.get_version('test', 'other'), version + '_')
+
+        Version.objects.bump_version('test')
+        self.assertNotEqual(Version.objects.get_version('test'), version)
+
+    def test_get_version_num_queries(self):
+        Version.objects.bump_version('test')
+
+        # outside of a request, the version is fetched on every access
+        with self.assertNumQueries(2):
+            Version.objects.get_version('test')
+            Version.objects.get_version('test')
+
+        # within a request, the version is fetched only once
+        start_request_versions()
+        try:
+            with self.assertNumQueries(1):
+                version = Version.objects.get_version('test')
+                self.assertEqual(Version.objects.get_version('test'), version)
+
+            # a version bumped by the same request is used right away
+            Version.objects.bump_version('test')
+            with self.assertNumQueries(0):
+                self.assertNotEqual(Version.objects.get_version('test'), version)
+        finally:
+            finish_request_versions()
+
+        with self.assertNumQueries(1):
+            Version.objects.get_version('test')
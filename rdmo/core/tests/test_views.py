@@ -1,9 +1,17 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
 from django.core.urlresolvers import reverse
 from django.utils import translation
 
 from rdmo.accounts.utils import set_group_permissions
 
+from .. import settings as core_settings
+from ..exports import get_export_job, submit_export_job
+
 
 class CoreViewTests(TestCase):
 
@@ -57,3 +65,87 @@ class CoreViewTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(302, response.status_code)
         self.assertIn('en', response['Content-Language'])
+
+
+class ExportJobTests(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'domain.json',
+    )
+
+    def setUp(self):
+        translation.activate('en')
+        set_group_permissions()
+
+        self.jobs_root = tempfile.mkdtemp()
+        self.override = override_settings(EXPORT_MAX_WORKERS=1, EXPORT_JOBS_ROOT=self.jobs_root)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.jobs_root)
+
+    def wait_for_job(self, url):
+        for i in range(300):
+            response = self.client.get(url)
+            if response.status_code != 202:
+                return response
+            time.sleep(0.1)
+
+        self.fail('The export job did not finish.')
+
+    def test_export_job(self):
+        ''' An export is converted by the export workers and can be downloaded when it is finished. '''
+
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('domain_export', args=['rtf']))
+        self.assertEqual(response.status_code, 302)
+
+        url = response['Location']
+        response = self.wait_for_job(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/rtf')
+
+        # the document is the same as the one converted within the request
+        with override_settings(EXPORT_MAX_WORKERS=0):
+            content = self.client.get(reverse('domain_export', args=['rtf'])).content
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        # the job can only be accessed by the user who started the export
+        self.client.login(username='manager', password='manager')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_job_default_settings(self):
+        ''' With the default settings, exports are converted by the export workers. '''
+
+        self.assertGreater(core_settings.EXPORT_MAX_WORKERS, 0)
+
+        self.client.login(username='admin', password='admin')
+        with override_settings(EXPORT_MAX_WORKERS=core_settings.EXPORT_MAX_WORKERS):
+            response = self.client.get(reverse('domain_export', args=['rtf']))
+        self.assertEqual(response.status_code, 302)
+
+        response = self.wait_for_job(response['Location'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_job_failed(self):
+        ''' A failed conversion is shown as a failed export job. '''
+
+        user = User.objects.get(username='admin')
+        job_id = submit_export_job(user, '<p>test</p>', 'rtf', ['--unknown-option'], 'test', 'filename="test.rtf"')
+
+        self.client.login(username='admin', password='admin')
+        response = self.wait_for_job(reverse('export_job', args=[job_id]))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(get_export_job(job_id)['status'], 'failed')
+
+    def test_export_job_not_found(self):
+        ''' An unknown export job is not found. '''
+
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('export_job', args=['0' * 32]))
+        self.assertEqual(response.status_code, 404)
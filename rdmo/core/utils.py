@@ -4,19 +4,28 @@ import logging
 import pypandoc
 import re
 
+from collections import OrderedDict
+
 import defusedxml.ElementTree as ET
 
 from tempfile import mkstemp
 
 from django.apps import apps
 from django.conf import settings
+from django.db import connections, router
+from django.db.models import Case, When, Value
 from django.template.loader import get_template
-from django.http import HttpResponse, HttpResponseBadRequest
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect
 from django.utils.six.moves.urllib.parse import urlparse
 from django.utils.translation import ugettext_lazy as _
 
+from .exports import cache_document, convert_document, get_cached_document, get_export_cache_key, submit_export_job
+
 log = logging.getLogger(__name__)
 
+BULK_UPDATE_BATCH_SIZE = 500
+
 
 def get_script_alias(request):
     return request.path[:-len(request.path_info)]
@@ -46,6 +55,14 @@ def get_next(request):
 
 
 def get_ns_map(treenode):
+    # the trees from validate_xml (see imports.py) store the namespace map from the start-ns events
+    if hasattr(treenode, 'nsmap'):
+        return treenode.nsmap
+
+    # otherwise the root node is serialized to find the namespaces
+    if hasattr(treenode, 'getroot'):
+        treenode = treenode.getroot()
+
     nsmap = {}
     treestring = ET.tostring(treenode, encoding='utf8', method='xml')
     match = re.search(r'(xmlns:)(.*?)(=")(.*?)(")', str(treestring))
@@ -80,6 +97,65 @@ def get_uri_prefix(obj):
     return r
 
 
+def bulk_update(model, instances, fields, batch_size=BULK_UPDATE_BATCH_SIZE):
+    '''
+    Writes the given fields of the instances to the database using one UPDATE ... CASE query per
+    batch. Like QuerySet.update, this does not call save() and does not send any signals.
+    '''
+    instances = list(instances)
+
+    for i in range(0, len(instances), batch_size):
+        batch = instances[i:i + batch_size]
+
+        updates = {}
+        for field_name in fields:
+            field = model._meta.get_field(field_name)
+            output_field = field.target_field if field.is_relation else field
+
+            # group the instances by value, so that there is only one WHEN for each distinct value
+            pk_lists = OrderedDict()
+            for instance in batch:
+                pk_lists.setdefault(getattr(instance, field.attname), []).append(instance.pk)
+
+            updates[field.attname] = Case(*[
+                When(pk__in=pk_list, then=Value(value, output_field=output_field))
+                for value, pk_list in pk_lists.items()
+            ], output_field=output_field)
+
+        model.objects.filter(pk__in=[instance.pk for instance in batch]).update(**updates)
+
+    return len(instances)
+
+
+def bulk_create_children(model, instances, batch_size=BULK_UPDATE_BATCH_SIZE):
+    '''
+    Inserts the rows of the child table of a multi-table inherited model, for instances whose parent
+    rows already exist (e.g. created using bulk_create for the parent model), since QuerySet.bulk_create
+    does not support multi-table inheritance. Like bulk_create, this does not call save() and does not
+    send any signals.
+    '''
+    instances = list(instances)
+
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    fields = model._meta.local_concrete_fields
+
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        quote_name(model._meta.db_table),
+        ', '.join(quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields))
+    )
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(instances), batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(getattr(instance, field.attname), connection) for field in fields]
+                for instance in instances[i:i + batch_size]
+            ])
+
+    return len(instances)
+
+
 def get_model_field_meta(model):
     meta = {}
 
@@ -151,21 +227,33 @@ def render_to_format(request, format, title, template_src, context):
             if refdoc is not None and (format == 'docx' or format == 'odt'):
                     refdoc_param = '--reference-' + format + '=' + refdoc
                     args.extend([refdoc_param])
+            else:
+                refdoc = None
+
+            # look for the converted file in the cache of exports
+            cache_key = get_export_cache_key(html, format, args, refdoc)
+            file_content = get_cached_document(cache_key)
+
+            if file_content is None:
+                if settings.EXPORT_MAX_WORKERS:
+                    # convert the file in the pool of export workers and redirect to the status of the job
+                    job_id = submit_export_job(request.user, html, format, args, title, content_disposition, cache_key)
+                    return HttpResponseRedirect(reverse('export_job', args=[job_id]))
 
-            # create a temporary file
-            (tmp_fd, tmp_filename) = mkstemp('.' + format)
+                # create a temporary file
+                (tmp_fd, tmp_filename) = mkstemp('.' + format)
 
-            log.info("Exporting " + format + " document using args " + str(args))
-            # convert the file using pandoc
-            pypandoc.convert_text(html, format, format='html', outputfile=tmp_filename, extra_args=args)
+                # convert the file using pandoc and store it in the cache
+                convert_document(html, format, args, tmp_filename)
+                cache_document(cache_key, tmp_filename)
 
-            # read the temporary file
-            file_handler = os.fdopen(tmp_fd, 'rb')
-            file_content = file_handler.read()
-            file_handler.close()
+                # read the temporary file
+                file_handler = os.fdopen(tmp_fd, 'rb')
+                file_content = file_handler.read()
+                file_handler.close()
 
-            # delete the temporary file
-            os.remove(tmp_filename)
+                # delete the temporary file
+                os.remove(tmp_filename)
 
             # create the response object
             response = HttpResponse(file_content, content_type='application/%s' % format)
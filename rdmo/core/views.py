@@ -5,7 +5,7 @@ from django.contrib.auth.mixins import PermissionRequiredMixin as DjangoPermissi
 from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect
+from django.http import FileResponse, Http404, HttpResponseRedirect
 from django.shortcuts import render
 from django.utils import translation
 from django.views.generic.base import View
@@ -14,6 +14,7 @@ from rest_framework import viewsets, mixins
 
 from rules.contrib.views import PermissionRequiredMixin as RulesPermissionRequiredMixin
 
+from .exports import get_export_job
 from .utils import get_referer, get_referer_path_info, get_next
 from .serializers import ChoicesSerializer
 
@@ -42,6 +43,23 @@ def i18n_switcher(request, language):
     return HttpResponseRedirect(referer)
 
 
+def export_job(request, job_id):
+    job = get_export_job(job_id)
+
+    # only the user who started the export can access the job
+    if job is None or job['user'] != request.user.pk:
+        raise Http404
+
+    if job['status'] == 'finished':
+        response = FileResponse(open(job['document_path'], 'rb'), content_type='application/%s' % job['format'])
+        response['Content-Disposition'] = job['content_disposition'].encode('utf-8')
+        return response
+    elif job['status'] == 'failed':
+        return render(request, 'core/export_job.html', {'job': job}, status=500)
+    else:
+        return render(request, 'core/export_job.html', {'job': job}, status=202)
+
+
 class RedirectViewMixin(View):
 
     def post(self, request, *args, **kwargs):
@@ -1,139 +1,322 @@
 import logging
+import time
+from functools import partial
 
-from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.encoding import force_text
 
-from rdmo.core.imports import get_value_from_treenode, make_bool
-from rdmo.core.utils import get_ns_map, get_ns_tag, get_uri
+from rdmo.core.imports import ImportRegistry, get_value_from_treenode, make_bool
+from rdmo.core.utils import bulk_create_children, bulk_update, get_ns_map, get_ns_tag, get_uri, get_uri_prefix
 from rdmo.conditions.models import Condition
 from rdmo.options.models import OptionSet
+from rdmo.questions.managers import bump_structure_version
 
-from .models import AttributeEntity, Attribute, VerboseName
-from .validators import AttributeEntityUniquePathValidator
+from .models import AttributeEntity, Attribute, VerboseName, Range
 
 log = logging.getLogger(__name__)
 
 
-def import_domain(domain_node):
-    log.info('Starting to parse domain node')
-    nsmap = get_ns_map(domain_node.getroot())
-
-    for entity_node in domain_node.findall('entity'):
-        import_attribute_entity(entity_node, nsmap)
-    for entity_node in domain_node.findall('attribute'):
-        import_attribute(entity_node, nsmap)
-
-
-def import_attribute_entity(entity_node, nsmap, parent=None):
-    uri = get_uri(entity_node, nsmap)
-
-    try:
-        entity = AttributeEntity.objects.get(uri=uri, parent=parent)
-    except AttributeEntity.DoesNotExist:
-        entity = AttributeEntity()
-        log.info('Entity not in db. Created with uri ' + str(uri))
-    else:
-        log.info('Entity does exist. Loaded from uri ' + str(uri))
-
-    entity.parent = parent
-    entity.uri_prefix = uri.split('/domain/')[0]
-    entity.key = uri.split('/')[-1]
-    entity.comment = get_value_from_treenode(entity_node, get_ns_tag('dc:comment', nsmap))
-    entity.is_collection = make_bool(entity_node.find('is_collection').text)
-    try:
-        AttributeEntityUniquePathValidator(entity).validate()
-    except ValidationError:
-        log.info('Entity not saving "' + str(uri) + '" due to validation error')
-        pass
-    else:
-        log.info('Entity saving to "' + str(uri) + '", parent "' + str(parent) + '"')
-        entity.save()
-
-    if entity_node.find('verbosename').text is not None:
-        import_verbose_name(get_value_from_treenode(entity_node, 'verbosename'), entity)
-
-    if entity_node.find('conditions') is not None:
-        for condition_node in entity_node.find('conditions').findall('condition'):
-            try:
-                condition_uri = get_uri(condition_node, nsmap, 'plain')
-                condition = Condition.objects.get(uri=condition_uri)
-                entity.conditions.add(condition)
-            except Condition.DoesNotExist:
-                log.info('Condition import failed: ' + str(Condition.DoesNotExist))
-                pass
-
-    for child_node in entity_node.find('children').findall('entity'):
-        import_attribute_entity(child_node, nsmap, parent=entity)
-    for child_node in entity_node.find('children').findall('attribute'):
-        import_attribute(child_node, nsmap, parent=entity)
-
-
-def import_attribute(attribute_node, nsmap, parent=None):
-    attribute_uri = get_uri(attribute_node, nsmap)
-
-    try:
-        attribute = Attribute.objects.get(uri=attribute_uri)
-    except Attribute.DoesNotExist:
-        log.info('Attribute not in db. Created with uri ' + str(attribute_uri))
-        attribute = Attribute()
-        pass
-    else:
-        log.info('Attribute does exist. Loaded from uri ' + str(attribute_uri))
-
-    attribute.uri = attribute_uri
-    attribute.parent = parent
-    attribute.uri_prefix = attribute_uri.split('/domain/')[0]
-
-    attribute.key = attribute_uri.split('/')[-1]
-    attribute.comment = get_value_from_treenode(attribute_node, get_ns_tag('dc:comment', nsmap))
-    attribute.is_collection = make_bool(attribute_node.find('is_collection').text)
-    attribute.value_type = get_value_from_treenode(attribute_node, 'value_type')
-    attribute.unit = get_value_from_treenode(attribute_node, 'unit')
-    try:
-        AttributeEntityUniquePathValidator(attribute).validate()
-    except ValidationError:
-        log.info('Attribute not saving "' + str(attribute_uri) + '" due to validation error')
-        pass
-    else:
-        log.info('Attribute saving to "' + str(attribute_uri) + '", parent "' + str(parent) + '"')
-        attribute.save()
-
-    if hasattr(attribute_node, 'range'):
-        import_verbose_name(attribute_node.range, attribute)
-
-    if hasattr(attribute_node, 'verbosename'):
-        import_verbose_name(attribute_node.verbosename, attribute)
-
-    if attribute_node.find('optionsets') is not None:
-        for optionset_node in attribute_node.find('optionsets').findall('optionset'):
-            try:
-                optionset_uri = optionset_node.get(get_ns_tag('dc:uri', nsmap))
-                optionset = OptionSet.objects.get(uri=optionset_uri)
-                attribute.optionsets.add(optionset)
-            except OptionSet.DoesNotExist:
-                pass
-
-    if attribute_node.find('conditions') is not None:
-        for condition_node in attribute_node.find('conditions').findall('condition'):
-            try:
-                condition_uri = condition_node.get(get_ns_tag('dc:uri', nsmap))
-                condition = Condition.objects.get(uri=condition_uri)
-                attribute.conditions.add(condition)
-            except Condition.DoesNotExist:
-                pass
-
-
-def import_verbose_name(verbosename_node, entity):
-    try:
-        try:
-            verbosename = VerboseName.objects.get(attribute_entity=entity)
-        except VerboseName.DoesNotExist:
-            verbosename = VerboseName(attribute_entity=entity)
+class DomainImport(object):
+    '''
+    Imports a domain XML tree in bulk: existing attributes/entities, conditions and option sets are
+    resolved using prefetched dicts, path and uri are computed while the tree is read, the attributes/entities
+    are written level by level using bulk_create/bulk_update and the MPTT trees are rebuilt once at the end.
+    '''
+
+    def __init__(self, registry=None):
+        self.nsmap = {}
+        self.registry = registry or ImportRegistry()
+
+        self.entities = {entity.uri: entity for entity in AttributeEntity.objects.filter(is_attribute=False)}
+        self.attributes = {attribute.uri: attribute for attribute in Attribute.objects.all()}
+        self.paths = dict(AttributeEntity.objects.values_list('path', 'pk'))
+
+        self.conditions = self.registry.get_uris(Condition)
+        self.optionsets = self.registry.get_uris(OptionSet)
+        self.verbosenames = {verbosename.attribute_entity_id: verbosename for verbosename in VerboseName.objects.all()}
+        self.ranges = {range.attribute_id: range for range in Range.objects.all()}
+
+        # the attributes/entities of the file for each level of the trees, with their node and the
+        # field values before the import
+        self.levels = []
+
+        self.created = set()
+        self.updated_entities = []
+        self.updated_attributes = []
+        self.moved = []
+        self.condition_links = set()
+        self.optionset_links = set()
+        self.verbosenames_changed = set()
+        self.ranges_changed = set()
+
+    def run(self, domain_node):
+        start = time.time()
+        self.nsmap = get_ns_map(domain_node)
+
+        with transaction.atomic():
+            with AttributeEntity.objects.disable_mptt_updates():
+                for node in domain_node.getroot():
+                    if node.tag in ('entity', 'attribute'):
+                        self.import_node(node)
+
+                # the parents are saved before their children, so that the foreign keys can be set
+                for level in self.levels:
+                    self.save_level(level)
+
+                for level in self.levels:
+                    for entity, node, entity_fields, attribute_fields in level:
+                        self.import_related(entity, node)
+
+                bulk_update(AttributeEntity, self.updated_entities, (
+                    'parent', 'uri_prefix', 'key', 'comment', 'is_collection', 'path', 'uri', 'parent_collection'
+                ))
+                bulk_update(Attribute, self.updated_attributes, ('value_type', 'unit'))
+
+                self.save_links()
+                self.save_verbosenames()
+                self.save_ranges()
+
+            self.rebuild_trees()
+
+            # the descendants of moved attributes/entities, which are not part of the file, need new paths
+            for entity in AttributeEntity.objects.filter(pk__in=self.moved):
+                entity.update_descendants()
+
+        bump_structure_version()
+
+        log.info('Imported domain with %i new and %i updated attributes/entities in %.3fs.',
+                 len(self.created), len(self.updated_entities), time.time() - start)
+
+    def import_node(self, node, parent=None, level=0):
+        uri = get_uri(node, self.nsmap)
+        is_attribute = (node.tag == 'attribute')
+
+        if is_attribute:
+            entity = self.attributes.get(uri) or Attribute()
+        else:
+            entity = self.entities.get(uri) or AttributeEntity()
+
+        if entity.pk is None:
+            entity_fields = attribute_fields = None
+        else:
+            entity_fields = self.get_entity_fields(entity)
+            attribute_fields = self.get_attribute_fields(entity) if is_attribute else None
+
+        entity.parent = parent
+        entity.uri_prefix = uri.split('/domain/')[0]
+        entity.key = uri.split('/')[-1]
+        entity.comment = force_text(get_value_from_treenode(node, get_ns_tag('dc:comment', self.nsmap)))
+        entity.is_collection = make_bool(node.find('is_collection').text)
+        entity.is_attribute = is_attribute
+
+        if is_attribute:
+            entity.value_type = force_text(get_value_from_treenode(node, 'value_type'))
+            entity.unit = force_text(get_value_from_treenode(node, 'unit'))
+
+        # validate the uniqueness of the path using the dict of all paths, which maps a path
+        # to the pk of the existing attribute/entity or to the attribute/entity from the file
+        path = AttributeEntity.build_path(entity.key, parent)
+        owner = self.paths.get(path)
+        if owner is not None and owner is not entity and owner != entity.pk:
+            log.info('Entity not saving "' + str(uri) + '" due to validation error')
+            return
+
+        self.paths[path] = entity
+
+        if entity.pk is not None and entity.path != path:
+            self.moved.append(entity.pk)
+
+        entity.path = path
+        entity.uri = get_uri_prefix(entity) + '/domain/' + path
+
+        if len(self.levels) <= level:
+            self.levels.append([])
+        self.levels[level].append((entity, node, entity_fields, attribute_fields))
+
+        if not is_attribute:
+            children_node = node.find('children')
+            if children_node is not None:
+                for child_node in children_node:
+                    if child_node.tag in ('entity', 'attribute'):
+                        self.import_node(child_node, parent=entity, level=level + 1)
+
+    def save_level(self, level):
+        created = []
+
+        for entity, node, entity_fields, attribute_fields in level:
+            # the parent might have been created after it was assigned,
+            # assigning it again sets the foreign key to its (new) primary key
+            entity.parent = entity.parent
+            entity.parent_collection_id = AttributeEntity.get_parent_collection_id(entity.parent)
+
+            if entity.pk is None:
+                created.append(entity)
+            else:
+                # only the attributes/entities which have changed are updated
+                if self.get_entity_fields(entity) != entity_fields:
+                    self.updated_entities.append(entity)
+                if entity.is_attribute and self.get_attribute_fields(entity) != attribute_fields:
+                    self.updated_attributes.append(entity)
+
+        if not created:
+            return
+
+        # the new attributes/entities are inserted with tree_id 0 until the trees are rebuilt, bulk_create
+        # does not support multi-table inheritance, so the rows of the attributes are inserted separately
+        AttributeEntity.objects.bulk_create([
+            AttributeEntity(tree_id=0, lft=1, rght=2, level=0, **{
+                field.attname: getattr(entity, field.attname) for field in AttributeEntity._meta.concrete_fields
+                if field.attname not in ('id', 'tree_id', 'lft', 'rght', 'level')
+            }) for entity in created
+        ])
+
+        # bulk_create does not set the primary keys for every database, so they are fetched using the paths
+        pks = dict(AttributeEntity.objects.filter(tree_id=0).values_list('path', 'pk'))
+        for entity in created:
+            entity.id = entity.pk = pks[entity.path]
+            entity._state.adding = False
+            self.created.add(entity.pk)
+
+        bulk_create_children(Attribute, [entity for entity in created if entity.is_attribute])
+
+    def import_related(self, entity, node):
+        self.registry.add(AttributeEntity, entity.uri, entity.pk)
+        if entity.is_attribute:
+            self.registry.add(Attribute, entity.uri, entity.pk)
+
+        self.import_verbosename(node, entity)
+        if entity.is_attribute:
+            self.import_range(node, entity)
+
+        for condition_uri in self.get_link_uris(node, 'conditions', 'condition'):
+            if condition_uri in self.conditions:
+                self.condition_links.add((entity.pk, self.conditions[condition_uri]))
+            else:
+                # the condition might be imported from a later file of the same import
+                self.registry.defer(Condition, condition_uri, partial(self.link_condition, entity.pk))
+
+        if entity.is_attribute:
+            for optionset_uri in self.get_link_uris(node, 'optionsets', 'optionset'):
+                if optionset_uri in self.optionsets:
+                    self.optionset_links.add((entity.pk, self.optionsets[optionset_uri]))
+
+    def get_entity_fields(self, entity):
+        return (entity.parent_id, entity.uri_prefix, entity.key, entity.comment, entity.is_collection,
+                entity.path, entity.uri, entity.parent_collection_id)
+
+    def get_attribute_fields(self, attribute):
+        return (attribute.value_type, attribute.unit)
+
+    def import_verbosename(self, node, entity):
+        verbosename_node = node.find('verbosename')
+        if verbosename_node is None or verbosename_node.find('name') is None:
+            return
+
+        verbosename = self.verbosenames.get(entity.pk) or VerboseName(attribute_entity_id=entity.pk)
+        fields = self.get_verbosename_fields(verbosename)
+
         for element in verbosename_node.findall('name'):
-            setattr(verbosename, 'name_' + element.get('lang'), element.text)
+            setattr(verbosename, 'name_' + element.get('lang'), element.text or '')
         for element in verbosename_node.findall('name_plural'):
-            setattr(verbosename, 'name_plural_' + element.get('lang'), element.text)
-        log.info('Verbosename saving ' + str(verbosename))
-        verbosename.save()
-    except Exception as e:
-        log.info('Verbosename, an exception occured: ' + str(e))
-        pass
+            setattr(verbosename, 'name_plural_' + element.get('lang'), element.text or '')
+
+        if verbosename.pk is None or self.get_verbosename_fields(verbosename) != fields:
+            self.verbosenames[entity.pk] = verbosename
+            self.verbosenames_changed.add(entity.pk)
+
+    def get_verbosename_fields(self, verbosename):
+        return (verbosename.name_en, verbosename.name_de, verbosename.name_plural_en, verbosename.name_plural_de)
+
+    def import_range(self, node, attribute):
+        range_node = node.find('range')
+        if range_node is None or range_node.find('minimum') is None:
+            return
+
+        range = self.ranges.get(attribute.pk) or Range(attribute_id=attribute.pk)
+        fields = (range.minimum, range.maximum, range.step)
+
+        try:
+            range.minimum = float(range_node.findtext('minimum'))
+            range.maximum = float(range_node.findtext('maximum'))
+            range.step = float(range_node.findtext('step'))
+        except (TypeError, ValueError):
+            log.info('Range import failed for "' + str(attribute.uri) + '"')
+            return
+
+        if range.pk is None or (range.minimum, range.maximum, range.step) != fields:
+            self.ranges[attribute.pk] = range
+            self.ranges_changed.add(attribute.pk)
+
+    def get_link_uris(self, node, tag, child_tag):
+        links_node = node.find(tag)
+        if links_node is None:
+            return []
+
+        return [child.get(get_ns_tag('dc:uri', self.nsmap)) for child in links_node.findall(child_tag)]
+
+    def save_links(self):
+        # conditions and option sets are only added, like the previous importer did
+        ConditionLink = AttributeEntity.conditions.through
+        existing = set(ConditionLink.objects.values_list('attributeentity_id', 'condition_id'))
+        ConditionLink.objects.bulk_create([
+            ConditionLink(attributeentity_id=entity_id, condition_id=condition_id)
+            for entity_id, condition_id in sorted(self.condition_links - existing)
+        ])
+
+        OptionSetLink = Attribute.optionsets.through
+        existing = set(OptionSetLink.objects.values_list('attribute_id', 'optionset_id'))
+        OptionSetLink.objects.bulk_create([
+            OptionSetLink(attribute_id=attribute_id, optionset_id=optionset_id)
+            for attribute_id, optionset_id in sorted(self.optionset_links - existing)
+        ])
+
+    def link_condition(self, entity_id, condition_id):
+        ConditionLink = AttributeEntity.conditions.through
+        ConditionLink.objects.get_or_create(attributeentity_id=entity_id, condition_id=condition_id)
+
+    def save_verbosenames(self):
+        verbosenames = [self.verbosenames[pk] for pk in sorted(self.verbosenames_changed)]
+        VerboseName.objects.bulk_create([verbosename for verbosename in verbosenames if verbosename.pk is None])
+        bulk_update(VerboseName, [verbosename for verbosename in verbosenames if verbosename.pk is not None], (
+            'name_en', 'name_de', 'name_plural_en', 'name_plural_de'
+        ))
+
+    def save_ranges(self):
+        ranges = [self.ranges[pk] for pk in sorted(self.ranges_changed)]
+        Range.objects.bulk_create([range for range in ranges if range.pk is None])
+        bulk_update(Range, [range for range in ranges if range.pk is not None], ('minimum', 'maximum', 'step'))
+
+    def rebuild_trees(self):
+        '''
+        Rebuilds the MPTT fields of all trees in memory (like TreeManager.rebuild, but without two
+        queries for each node). Existing nodes keep their order, new nodes are appended.
+        '''
+        nodes = AttributeEntity.objects.values_list('pk', 'parent_id', 'tree_id', 'lft', 'rght', 'level')
+
+        children = {}
+        for node in nodes:
+            children.setdefault(node[1], []).append(node)
+
+        for node_list in children.values():
+            node_list.sort(key=lambda node: (node[0] in self.created, node[2], node[3], node[0]))
+
+        changed = []
+
+        def rebuild_node(node, tree_id, left, level):
+            right = left + 1
+            for child in children.get(node[0], []):
+                right = rebuild_node(child, tree_id, right, level + 1) + 1
+
+            if node[2:] != (tree_id, left, right, level):
+                changed.append(AttributeEntity(pk=node[0], tree_id=tree_id, lft=left, rght=right, level=level))
+
+            return right
+
+        for tree_id, root in enumerate(children.get(None, []), 1):
+            rebuild_node(root, tree_id, 1, 0)
+
+        bulk_update(AttributeEntity, changed, ('tree_id', 'lft', 'rght', 'level'))
+
+
+def import_domain(domain_node, registry=None):
+    DomainImport(registry).run(domain_node)
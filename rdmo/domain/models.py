@@ -6,7 +6,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from mptt.models import MPTTModel, TreeForeignKey
 
-from rdmo.core.utils import get_uri_prefix
+from rdmo.core.utils import bulk_update, get_uri_prefix
 from rdmo.core.models import TranslationMixin
 from rdmo.conditions.models import Condition
 
@@ -80,23 +80,40 @@ class AttributeEntity(MPTTModel):
         self.path = AttributeEntity.build_path(self.key, self.parent)
         self.uri = get_uri_prefix(self) + '/domain/' + self.path
         self.is_attribute = self.is_attribute or False
+        self.parent_collection_id = AttributeEntity.get_parent_collection_id(self.parent)
 
-        # loop over parents to find parent collection
-        self.parent_collection = None
-        parent = self.parent
-        while parent:
-            # set parent_collection if it is not yet set and if parent is a collection
-            if not self.parent_collection and parent.is_collection:
-                self.parent_collection = parent
-                break
+        created = self.pk is None
+        super(AttributeEntity, self).save(*args, **kwargs)
 
-            parent = parent.parent
+        # update the path, uri and parent_collection of the descendants (a new node has none)
+        if not created:
+            self.update_descendants()
 
-        super(AttributeEntity, self).save(*args, **kwargs)
+    def update_descendants(self):
+        '''
+        Recomputes path, uri and parent_collection for all descendants of this attribute/entity.
+        The subtree is loaded in one query (in tree order, so that every parent is processed before
+        its children) and the changed descendants are written using bulk updates.
+        '''
+        nodes = {self.pk: self}
+        changed = []
+
+        for descendant in self.get_descendants():
+            parent = nodes[descendant.parent_id]
+
+            path = AttributeEntity.build_path(descendant.key, parent)
+            uri = get_uri_prefix(descendant) + '/domain/' + path
+            parent_collection_id = AttributeEntity.get_parent_collection_id(parent)
+
+            if (descendant.path, descendant.uri, descendant.parent_collection_id) != (path, uri, parent_collection_id):
+                descendant.path = path
+                descendant.uri = uri
+                descendant.parent_collection_id = parent_collection_id
+                changed.append(descendant)
+
+            nodes[descendant.pk] = descendant
 
-        # recursively save children
-        for child in self.children.all():
-            child.save()
+        return bulk_update(AttributeEntity, changed, ('path', 'uri', 'parent_collection'))
 
     def clean(self):
         self.path = AttributeEntity.build_path(self.key, self.parent)
@@ -122,11 +139,19 @@ class AttributeEntity(MPTTModel):
 
     @classmethod
     def build_path(self, key, parent):
-        path = key
-        while parent:
-            path = parent.key + '/' + path
-            parent = parent.parent
-        return path
+        # the path of the parent is already up to date, since parents are always saved first
+        if parent:
+            return parent.path + '/' + key
+        else:
+            return key
+
+    @classmethod
+    def get_parent_collection_id(self, parent):
+        # the parent collection is the parent, if it is a collection, or the parent collection of the parent
+        if parent:
+            return parent.pk if parent.is_collection else parent.parent_collection_id
+        else:
+            return None
 
 
 @python_2_unicode_compatible
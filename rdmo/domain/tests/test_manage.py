@@ -1,6 +1,16 @@
+import tempfile
+
+import defusedxml.ElementTree as ET
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rdmo.core.testing.mixins import TestImportManageMixin
+from rdmo.core.testing.utils import benchmark, measure
+
+from ..imports import import_domain
+from ..models import AttributeEntity, Attribute, VerboseName, Range
 
 
 class DomainManageTestCase(TestCase):
@@ -24,3 +34,157 @@ class DomainImportManageTests(TestImportManageMixin, DomainManageTestCase):
     export_api = 'domain_export'
     export_api_kwargs = {'format': 'xml'}
     export_api_format_list = ['pdf', 'rtf', 'odt', 'docx', 'html', 'markdown', 'mediawiki', 'tex', 'xml']
+
+
+class DomainImportTestCase(DomainManageTestCase):
+
+    import_file = 'testing/xml/domain.xml'
+
+    def get_tree_fields(self):
+        return list(AttributeEntity.objects.order_by('pk').values_list('pk', 'tree_id', 'lft', 'rght', 'level'))
+
+    def assert_trees(self):
+        # the trees are the same as the ones from the (slow) rebuild of mptt
+        tree_fields = self.get_tree_fields()
+        AttributeEntity.objects.rebuild()
+        self.assertEqual(tree_fields, self.get_tree_fields())
+
+        for entity in AttributeEntity.objects.all():
+            self.assertEqual(entity.path, AttributeEntity.build_path(entity.key, entity.parent))
+            self.assertEqual(entity.uri, 'http://example.com/terms/domain/' + entity.path)
+
+    def get_entities(self):
+        # the tasks entities are not part of the import file
+        queryset = AttributeEntity.objects.exclude(path__startswith='tasks')
+        return (
+            set(queryset.values_list('uri', 'path', 'parent__uri', 'is_collection')),
+            set(queryset.values_list('uri', 'conditions__uri')),
+            set(queryset.filter(is_attribute=True).values_list('uri', 'attribute__value_type', 'attribute__optionsets__uri'))
+        )
+
+    def write_domain_xml(self, f, key, entity_count, attribute_count):
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write('<domain xmlns:dc="http://purl.org/dc/elements/1.1/">\n')
+        for i in range(entity_count):
+            f.write('<entity><dc:uri>http://example.com/terms/domain/%s_%i</dc:uri>'
+                    '<dc:comment></dc:comment><is_collection>False</is_collection><verbosename></verbosename>'
+                    '<children>' % (key, i))
+            for j in range(attribute_count):
+                f.write('<attribute><dc:uri>http://example.com/terms/domain/%s_%i/attribute_%i</dc:uri>'
+                        '<dc:comment></dc:comment><is_collection>False</is_collection>'
+                        '<value_type>text</value_type><unit></unit><range></range><verbosename></verbosename>'
+                        '<conditions><condition dc:uri="http://example.com/terms/conditions/text_empty"></condition>'
+                        '</conditions></attribute>' % (key, i, j))
+            f.write('</children></entity>\n')
+        f.write('</domain>\n')
+        f.flush()
+
+
+class DomainImportTests(DomainImportTestCase):
+
+    def test_import(self):
+        entities = self.get_entities()
+        AttributeEntity.objects.all().delete()
+
+        import_domain(ET.parse(self.import_file))
+
+        self.assertEqual(self.get_entities(), entities)
+        self.assert_trees()
+
+    def test_import_existing(self):
+        pk_list = list(AttributeEntity.objects.order_by('pk').values_list('pk', flat=True))
+
+        import_domain(ET.parse(self.import_file))
+
+        self.assertEqual(list(AttributeEntity.objects.order_by('pk').values_list('pk', flat=True)), pk_list)
+        self.assert_trees()
+
+    def test_import_verbosename_and_range(self):
+        with tempfile.NamedTemporaryFile(suffix='.xml') as f:
+            f.write(b'''<?xml version="1.0" encoding="utf-8"?>
+<domain xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <entity>
+        <dc:uri>http://example.com/terms/domain/new</dc:uri>
+        <dc:comment></dc:comment>
+        <is_collection>True</is_collection>
+        <verbosename>
+            <name lang="en">name</name><name lang="de">Name</name>
+            <name_plural lang="en">names</name_plural><name_plural lang="de">Namen</name_plural>
+        </verbosename>
+        <children>
+            <attribute>
+                <dc:uri>http://example.com/terms/domain/new/attribute</dc:uri>
+                <dc:comment></dc:comment>
+                <is_collection>False</is_collection>
+                <value_type>float</value_type>
+                <unit></unit>
+                <range><minimum>0.0</minimum><maximum>10.0</maximum><step>0.5</step></range>
+                <verbosename></verbosename>
+            </attribute>
+        </children>
+    </entity>
+</domain>''')
+            f.flush()
+
+            import_domain(ET.parse(f.name))
+
+        attribute = Attribute.objects.get(path='new/attribute')
+        self.assertEqual(attribute.parent_collection, AttributeEntity.objects.get(path='new'))
+        self.assertEqual(VerboseName.objects.get(attribute_entity__path='new').name_plural_de, 'Namen')
+        self.assertEqual(Range.objects.get(attribute=attribute).step, 0.5)
+        self.assert_trees()
+
+    def test_import_many(self):
+        with tempfile.NamedTemporaryFile(suffix='.xml', mode='w') as f:
+            self.write_domain_xml(f, 'test', 2, 3)
+            xmltree = ET.parse(f.name)
+
+        import_domain(xmltree)
+        pk_list = list(AttributeEntity.objects.order_by('pk').values_list('pk', flat=True))
+
+        attributes = Attribute.objects.filter(path__startswith='test_')
+        self.assertEqual(attributes.count(), 6)
+        self.assertEqual(attributes.filter(conditions__key='text_empty').count(), 6)
+
+        # a second import updates the elements
+        import_domain(xmltree)
+
+        self.assertEqual(list(AttributeEntity.objects.order_by('pk').values_list('pk', flat=True)), pk_list)
+        self.assert_trees()
+
+    def test_import_num_queries(self):
+        num_queries = []
+        for attribute_count in (3, 6):
+            with tempfile.NamedTemporaryFile(suffix='.xml', mode='w') as f:
+                self.write_domain_xml(f, 'test_%i' % attribute_count, 2, attribute_count)
+                xmltree = ET.parse(f.name)
+
+            with CaptureQueriesContext(connection) as context:
+                import_domain(xmltree)
+
+            num_queries.append(len(context))
+
+        # the new attributes/entities are inserted in bulk, so the number of queries does not
+        # depend on the number of attributes
+        self.assertEqual(num_queries[0], num_queries[1])
+        self.assert_trees()
+
+
+@benchmark
+class DomainImportBenchmarks(DomainImportTestCase):
+
+    def test_import(self):
+        entity_count, attribute_count = 50, 100
+
+        with tempfile.NamedTemporaryFile(suffix='.xml', mode='w') as f:
+            self.write_domain_xml(f, 'benchmark', entity_count, attribute_count)
+            xmltree = ET.parse(f.name)
+
+        with measure('Import of a domain with %i attributes, create' % (entity_count * attribute_count)):
+            import_domain(xmltree)
+
+        with measure('Import of a domain with %i attributes, update' % (entity_count * attribute_count)):
+            import_domain(xmltree)
+
+        self.assertEqual(Attribute.objects.filter(path__startswith='benchmark_').count(), entity_count * attribute_count)
+        self.assert_trees()
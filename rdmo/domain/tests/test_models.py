@@ -0,0 +1,117 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rdmo.core.testing.utils import benchmark, measure
+
+from ..models import AttributeEntity, Attribute
+
+
+class DomainModelTestCase(TestCase):
+
+    fixtures = (
+        'conditions.json',
+        'domain.json',
+        'options.json',
+    )
+
+
+class AttributeEntityTestCase(DomainModelTestCase):
+
+    def get_expected(self, entity):
+        # compute path, uri and parent_collection by walking up the parents
+        path = entity.key
+        parent_collection_id = None
+
+        parent = entity.parent
+        while parent:
+            path = parent.key + '/' + path
+            if parent_collection_id is None and parent.is_collection:
+                parent_collection_id = parent.pk
+            parent = parent.parent
+
+        return path, 'http://example.com/terms/domain/' + path, parent_collection_id
+
+    def assert_subtree(self, root):
+        for entity in AttributeEntity.objects.get(pk=root.pk).get_descendants(include_self=True):
+            self.assertEqual((entity.path, entity.uri, entity.parent_collection_id), self.get_expected(entity))
+
+    def create_subtree(self, parent, depth, width):
+        entities = []
+        for i in range(width):
+            if depth > 1:
+                entity = AttributeEntity(key='entity_%i' % i, parent=parent, is_collection=(depth % 2 == 0))
+                entity.save()
+                entities += [entity] + self.create_subtree(entity, depth - 1, width)
+            else:
+                entity = Attribute(key='attribute_%i' % i, parent=parent, value_type='text')
+                entity.save()
+                entities.append(entity)
+
+        return entities
+
+
+class AttributeEntityTests(AttributeEntityTestCase):
+
+    def test_rename(self):
+        root = AttributeEntity.objects.get(key='set', parent=None)
+        root.key = 'renamed'
+        root.save()
+
+        self.assert_subtree(root)
+        self.assertEqual(AttributeEntity.objects.filter(path__startswith='renamed/').count(), 7)
+        self.assertFalse(AttributeEntity.objects.filter(path__startswith='set/').exists())
+
+    def test_move(self):
+        entity = AttributeEntity.objects.get(path='set/collection')
+        parent = AttributeEntity.objects.get(path='conditions/source')
+
+        entity.parent = parent
+        entity.save()
+
+        self.assert_subtree(parent)
+
+    def test_collection(self):
+        root = AttributeEntity.objects.get(key='conditions', parent=None)
+        root.is_collection = True
+        root.save()
+
+        self.assert_subtree(root)
+
+        root.is_collection = False
+        root.save()
+
+        self.assert_subtree(root)
+
+    def test_rename_num_queries(self):
+        num_queries = []
+        for width in (2, 4):
+            root = AttributeEntity(key='test_%i' % width)
+            root.save()
+            self.create_subtree(root, 3, width)
+
+            root.key = 'renamed_%i' % width
+            with CaptureQueriesContext(connection) as context:
+                root.save()
+
+            self.assert_subtree(root)
+            num_queries.append(len(context))
+
+        # the number of queries does not depend on the number of descendants
+        self.assertEqual(num_queries[0], num_queries[1])
+        self.assertLess(num_queries[0], 20)
+
+
+@benchmark
+class AttributeEntityBenchmarks(AttributeEntityTestCase):
+
+    def test_rename(self):
+        root = AttributeEntity(key='benchmark')
+        root.save()
+        entities = self.create_subtree(root, 4, 6)
+
+        root.key = 'renamed'
+        with measure('Rename of an entity with %i descendants' % len(entities)):
+            root.save()
+
+        self.assert_subtree(root)
@@ -2,7 +2,7 @@ import logging
 
 from django.core.exceptions import ValidationError
 
-from rdmo.core.imports import make_bool, get_value_from_treenode
+from rdmo.core.imports import ImportRegistry, make_bool, get_value_from_treenode
 from rdmo.core.utils import get_ns_map, get_ns_tag, get_uri
 
 from .models import OptionSet, Option
@@ -11,9 +11,12 @@ from .validators import OptionSetUniqueKeyValidator
 log = logging.getLogger(__name__)
 
 
-def import_options(optionsets_node):
+def import_options(optionsets_node, registry=None):
     log.info('Importing options')
-    nsmap = get_ns_map(optionsets_node.getroot())
+    nsmap = get_ns_map(optionsets_node)
+
+    if registry is None:
+        registry = ImportRegistry()
 
     for optionset_node in optionsets_node.findall('optionset'):
         uri = get_uri(optionset_node, nsmap)
@@ -38,6 +41,7 @@ def import_options(optionsets_node):
         else:
             log.info('Optionset saving to "' + str(uri) + '"')
             optionset.save()
+            registry.add(OptionSet, optionset.uri, optionset.pk)
 
         for options_node in optionset_node.findall('options'):
             for option_node in options_node.findall('option'):
@@ -67,3 +71,4 @@ def import_options(optionsets_node):
                 else:
                     log.info('Option saving to "' + str(uri) + '"')
                     option.save()
+                    registry.add(Option, option.uri, option.pk)
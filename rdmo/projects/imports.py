@@ -1,7 +1,11 @@
 import logging
 
-from rdmo.core.imports import get_value_from_treenode
-from rdmo.core.utils import get_ns_map, get_ns_tag
+import defusedxml.ElementTree as ET
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from rdmo.core.imports import ImportRegistry
 from rdmo.domain.models import Attribute
 from rdmo.options.models import Option
 from rdmo.questions.models import Catalog
@@ -12,107 +16,148 @@ from .models import Project, Membership, Snapshot, Value
 log = logging.getLogger(__name__)
 
 
-def import_project(project_node, user):
-    log.info('Importing project')
-    nsmap = get_ns_map(project_node.getroot())
-    project_title = get_value_from_treenode(project_node, 'title')
-    project_created = project_node.find('created').text
-    project_description = get_value_from_treenode(project_node, 'description')
-
-    log.info('Creating new project "' + str(project_title) + '".')
-    project = Project(title=project_title)
-
-    try:
-        project_catalog = project_node.find('catalog')
-        catalog_uri = project_catalog.get(get_ns_tag('dc:uri', nsmap))
-        project.catalog = Catalog.objects.get(uri=catalog_uri)
-    except Catalog.DoesNotExist:
-        project.catalog = Catalog.objects.first()
-        log.info('Project catalog not in db. Created with uri "' + str(catalog_uri) + '".')
-    else:
-        log.info('Project catalog does exist. Loaded from uri ' + str(catalog_uri))
-
-    if project_description:
-        project.description = project_description
-    else:
-        project.description = ''
-
-    project.created = project_created
-    log.info('Project saving with title "' + str(project_title) + '"')
-    project.save()
-
-    # add user to project
-    membership = Membership(project=project, user=user, role='owner')
-    membership.save()
-
-    # loop over snapshots
-    try:
-        for snapshot_node in project_node.find('snapshots').findall('snapshot'):
-            import_snapshot(snapshot_node, nsmap, project)
-    except AttributeError:
-        log.error(str(AttributeError))
-        pass
-    loop_over_values(project_node, nsmap, project)
-
-
-def import_snapshot(snapshot_node, nsmap, project):
-    snapshot = Snapshot(project=project, title=get_value_from_treenode(snapshot_node, 'title'))
-
-    snapshot_description = get_value_from_treenode(snapshot_node, 'description')
-    if snapshot_description:
-        snapshot.description = snapshot_description
-    else:
-        snapshot.description = ''
-
-    snapshot.created = snapshot_node.find('created').text
-    snapshot.save()
-    loop_over_values(snapshot_node, nsmap, project, snapshot)
-
-
-def loop_over_values(parentnode, nsmap, project, snapshot=None):
-    try:
-        for valuenode in parentnode.find('values').findall('value'):
-            import_value(valuenode, nsmap, project, snapshot)
-    except Exception as e:
-        log.error(str(AttributeError))
-        pass
-
-
-def import_value(value_node, nsmap, project, snapshot=None):
-    log.info('Importing value node: ' + str(value_node))
-    attribute_uri = value_node.find('attribute').get(get_ns_tag('dc:uri', nsmap))
-    if attribute_uri is not None:
-        try:
-            attribute = Attribute.objects.get(uri=attribute_uri)
-        except Attribute.DoesNotExist:
-            log.info('Skipping value for Attribute "%s". Attribute not found.' % attribute_uri)
+class ProjectImport(object):
+    '''
+    Imports a project XML file incrementally: the file is parsed with iterparse, the elements
+    are discarded once they are processed, attributes and options are resolved using
+    prefetched dicts and the values are created in batches using bulk_create.
+    '''
+
+    def __init__(self, user, registry=None):
+        self.user = user
+        self.nsmap = {}
+        self.registry = registry or ImportRegistry()
+
+        self.project = None
+        self.snapshot = None
+
+        self.attributes = self.registry.get_uris(Attribute)
+        self.options = self.registry.get_uris(Option)
+
+        self.values = []
+        self.values_count = 0
+        self.skipped_count = 0
+
+    def run(self, source):
+        with transaction.atomic():
+            stack = []
+            for event, element in ET.iterparse(source, events=('start', 'end', 'start-ns')):
+                if event == 'start-ns':
+                    prefix, uri = element
+                    self.nsmap[prefix] = uri
+
+                elif event == 'start':
+                    parent = stack[-1] if stack else None
+                    stack.append(element)
+
+                    if element.tag in ('snapshots', 'values') and parent is not None and parent.tag == 'project':
+                        self.create_project(parent)
+                    elif element.tag == 'values' and parent is not None and parent.tag == 'snapshot':
+                        self.create_snapshot(parent)
+
+                else:
+                    stack.pop()
+                    parent = stack[-1] if stack else None
+
+                    if element.tag == 'value':
+                        self.import_value(element)
+                        parent.remove(element)
+                    elif element.tag == 'values':
+                        self.flush_values()
+                    elif element.tag == 'snapshot':
+                        self.create_snapshot(element)
+                        self.set_created(self.snapshot, element)
+                        self.snapshot = None
+                        parent.remove(element)
+                    elif element.tag == 'project':
+                        self.create_project(element)
+                        self.set_created(self.project, element)
+
+        log.info('Imported project "%s" with %i values (%i skipped).',
+                 self.project.title, self.values_count, self.skipped_count)
+
+        return self.project
+
+    def create_project(self, project_node):
+        if self.project is not None:
             return
 
-        try:
-            value = Value.objects.get(
-                project=project,
-                snapshot=snapshot,
-                attribute=attribute,
-                set_index=get_value_from_treenode(value_node, 'set_index'),
-                collection_index=get_value_from_treenode(value_node, 'collection_index')
-            )
-        except Value.DoesNotExist:
-            value = Value(
-                project=project,
-                snapshot=snapshot,
-                attribute=attribute,
-                set_index=get_value_from_treenode(value_node, 'set_index'),
-                collection_index=get_value_from_treenode(value_node, 'collection_index')
-            )
-
-        value.created = value_node.find('created').text
-        value.text = get_value_from_treenode(value_node, 'text')
+        self.project = Project(
+            title=project_node.findtext('title') or '',
+            description=project_node.findtext('description') or ''
+        )
+
+        catalog_uri = self.get_uri(project_node.find('catalog'))
+        catalog_id = self.registry.get(Catalog, catalog_uri)
+        if catalog_id is not None:
+            self.project.catalog_id = catalog_id
+        else:
+            log.info('Project catalog "%s" not in db. Using the first catalog.', catalog_uri)
+            self.project.catalog = Catalog.objects.first()
+
+        self.project.save()
+
+        # add user to project
+        Membership(project=self.project, user=self.user, role='owner').save()
+
+    def create_snapshot(self, snapshot_node):
+        if self.snapshot is not None:
+            return
+
+        # the current values of the project are copied when the snapshot is saved (see models.py)
+        self.flush_values()
+
+        self.snapshot = Snapshot(
+            project=self.project,
+            title=snapshot_node.findtext('title') or '',
+            description=snapshot_node.findtext('description') or ''
+        )
+        self.snapshot.save()
+
+    def set_created(self, instance, node):
+        # the project/snapshot is saved before its <created> element (which follows the values) is parsed,
+        # update() is used since save() sets created for new instances
+        created = node.findtext('created')
+        if created:
+            type(instance).objects.filter(pk=instance.pk).update(created=created)
+
+    def import_value(self, value_node):
+        attribute_uri = self.get_uri(value_node.find('attribute'))
 
         try:
-            option_uri = value_node.find('option').get(get_ns_tag('dc:uri', nsmap))
-            value.option = Option.objects.get(uri=option_uri)
-        except Option.DoesNotExist:
-            value.option = None
-        value.save()
-    else:
-        log.info('Skipping value without Attribute.')
+            attribute_id = self.attributes[attribute_uri]
+        except KeyError:
+            log.info('Skipping value for Attribute "%s". Attribute not found.', attribute_uri)
+            self.skipped_count += 1
+            return
+
+        timestamp = now()
+        self.values.append(Value(
+            project=self.project,
+            snapshot=self.snapshot,
+            attribute_id=attribute_id,
+            set_index=int(value_node.findtext('set_index') or 0),
+            collection_index=int(value_node.findtext('collection_index') or 0),
+            text=value_node.findtext('text') or '',
+            option_id=self.options.get(self.get_uri(value_node.find('option'))),
+            created=value_node.findtext('created') or timestamp,
+            # the imported values are updated now, like by save(), so that they are found using updated_after
+            updated=timestamp
+        ))
+
+        if len(self.values) >= Value.BULK_CREATE_BATCH_SIZE:
+            self.flush_values()
+
+    def flush_values(self):
+        if self.values:
+            Value.objects.bulk_create(self.values)
+            self.values_count += len(self.values)
+            self.values = []
+
+    def get_uri(self, node):
+        if node is not None and 'dc' in self.nsmap:
+            return node.get('{%s}uri' % self.nsmap['dc'])
+
+
+def import_project(source, user, registry=None):
+    return ProjectImport(user, registry).run(source)
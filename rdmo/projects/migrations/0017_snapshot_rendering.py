@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 03:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_catalog_on_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotRendering',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(editable=False, verbose_name='created')),
+                ('updated', models.DateTimeField(editable=False, verbose_name='updated')),
+                ('name', models.CharField(help_text='The name of this rendering (e.g. answers or view_1).', max_length=128, verbose_name='Name')),
+                ('language', models.CharField(help_text='The language of this rendering.', max_length=8, verbose_name='Language')),
+                ('version', models.CharField(help_text='The version of the template, catalog, conditions and options used for this rendering.', max_length=128, verbose_name='Version')),
+                ('html', models.TextField(blank=True, help_text='The rendered html for this snapshot.', verbose_name='HTML')),
+                ('snapshot', models.ForeignKey(help_text='The snapshot this rendering belongs to.', on_delete=django.db.models.deletion.CASCADE, related_name='renderings', to='projects.Snapshot', verbose_name='Snapshot')),
+            ],
+            options={
+                'verbose_name': 'Snapshot rendering',
+                'verbose_name_plural': 'Snapshot renderings',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='snapshotrendering',
+            unique_together=set([('snapshot', 'name', 'language')]),
+        ),
+    ]
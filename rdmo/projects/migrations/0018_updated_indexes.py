@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 04:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0017_snapshot_rendering'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['updated', 'id'], name='projects_pr_updated_d5e041_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshot',
+            index=models.Index(fields=['updated', 'id'], name='projects_sn_updated_9f075b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='value',
+            index=models.Index(fields=['updated', 'id'], name='projects_va_updated_454ac0_idx'),
+        ),
+    ]
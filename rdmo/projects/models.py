@@ -3,18 +3,23 @@ from __future__ import unicode_literals
 import iso8601
 
 from django.core.urlresolvers import reverse
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.functional import cached_property
-from django.utils.translation import ugettext_lazy as _
+from django.utils.safestring import mark_safe
+from django.utils.timezone import now
+from django.utils.translation import get_language, ugettext_lazy as _
 
-from rdmo.core.models import Model
+from rdmo.core.models import Model, Version
+from rdmo.conditions.models import Condition
 from rdmo.domain.models import Attribute
-from rdmo.options.models import Option
+from rdmo.options.models import OptionSet, Option
 from rdmo.questions.models import Catalog
 
+RENDERINGS_VERSION_NAME = 'projects_renderings'
+
 
 # class ProjectUpload(models.Model):
 #     """This holds a single user uploaded file"""
@@ -47,6 +52,7 @@ class Project(Model):
 
     class Meta:
         ordering = ('title', )
+        indexes = [models.Index(fields=['updated', 'id'])]
         verbose_name = _('Project')
         verbose_name_plural = _('Projects')
         permissions = (('view_project', 'Can view project'),)
@@ -138,6 +144,7 @@ class Snapshot(Model):
 
     class Meta:
         ordering = ('project', '-created')
+        indexes = [models.Index(fields=['updated', 'id'])]
         verbose_name = _('Snapshot')
         verbose_name_plural = _('Snapshots')
         permissions = (('view_snapshot', 'Can view snapshot'),)
@@ -149,18 +156,35 @@ class Snapshot(Model):
         return reverse('project', kwargs={'pk': self.project.pk})
 
     def rollback(self):
-        # remove all current values for this project
-        self.project.values.filter(snapshot=None).delete()
+        with transaction.atomic():
+            # remove all current values for this project
+            self.project.values.filter(snapshot=None).delete()
+
+            # remove the snapshot_id from this snapshots values so they are current values,
+            # they are updated like by save(), so that they are found using updated_after in the api
+            self.values.update(snapshot=None, updated=now())
+
+            # remove all snapshot created later and the current_snapshot
+            # this also removes the values and the renderings of these snapshots
+            self.project.snapshots.filter(created__gte=self.created).delete()
+
+    def get_rendering(self, name, version, render):
+        # since the values of a snapshot do not change, renderings of the snapshot are stored in the
+        # database and re-used as long as the version (e.g. of the template or catalog) matches
+        language = get_language()
 
-        # remove the snapshot_id from this snapshots values so they are current values
-        for value in self.values.all():
-            value.snapshot = None
-            value.save()
+        rendering = self.renderings.filter(name=name, language=language).first()
+        if rendering is not None and rendering.version == version:
+            return mark_safe(rendering.html)
 
-        # remove all snapshot created later and the current_snapshot
-        # this also removes the values of these snapshots
-        for snapshot in self.project.snapshots.filter(created__gte=self.created):
-            snapshot.delete()
+        # update_or_create handles the concurrent creation of the same rendering by two requests
+        html = render()
+        SnapshotRendering.objects.update_or_create(snapshot=self, name=name, language=language, defaults={
+            'version': version,
+            'html': html
+        })
+
+        return mark_safe(html)
 
 
 def create_values_for_snapshot(sender, **kwargs):
@@ -169,18 +193,78 @@ def create_values_for_snapshot(sender, **kwargs):
         # gather values without snapshot
         current_values = Value.objects.filter(project=snapshot.project, snapshot=None)
 
-        # loop over values and save a copy with a fk to the snapshot
-        for value in current_values:
-            value.pk = None
-            value.snapshot = snapshot
-            value.save()
+        # copy the values in chunks using bulk_create, since bulk_create does not call
+        # Value.save(), the created and updated timestamps of the values are preserved
+        with transaction.atomic():
+            values = []
+            for value in current_values.iterator():
+                value.pk = None
+                value.snapshot = snapshot
+                values.append(value)
+
+                if len(values) >= Value.BULK_CREATE_BATCH_SIZE:
+                    Value.objects.bulk_create(values)
+                    values = []
+
+            if values:
+                Value.objects.bulk_create(values)
 
 post_save.connect(create_values_for_snapshot, sender=Snapshot)
 
 
+def bump_renderings_version(**kwargs):
+    Version.objects.bump_version(RENDERINGS_VERSION_NAME)
+
+# besides the structure of the catalogs and the domain, the stored renderings of the snapshots
+# depend on the conditions, the options and the tasks (tasks.models imports this module)
+for model in (Condition, OptionSet, Option, 'tasks.Task'):
+    post_save.connect(bump_renderings_version, sender=model)
+    post_delete.connect(bump_renderings_version, sender=model)
+
+
+@python_2_unicode_compatible
+class SnapshotRendering(Model):
+
+    snapshot = models.ForeignKey(
+        'Snapshot', related_name='renderings',
+        verbose_name=_('Snapshot'),
+        help_text=_('The snapshot this rendering belongs to.')
+    )
+    name = models.CharField(
+        max_length=128,
+        verbose_name=_('Name'),
+        help_text=_('The name of this rendering (e.g. answers or view_1).')
+    )
+    language = models.CharField(
+        max_length=8,
+        verbose_name=_('Language'),
+        help_text=_('The language of this rendering.')
+    )
+    version = models.CharField(
+        max_length=128,
+        verbose_name=_('Version'),
+        help_text=_('The version of the template, catalog, conditions and options used for this rendering.')
+    )
+    html = models.TextField(
+        blank=True,
+        verbose_name=_('HTML'),
+        help_text=_('The rendered html for this snapshot.')
+    )
+
+    class Meta:
+        unique_together = ('snapshot', 'name', 'language')
+        verbose_name = _('Snapshot rendering')
+        verbose_name_plural = _('Snapshot renderings')
+
+    def __str__(self):
+        return '%s / %s / %s' % (self.snapshot, self.name, self.language)
+
+
 @python_2_unicode_compatible
 class Value(Model):
 
+    BULK_CREATE_BATCH_SIZE = 1000
+
     project = models.ForeignKey(
         'Project', related_name='values',
         verbose_name=_('Project'),
@@ -218,6 +302,7 @@ class Value(Model):
     )
 
     class Meta:
+        indexes = [models.Index(fields=['updated', 'id'])]
         verbose_name = _('Value')
         verbose_name_plural = _('Values')
         permissions = (('view_value', 'Can view value'),)
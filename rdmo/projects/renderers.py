@@ -4,6 +4,12 @@ from rdmo.core.renderers import BaseXMLRenderer
 class XMLRenderer(BaseXMLRenderer):
 
     def render_document(self, xml, project):
+        for _ in self.render_stream(xml, project):
+            pass
+
+    def render_stream(self, xml, project):
+        # the values of the project and the snapshots can be iterators,
+        # this method yields after each value so that the output can be streamed
         xml.startElement('project', {
             'xmlns:dc': "http://purl.org/dc/elements/1.1/"
         })
@@ -14,33 +20,45 @@ class XMLRenderer(BaseXMLRenderer):
         if 'snapshots' in project and project['snapshots']:
             xml.startElement('snapshots', {})
             for snapshot in project['snapshots']:
-                self.render_snapshot(xml, snapshot)
+                for _ in self.render_snapshot(xml, snapshot):
+                    yield
             xml.endElement('snapshots')
 
-        if 'values' in project and project['values']:
-            xml.startElement('values', {})
-            for value in project['values']:
-                self.render_value(xml, value)
-            xml.endElement('values')
+        if 'values' in project:
+            for _ in self.render_values(xml, project['values']):
+                yield
 
         self.render_text_element(xml, 'created', {}, project["created"])
         self.render_text_element(xml, 'updated', {}, project["updated"])
         xml.endElement('project')
+        yield
 
     def render_snapshot(self, xml, snapshot):
         xml.startElement('snapshot', {})
         self.render_text_element(xml, 'title', {}, snapshot["title"])
         self.render_text_element(xml, 'description', {}, snapshot["description"])
 
-        if 'values' in snapshot and snapshot['values']:
-            xml.startElement('values', {})
-            for value in snapshot['values']:
-                self.render_value(xml, value)
-            xml.endElement('values')
+        if 'values' in snapshot:
+            for _ in self.render_values(xml, snapshot['values']):
+                yield
 
         self.render_text_element(xml, 'created', {}, snapshot["created"])
         self.render_text_element(xml, 'updated', {}, snapshot["updated"])
         xml.endElement('snapshot')
+        yield
+
+    def render_values(self, xml, values):
+        # the values element is only rendered if there is at least one value
+        values = iter(values or [])
+        value = next(values, None)
+
+        if value is not None:
+            xml.startElement('values', {})
+            while value is not None:
+                self.render_value(xml, value)
+                yield
+                value = next(values, None)
+            xml.endElement('values')
 
     def render_value(self, xml, value):
         xml.startElement('value', {})
@@ -1,30 +1,76 @@
 from __future__ import absolute_import
 import rules
 
+from .models import Membership
+
+# the roles of a user are cached on the user object, which is created for every request
+PROJECT_ROLES_CACHE_ATTRIBUTE = '_project_roles'
+
+
+def get_project_roles_cache(user):
+    try:
+        return getattr(user, PROJECT_ROLES_CACHE_ATTRIBUTE)
+    except AttributeError:
+        setattr(user, PROJECT_ROLES_CACHE_ATTRIBUTE, {})
+        return getattr(user, PROJECT_ROLES_CACHE_ATTRIBUTE)
+
+
+def get_project_roles(user, project):
+    '''
+    Returns the set of roles of the user in the project, using one query per user and project,
+    so that all predicates (and all permissions checked for the project) share this query.
+    '''
+    if project is None or not user.is_authenticated:
+        return set()
+
+    roles_cache = get_project_roles_cache(user)
+    if project.pk not in roles_cache:
+        roles_cache[project.pk] = set(Membership.objects.filter(user=user, project=project)
+                                                        .values_list('role', flat=True))
+
+    return roles_cache[project.pk]
+
+
+def prefetch_project_roles(user, projects):
+    # fetch the roles of the user for a list of projects in one query
+    if not user.is_authenticated:
+        return
+
+    roles_cache = get_project_roles_cache(user)
+    project_ids = [project.pk for project in projects if project.pk not in roles_cache]
+
+    if project_ids:
+        for project_id in project_ids:
+            roles_cache[project_id] = set()
+
+        for project_id, role in Membership.objects.filter(user=user, project__in=project_ids) \
+                                                  .values_list('project_id', 'role'):
+            roles_cache[project_id].add(role)
+
 
 @rules.predicate
 def is_project_member(user, project):
-    return user in project.member
+    return bool(get_project_roles(user, project))
 
 
 @rules.predicate
 def is_project_owner(user, project):
-    return user in project.owners
+    return 'owner' in get_project_roles(user, project)
 
 
 @rules.predicate
 def is_project_manager(user, project):
-    return user in project.managers
+    return 'manager' in get_project_roles(user, project)
 
 
 @rules.predicate
 def is_project_author(user, project):
-    return user in project.authors
+    return 'author' in get_project_roles(user, project)
 
 
 @rules.predicate
 def is_project_guest(user, project):
-    return user in project.guests
+    return 'guest' in get_project_roles(user, project)
 
 is_project_manager_or_owner = is_project_manager | is_project_owner
 is_project_author_or_manager_or_owner = is_project_author | is_project_manager | is_project_owner
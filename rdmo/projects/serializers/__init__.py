@@ -1,6 +1,22 @@
+from django.db import models
+
 from rest_framework import serializers
 
 from ..models import Project, Value
+from ..rules import prefetch_project_roles
+
+
+class ProjectListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        projects = list(data.all() if isinstance(data, models.Manager) else data)
+
+        # fetch the roles of the user for all projects at once, get_read_only uses them
+        request = self.context.get('request')
+        if request:
+            prefetch_project_roles(request.user, projects)
+
+        return super(ProjectListSerializer, self).to_representation(projects)
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -16,6 +32,7 @@ class ProjectSerializer(serializers.ModelSerializer):
             'catalog',
             'read_only'
         )
+        list_serializer_class = ProjectListSerializer
 
     def get_read_only(self, obj):
         request = self.context.get('request')
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
 
 from ..models import Project, Membership, Snapshot, Value
 
@@ -21,14 +22,13 @@ class ProjectSerializer(serializers.ModelSerializer):
         )
 
     def get_members(self, obj):
-        members = {}
-        for key, text in Membership.ROLE_CHOICES:
-            members[key] = []
-            for user in getattr(obj, key + 's'):
-                field = serializers.HyperlinkedRelatedField(view_name='api-v1-accounts:user-detail', read_only=True)
-                print(key)
-                field.bind(key, self)
-                members[key].append(field.to_representation(user))
+        field = serializers.HyperlinkedRelatedField(view_name='api-v1-accounts:user-detail', read_only=True)
+        field.bind('members', self)
+
+        # the memberships are prefetched by the viewset, the links only need the pk of the users
+        members = {key: [] for key, text in Membership.ROLE_CHOICES}
+        for membership in obj.membership_set.all():
+            members[membership.role].append(field.to_representation(PKOnlyObject(pk=membership.user_id)))
 
         return members
 
@@ -40,8 +40,8 @@ class SubsectionSerializer(serializers.ModelSerializer):
         )
 
     def get_entities(self, obj):
-        entities = QuestionEntity.objects.filter(subsection=obj, question__parent=None).order_by('order')
-        return QuestionEntitySerializer(instance=entities, many=True).data
+        # obj is a subsection of a compiled catalog, which already contains the entities in order
+        return QuestionEntitySerializer(instance=obj.entities, many=True).data
 
 
 class SectionSerializer(serializers.ModelSerializer):
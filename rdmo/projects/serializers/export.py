@@ -21,6 +21,12 @@ class ValueSerializer(serializers.ModelSerializer):
         )
 
 
+def serialize_values(values):
+    # the values are serialized lazily, one by one, so that large projects can be streamed
+    for value in values.select_related('attribute', 'option').iterator():
+        yield ValueSerializer(instance=value).data
+
+
 class SnapshotSerializer(serializers.ModelSerializer):
 
     values = serializers.SerializerMethodField()
@@ -36,9 +42,7 @@ class SnapshotSerializer(serializers.ModelSerializer):
         )
 
     def get_values(self, obj):
-        values = Value.objects.filter(snapshot=obj)
-        serializer = ValueSerializer(instance=values, many=True)
-        return serializer.data
+        return serialize_values(Value.objects.filter(snapshot=obj))
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -61,6 +65,4 @@ class ProjectSerializer(serializers.ModelSerializer):
         )
 
     def get_values(self, obj):
-        values = Value.objects.filter(project=obj, snapshot=None)
-        serializer = ValueSerializer(instance=values, many=True)
-        return serializer.data
+        return serialize_values(Value.objects.filter(project=obj, snapshot=None))
@@ -182,22 +182,25 @@ class QuestionEntitySerializer(MarkdownSerializerMixin, serializers.ModelSeriali
 
     def get_prev(self, obj):
         try:
-            return QuestionEntity.objects.get_prev(obj.pk).pk
-        except QuestionEntity.DoesNotExist:
+            return self._get_navigation(obj).get_prev(obj.pk)
+        except KeyError:
             return None
 
     def get_next(self, obj):
         try:
-            return QuestionEntity.objects.get_next(obj.pk).pk
-        except QuestionEntity.DoesNotExist:
+            return self._get_navigation(obj).get_next(obj.pk)
+        except KeyError:
             return None
 
     def get_progress(self, obj):
         try:
-            return QuestionEntity.objects.get_progress(obj.pk)
-        except QuestionEntity.DoesNotExist:
+            return self._get_navigation(obj).get_progress(obj.pk)
+        except KeyError:
             return None
 
+    def _get_navigation(self, obj):
+        return QuestionEntity.objects.get_navigation(obj.subsection.section.catalog_id)
+
     def get_section(self, obj):
         return {
             'id': obj.subsection.section.id,
@@ -202,21 +202,24 @@ angular.module('project_questions')
 
     service.checkConditions = function() {
         if (future.entity.conditions && future.entity.conditions.length) {
-            var results = [],
-                promises = [];
+            var condition_ids = [];
 
-            // fetch the values for these conditions from the server
             angular.forEach(future.entity.conditions, function (condition) {
-                promises.push(resources.values.get({
-                    list_route: 'resolve',
-                    condition: condition.id,
-                    project: service.project.id,
-                }, function(response) {
-                    results.push(response.result);
-                }).$promise);
+                condition_ids.push(condition.id);
             });
 
-            return $q.all(promises).then(function() {
+            // resolve all conditions with one request to the server
+            return resources.values.get({
+                list_route: 'resolve',
+                condition: condition_ids,
+                project: service.project.id,
+            }).$promise.then(function(response) {
+                var results = [];
+
+                angular.forEach(response.results, function(result) {
+                    results.push(result);
+                });
+
                 if (results.length && results.indexOf(true) === -1) {
                     return $q.reject(false);
                 } else {
@@ -229,7 +232,8 @@ angular.module('project_questions')
     };
 
     service.initOptions = function() {
-        promises = [];
+        var condition_ids = [],
+            conditional_optionsets = [];
 
         angular.forEach(future.entity.questions, function(question) {
             if (question.attribute.optionsets.length) {
@@ -247,26 +251,40 @@ angular.module('project_questions')
                             option.hidden = true;
                         });
 
+                        // collect the conditions to resolve them all at once
                         angular.forEach(optionset.conditions, function (condition_id) {
-                            promises.push(resources.values.get({
-                                list_route: 'resolve',
-                                condition: condition_id,
-                                project: service.project.id,
-                            }, function(response) {
-                                if (response.result) {
-                                    // un-hidden all options
-                                    angular.forEach(optionset.options, function(option) {
-                                        option.hidden = false;
-                                    });
-                                }
-                            }).$promise);
+                            if (condition_ids.indexOf(condition_id) === -1) {
+                                condition_ids.push(condition_id);
+                            }
                         });
+
+                        conditional_optionsets.push(optionset);
                     }
                 });
             }
         });
 
-        return $q.all(promises);
+        if (condition_ids.length) {
+            // resolve all conditions with one request to the server
+            return resources.values.get({
+                list_route: 'resolve',
+                condition: condition_ids,
+                project: service.project.id,
+            }).$promise.then(function(response) {
+                angular.forEach(conditional_optionsets, function(optionset) {
+                    angular.forEach(optionset.conditions, function (condition_id) {
+                        if (response.results[condition_id]) {
+                            // un-hidden all options
+                            angular.forEach(optionset.options, function(option) {
+                                option.hidden = false;
+                            });
+                        }
+                    });
+                });
+            });
+        } else {
+            return $q.when();
+        }
     };
 
     service.fetchValues = function() {
@@ -1,6 +1,17 @@
+import tempfile
+
+import defusedxml.ElementTree as ET
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils.dateparse import parse_datetime
 
 from rdmo.core.testing.mixins import TestImportManageMixin
+from rdmo.core.testing.utils import benchmark, measure
+from rdmo.domain.models import Attribute
+
+from ..imports import import_project
+from ..models import Membership, Value
 
 
 class ProjectsManageTestCase(TestCase):
@@ -28,3 +39,88 @@ class ProjectsImportManageTests(TestImportManageMixin, ProjectsManageTestCase):
     compare_import_to_export_ignore_list = ['created', 'updated']
     export_api = 'project_export_xml'
     export_api_kwargs = {'pk': '1'}
+
+
+class ProjectsImportTestCase(ProjectsManageTestCase):
+
+    def write_project_xml(self, filename, count):
+        attribute_uris = list(Attribute.objects.values_list('uri', flat=True))
+
+        with open(filename, 'w') as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+            f.write('<project xmlns:dc="http://purl.org/dc/elements/1.1/">\n')
+            f.write('<title>Benchmark</title><description></description>\n')
+            f.write('<catalog dc:uri="http://example.com/terms/questions/catalog"></catalog>\n')
+            f.write('<values>\n')
+            for i in range(count):
+                f.write(
+                    '<value><attribute dc:uri="%s"></attribute><set_index>0</set_index>'
+                    '<collection_index>%i</collection_index><text>Lorem ipsum %i</text><option></option>'
+                    '<created>2017-04-25T14:52:59.412000Z</created><updated>2017-04-25T14:52:59.412000Z</updated></value>\n'
+                    % (attribute_uris[i % len(attribute_uris)], i, i)
+                )
+            f.write('</values>\n')
+            f.write('<created>2017-04-25T14:52:59.412000Z</created><updated>2017-04-25T14:52:59.412000Z</updated>\n')
+            f.write('</project>\n')
+
+
+class ProjectsImportTests(ProjectsImportTestCase):
+
+    def test_import_project(self):
+        user = User.objects.get(username='user')
+        project = import_project('testing/xml/project.xml', user)
+
+        node = ET.parse('testing/xml/project.xml').getroot()
+        self.assertEqual(project.title, node.findtext('title'))
+        self.assertEqual(project.values.filter(snapshot=None).count(), len(node.find('values').findall('value')))
+        self.assertTrue(Membership.objects.filter(project=project, user=user, role='owner').exists())
+
+        # the created timestamp is taken from the file
+        project.refresh_from_db()
+        self.assertEqual(project.created, parse_datetime(node.findtext('created')))
+
+    def test_import_project_snapshot(self):
+        user = User.objects.get(username='user')
+
+        with tempfile.NamedTemporaryFile(suffix='.xml') as f:
+            f.write(
+                b'<?xml version="1.0" encoding="utf-8"?>\n'
+                b'<project xmlns:dc="http://purl.org/dc/elements/1.1/"><title>Test</title><description></description>'
+                b'<catalog dc:uri="http://example.com/terms/questions/catalog"></catalog>'
+                b'<snapshots><snapshot><title>Snapshot</title><description></description><values></values>'
+                b'<created>2017-02-01T10:00:00.000000Z</created></snapshot></snapshots>'
+                b'<values></values><created>2017-01-30T07:55:13.007000Z</created></project>'
+            )
+            f.flush()
+            project = import_project(f.name, user)
+
+        project.refresh_from_db()
+        self.assertEqual(project.created, parse_datetime('2017-01-30T07:55:13.007000Z'))
+        self.assertEqual(project.snapshots.get().created, parse_datetime('2017-02-01T10:00:00.000000Z'))
+
+    def test_import_project_batches(self):
+        user = User.objects.get(username='user')
+        count = 2 * Value.BULK_CREATE_BATCH_SIZE + 1
+
+        with tempfile.NamedTemporaryFile(suffix='.xml') as f:
+            self.write_project_xml(f.name, count)
+            project = import_project(f.name, user)
+
+        self.assertEqual(project.values.count(), count)
+
+
+@benchmark
+class ProjectsImportBenchmarks(ProjectsImportTestCase):
+
+    value_count = 100000
+
+    def test_import_project(self):
+        user = User.objects.get(username='user')
+
+        with tempfile.NamedTemporaryFile(suffix='.xml') as f:
+            self.write_project_xml(f.name, self.value_count)
+
+            with measure('Import of a project with %i values' % self.value_count):
+                project = import_project(f.name, user)
+
+        self.assertEqual(project.values.count(), self.value_count)
@@ -0,0 +1,259 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+from django.utils.timezone import now
+
+from rdmo.conditions.models import Condition
+from rdmo.core.testing.utils import benchmark, measure
+from rdmo.domain.models import Attribute, AttributeEntity
+from rdmo.options.models import Option
+from rdmo.questions.managers import bump_structure_version
+from rdmo.views.models import View
+
+from ..models import Project, Snapshot, SnapshotRendering, Value
+from ..utils import get_answers_tree, render_answers_tree, render_view
+
+
+class ProjectsModelTestCase(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'conditions.json',
+        'domain.json',
+        'options.json',
+        'questions.json',
+        'tasks.json',
+        'views.json',
+        'projects.json',
+    )
+
+    project_id = 1
+
+    def create_values(self, project, count):
+        # copy the values of the fixture until count values exist for the project
+        values = list(Value.objects.filter(project=project, snapshot=None))
+
+        new_values = []
+        for i in range(count - len(values)):
+            value = values[i % len(values)]
+            new_values.append(Value(
+                project=project,
+                attribute=value.attribute,
+                set_index=value.set_index,
+                collection_index=value.collection_index + 1 + i,
+                text=value.text,
+                option=value.option,
+                created=value.created,
+                updated=value.updated
+            ))
+
+        Value.objects.bulk_create(new_values)
+
+
+class SnapshotTests(ProjectsModelTestCase):
+
+    value_counts = (100, 1000, 10000)
+
+    def test_create_values_for_snapshot(self):
+        project = Project.objects.get(pk=self.project_id)
+        current_values = project.values.filter(snapshot=None).order_by('pk')
+
+        snapshot = Snapshot(project=project, title='snapshot')
+        snapshot.save()
+
+        snapshot_values = snapshot.values.order_by('pk')
+        self.assertEqual(snapshot_values.count(), current_values.count())
+
+        for current_value, snapshot_value in zip(current_values, snapshot_values):
+            self.assertEqual(snapshot_value.attribute_id, current_value.attribute_id)
+            self.assertEqual(snapshot_value.set_index, current_value.set_index)
+            self.assertEqual(snapshot_value.collection_index, current_value.collection_index)
+            self.assertEqual(snapshot_value.text, current_value.text)
+            self.assertEqual(snapshot_value.option_id, current_value.option_id)
+            self.assertEqual(snapshot_value.created, current_value.created)
+            self.assertEqual(snapshot_value.updated, current_value.updated)
+
+    def test_create_values_for_snapshot_batches(self):
+        project = Project.objects.get(pk=self.project_id)
+        count = 2 * Value.BULK_CREATE_BATCH_SIZE + 1
+        self.create_values(project, count)
+
+        snapshot = Snapshot(project=project, title='snapshot')
+        snapshot.save()
+
+        self.assertEqual(snapshot.values.count(), count)
+
+    def test_rollback(self):
+        project = Project.objects.get(pk=self.project_id)
+        values = list(project.values.filter(snapshot=None).values_list('attribute', 'set_index', 'collection_index', 'text'))
+
+        snapshot = Snapshot(project=project, title='snapshot')
+        snapshot.save()
+        later_snapshot = Snapshot(project=project, title='later snapshot')
+        later_snapshot.save()
+
+        project.values.filter(snapshot=None).update(text='changed')
+
+        timestamp = now()
+        snapshot.rollback()
+
+        self.assertEqual(sorted(project.values.filter(snapshot=None).values_list('attribute', 'set_index', 'collection_index', 'text')), sorted(values))
+        self.assertFalse(Snapshot.objects.filter(pk__in=[snapshot.pk, later_snapshot.pk]).exists())
+        self.assertFalse(Value.objects.filter(snapshot__in=[snapshot.pk, later_snapshot.pk]).exists())
+        self.assertFalse(project.values.filter(snapshot=None, updated__lt=timestamp).exists())
+
+    def test_rollback_num_queries(self):
+        project = Project.objects.get(pk=self.project_id)
+
+        num_queries = []
+        for count in self.value_counts:
+            self.create_values(project, count)
+
+            snapshot = Snapshot(project=project, title='snapshot %i' % count)
+            snapshot.save()
+            later_snapshot = Snapshot(project=project, title='later snapshot %i' % count)
+            later_snapshot.save()
+
+            with CaptureQueriesContext(connection) as context:
+                snapshot.rollback()
+
+            self.assertEqual(project.values.filter(snapshot=None).count(), count)
+            num_queries.append(len(context))
+
+        self.assertEqual(len(set(num_queries)), 1, msg=('num_queries', num_queries))
+
+
+@benchmark
+class SnapshotBenchmarks(ProjectsModelTestCase):
+
+    value_counts = (100, 1000, 10000)
+
+    def test_create_values_for_snapshot(self):
+        project = Project.objects.get(pk=self.project_id)
+
+        for count in self.value_counts:
+            self.create_values(project, count)
+
+            with measure('Snapshot creation with %i values' % count):
+                snapshot = Snapshot(project=project, title='snapshot %i' % count)
+                snapshot.save()
+
+            self.assertEqual(snapshot.values.count(), count)
+
+
+class AnswersTreeTests(ProjectsModelTestCase):
+
+    def setUp(self):
+        translation.activate('en')
+
+    def test_get_answers_tree(self):
+        project = Project.objects.get(pk=self.project_id)
+        answers_tree = get_answers_tree(project)
+
+        self.assertTrue(answers_tree['sections'])
+        for section in answers_tree['sections']:
+            self.assertTrue(section['subsections'])
+            for subsection in section['subsections']:
+                self.assertTrue(subsection['entities'])
+
+                # the tree contains the attribute (entity) instances, so that they can be used in the templates
+                for entity in subsection['entities']:
+                    if entity['is_set']:
+                        self.assertIsInstance(entity['attribute'], AttributeEntity)
+                        for question in entity['questions']:
+                            self.assertIsInstance(question['attribute'], Attribute)
+                    else:
+                        self.assertIsInstance(entity['attribute'], Attribute)
+
+    def test_get_answers_tree_num_queries(self):
+        project = Project.objects.get(pk=self.project_id)
+
+        # a cold cache needs one query for the values, one for the structure version, one for the
+        # attribute entities of the question sets and one for each level of the compiled catalog
+        bump_structure_version()
+        with self.assertNumQueries(8):
+            get_answers_tree(project)
+
+        # with a warm cache only the values, the structure version and the attribute entities are queried
+        with self.assertNumQueries(3):
+            get_answers_tree(project)
+
+        # the number of queries does not depend on the number of values
+        self.create_values(project, 1000)
+        project = Project.objects.get(pk=self.project_id)
+
+        with self.assertNumQueries(3):
+            get_answers_tree(project)
+
+
+class SnapshotRenderingTests(ProjectsModelTestCase):
+
+    def setUp(self):
+        translation.activate('en')
+
+        self.project = Project.objects.get(pk=self.project_id)
+        self.snapshot = Snapshot(project=self.project, title='snapshot')
+        self.snapshot.save()
+
+    def test_render_answers_tree(self):
+        html = render_answers_tree(self.project, self.snapshot)
+        self.assertEqual(html, render_answers_tree(self.project))
+        self.assertTrue(self.snapshot.renderings.filter(name='answers', language='en').exists())
+
+        # the stored rendering is used, even if the values of the project change
+        self.project.values.filter(snapshot=None).update(text='changed')
+        with self.assertNumQueries(2):
+            self.assertEqual(render_answers_tree(self.project, self.snapshot), html)
+
+        # the rendering is recomputed if the catalog changes
+        bump_structure_version()
+        render_answers_tree(self.project, self.snapshot)
+        self.assertEqual(self.snapshot.renderings.count(), 1)
+
+    def test_render_view(self):
+        view = View.objects.first()
+
+        html = render_view(view, self.project, self.snapshot)
+        self.assertEqual(html, view.render(self.project, self.snapshot))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(render_view(view, self.project, self.snapshot), html)
+
+        # the rendering is recomputed if the template changes
+        view.template = '<p>changed</p>'
+        view.save()
+        self.assertEqual(render_view(view, self.project, self.snapshot), '<p>changed</p>')
+        self.assertEqual(self.snapshot.renderings.get(name='view_%s' % view.pk).html, '<p>changed</p>')
+
+    def test_render_conditions_and_options(self):
+        for model in (Condition, Option):
+            render_answers_tree(self.project, self.snapshot)
+            version = self.snapshot.renderings.get(name='answers').version
+
+            # the rendering is recomputed if a condition or an option changes
+            model.objects.first().save()
+            render_answers_tree(self.project, self.snapshot)
+            self.assertNotEqual(self.snapshot.renderings.get(name='answers').version, version)
+
+    def test_render_existing_rendering(self):
+        # a rendering which was created by a concurrent request is updated
+        SnapshotRendering.objects.create(snapshot=self.snapshot, name='answers', language='en', version='other')
+
+        html = render_answers_tree(self.project, self.snapshot)
+        self.assertEqual(self.snapshot.renderings.get(name='answers').html, html)
+        self.assertEqual(self.snapshot.renderings.count(), 1)
+
+    def test_rollback_and_delete(self):
+        render_answers_tree(self.project, self.snapshot)
+        other_snapshot = Snapshot(project=self.project, title='other snapshot')
+        other_snapshot.save()
+        render_answers_tree(self.project, other_snapshot)
+
+        other_snapshot.delete()
+        self.assertEqual(SnapshotRendering.objects.count(), 1)
+
+        self.snapshot.rollback()
+        self.assertFalse(SnapshotRendering.objects.exists())
@@ -1,13 +1,20 @@
-from django.test import TestCase
+import defusedxml.ElementTree as ET
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.core.urlresolvers import reverse
 
 from test_generator.core import TestModelStringMixin
 from test_generator.views import TestModelViewMixin, TestViewMixin
 
+from rdmo.core.exports import prettify_xml
 from rdmo.core.testing.mixins import TestImportViewMixin
+from rdmo.core.testing.utils import benchmark, measure
 from rdmo.accounts.utils import set_group_permissions
 
-from ..models import Project, Membership
+from ..models import Project, Membership, Snapshot, Value
+from ..renderers import XMLRenderer
+from ..serializers.export import ProjectSerializer as ExportSerializer
 
 
 class ProjectsViewTestCase(TestCase):
@@ -93,12 +100,13 @@ class ProjectTests(TestModelViewMixin, TestImportViewMixin, TestModelStringMixin
 
             url = reverse(self.url_names['export_view'], kwargs={'pk': instance.pk})
             response = self.client.get(url)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
 
             self.assertEqual(response.status_code, self.status_map['export_view'][username], msg=(
                 ('username', username),
                 ('url', url),
                 ('status_code', response.status_code),
-                ('content', response.content)
+                ('content', content)
             ))
 
 
@@ -192,3 +200,95 @@ class MembershipTests(TestViewMixin, TestModelStringMixin, ProjectsViewTestCase)
                 'pk': instance.pk
             })
             instance.save(update_fields=None)
+
+
+class ProjectImportXMLTests(ProjectsViewTestCase):
+
+    import_file = 'testing/xml/project.xml'
+
+    def setUp(self):
+        self.client.login(username='user', password='user')
+
+    def test_import_xml(self):
+        with open(self.import_file) as f:
+            response = self.client.post(reverse('project_import', kwargs={'format': 'xml'}), {'uploaded_file': f})
+
+        self.assertRedirects(response, reverse('projects'))
+
+        project = Project.objects.get(membership__user__username='user', membership__role='owner')
+        self.assertTrue(project.values.exists())
+
+    @override_settings(IMPORT_PROJECT_MAX_SIZE=1024)
+    def test_import_xml_max_size(self):
+        project_count = Project.objects.count()
+
+        with open(self.import_file) as f:
+            response = self.client.post(reverse('project_import', kwargs={'format': 'xml'}), {'uploaded_file': f})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Project.objects.count(), project_count)
+
+    def test_import_xml_parsing_error(self):
+        project_count = Project.objects.count()
+
+        uploaded_file = SimpleUploadedFile('project.xml', b'<project><title>', content_type='text/xml')
+        response = self.client.post(reverse('project_import', kwargs={'format': 'xml'}), {'uploaded_file': uploaded_file})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Project.objects.count(), project_count)
+
+
+class ProjectExportXMLTestCase(ProjectsViewTestCase):
+
+    project_id = 1
+
+    def setUp(self):
+        self.client.login(username='owner', password='owner')
+
+    def get_elements(self, xmldata):
+        return [(element.tag, element.attrib, (element.text or '').strip()) for element in ET.fromstring(xmldata).iter()]
+
+    def create_values(self, project, count):
+        values = list(Value.objects.filter(project=project, snapshot=None))
+        Value.objects.bulk_create([Value(
+            project=project,
+            attribute=values[i % len(values)].attribute,
+            set_index=0,
+            collection_index=i + 1,
+            text=values[i % len(values)].text,
+            option=values[i % len(values)].option,
+            created=values[i % len(values)].created,
+            updated=values[i % len(values)].updated
+        ) for i in range(count)])
+
+
+class ProjectExportXMLTests(ProjectExportXMLTestCase):
+
+    def test_export_xml(self):
+        project = Project.objects.get(pk=self.project_id)
+        Snapshot(project=project, title='snapshot').save()
+
+        response = self.client.get(reverse('project_export_xml', kwargs={'pk': self.project_id}))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+
+        # the streamed document has the same content as the previous, prettified export
+        xmldata = prettify_xml(XMLRenderer().render(ExportSerializer(project).data))
+        self.assertEqual(self.get_elements(content), self.get_elements(xmldata.encode()))
+
+
+@benchmark
+class ProjectExportXMLBenchmarks(ProjectExportXMLTestCase):
+
+    def test_export_xml(self):
+        project = Project.objects.get(pk=self.project_id)
+        self.create_values(project, 2000)
+        Snapshot(project=project, title='snapshot').save()
+
+        with measure('XML export of a project with 2 x 2000 values, render and prettify'):
+            prettify_xml(XMLRenderer().render(ExportSerializer(project).data))
+
+        with measure('XML export of a project with 2 x 2000 values, streaming'):
+            response = self.client.get(reverse('project_export_xml', kwargs={'pk': self.project_id}))
+            for chunk in response.streaming_content:
+                pass
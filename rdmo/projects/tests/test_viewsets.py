@@ -1,12 +1,22 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
 
 from test_generator.core import TestSingleObjectMixin, TestModelStringMixin
 from test_generator.viewsets import TestReadOnlyModelViewsetMixin, TestViewsetMixin
 
 from rdmo.accounts.utils import set_group_permissions
+from rdmo.core.cache import get_cache_metrics, reset_cache_metrics
+from rdmo.core.testing.utils import benchmark, measure
 from rdmo.questions.models import Catalog, QuestionEntity
 
-from ..models import Project, Value
+from ..models import Project, Membership, Snapshot, Value
 
 
 class ProjectsViewsetTestCase(TestCase):
@@ -129,6 +139,19 @@ class ValueTests(TestViewsetMixin, TestSingleObjectMixin, ProjectsViewsetTestCas
                 'condition': 1
             })
 
+    def _test_resolve_multiple_viewset(self, username):
+        condition_ids = [1, 2, 3]
+
+        url = reverse(self.url_names['viewset'] + '-resolve')
+        response = self.client.get(url, {
+            'project': self.project_id,
+            'condition': condition_ids
+        })
+
+        self.assertEqual(response.status_code, self.status_map['resolve_viewset'][username])
+        if response.status_code == 200:
+            self.assertEqual(sorted(response.data['results'].keys()), condition_ids)
+
 
 class QuestionEntityTests(TestReadOnlyModelViewsetMixin, ProjectsViewsetTestCase):
 
@@ -164,3 +187,229 @@ class CatalogTests(TestReadOnlyModelViewsetMixin, ProjectsViewsetTestCase):
             'owner': 200, 'manager': 200, 'author': 200, 'guest': 200, 'user': 200, 'anonymous': 403
         }
     }
+
+
+class ProjectRolesTests(ProjectsViewsetTestCase):
+
+    def test_rules(self):
+        user = User.objects.get(username='author')
+        project = Project.objects.get(pk=1)
+
+        # all permissions for the project use one query for the roles of the user
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm('projects.view_project_object', project))
+            self.assertFalse(user.has_perm('projects.change_project_object', project))
+            self.assertTrue(user.has_perm('projects.add_value_object', project))
+            self.assertFalse(user.has_perm('projects.export_project_object', project))
+
+        # the roles are cached on the user object, a new user object fetches them again
+        user = User.objects.get(username='author')
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm('projects.view_project_object', project))
+
+    def get_project_list(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('internal-projects:project-list'))
+            self.assertEqual(response.status_code, 200)
+
+        return response.json(), len(context)
+
+    def test_project_list(self):
+        self.client.login(username='author', password='author')
+        self.get_project_list()
+        projects, queries = self.get_project_list()
+        self.assertEqual(len(projects), 1)
+
+        user = User.objects.get(username='author')
+        catalog = Project.objects.get(pk=1).catalog
+        for i in range(20):
+            project = Project.objects.create(title='project_%i' % i, catalog=catalog)
+            Membership.objects.create(project=project, user=user, role=('guest', 'author')[i % 2])
+
+        projects, more_queries = self.get_project_list()
+
+        # the number of queries does not depend on the number of projects
+        self.assertEqual(len(projects), 21)
+        self.assertEqual(more_queries, queries)
+
+        read_only = {project['title']: project['read_only'] for project in projects}
+        self.assertFalse(read_only[Project.objects.get(pk=1).title])
+        self.assertTrue(read_only['project_0'])
+        self.assertFalse(read_only['project_1'])
+
+
+class ApiCacheTestCase(ProjectsViewsetTestCase):
+
+    def setUp(self):
+        caches['api'].clear()
+        self.client.login(username='owner', password='owner')
+
+    def get_entity(self, pk):
+        response = self.client.get(reverse('internal-projects:entity-detail', args=[pk]))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def get_entities_hit_rate(self, count, global_invalidation=False):
+        # request the entities in turn, with one edit per 10 requests
+        entities = list(QuestionEntity.objects.filter(question__parent=None))
+
+        caches['api'].clear()
+        reset_cache_metrics('QuestionEntityViewSet')
+
+        for i in range(count):
+            self.get_entity(entities[(i * 7) % len(entities)].pk)
+
+            if i % 10 == 0:
+                entity = entities[(i * 3) % len(entities)]
+                entity.help_en = 'edit %i' % i
+                entity.save()
+
+                if global_invalidation:
+                    # the previous behavior of QuestionEntity.save
+                    caches['api'].clear()
+
+        return get_cache_metrics('QuestionEntityViewSet')['hit_rate']
+
+
+class ApiCacheTests(ApiCacheTestCase):
+
+    def test_entity_cache_invalidation(self):
+        entity, other_entity = QuestionEntity.objects.filter(question__parent=None)[:2]
+
+        self.get_entity(entity.pk)
+        self.get_entity(other_entity.pk)
+        self.assertEqual(get_cache_metrics('QuestionEntityViewSet')['misses'], 2)
+
+        entity.help_en = 'changed'
+        entity.save()
+
+        # only the response for the changed entity is invalidated
+        self.assertIn('changed', self.get_entity(entity.pk).content.decode())
+        self.get_entity(other_entity.pk)
+        self.assertEqual(get_cache_metrics('QuestionEntityViewSet'), {'hits': 1, 'misses': 3, 'hit_rate': 0.25})
+
+    def test_entity_cache_hit_queries(self):
+        entity = QuestionEntity.objects.filter(question__parent=None).first()
+        self.get_entity(entity.pk)
+
+        # a cached response does not query the question entities
+        with CaptureQueriesContext(connection) as context:
+            self.get_entity(entity.pk)
+
+        self.assertEqual(get_cache_metrics('QuestionEntityViewSet')['hits'], 1)
+        self.assertFalse([query for query in context.captured_queries if 'questions_' in query['sql']])
+
+    def test_entity_cache_invalidation_navigation(self):
+        entity, other_entity = QuestionEntity.objects.filter(question__parent=None)[:2]
+
+        self.get_entity(other_entity.pk)
+
+        # moving an entity changes prev/next of the other entities in the catalog
+        entity.order = 1000
+        entity.save()
+
+        self.get_entity(other_entity.pk)
+        self.assertEqual(get_cache_metrics('QuestionEntityViewSet')['misses'], 2)
+
+    def test_entity_cache_hit_rate(self):
+        self.assertGreater(self.get_entities_hit_rate(100), self.get_entities_hit_rate(100, global_invalidation=True))
+
+
+@benchmark
+class ApiCacheBenchmarks(ApiCacheTestCase):
+
+    def test_entity_cache(self):
+        for label, global_invalidation in (('global', True), ('targeted', False)):
+            with measure('500 requests of cached entity api responses, %s invalidation' % label):
+                self.get_entities_hit_rate(500, global_invalidation)
+
+
+class ApiPaginationTests(ProjectsViewsetTestCase):
+
+    def setUp(self):
+        self.client.login(username='api', password='api')
+
+    def get_pages(self, url_name, query_params={}):
+        pages, queries = [], []
+
+        url = reverse(url_name)
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, query_params)
+                self.assertEqual(response.status_code, 200)
+
+            # the query params are part of the next link
+            query_params = {}
+
+            pages.append(response.json()['results'])
+            queries.append(len(context))
+            url = response.json()['next']
+
+        return pages, queries
+
+    def test_value_pages(self):
+        # half of the values have the same timestamp, those are ordered by id
+        values = Value.objects.order_by('id')
+        Value.objects.filter(pk__in=values.values_list('pk', flat=True)[::2]).update(updated=now())
+
+        pages, queries = self.get_pages('api-v1-projects:value-list', {'page_size': 10})
+
+        self.assertEqual(len(pages), (values.count() + 9) // 10)
+        self.assertTrue(all(len(page) == 10 for page in pages[:-1]))
+        self.assertEqual([value['id'] for page in pages for value in page],
+                         list(Value.objects.order_by('updated', 'id').values_list('id', flat=True)))
+
+        # every page costs the same number of queries, regardless of its position
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_value_pages_updated_after(self):
+        updated_after = now()
+        Value.objects.filter(pk__in=[1, 2, 3]).update(updated=updated_after + timedelta(seconds=1))
+
+        pages, queries = self.get_pages('api-v1-projects:value-list', {
+            'page_size': 2,
+            'updated_after': updated_after.isoformat()
+        })
+        self.assertEqual([value['id'] for page in pages for value in page], [1, 2, 3])
+
+        pages, queries = self.get_pages('api-v1-projects:value-list', {
+            'updated_after': updated_after.date().isoformat()
+        })
+        self.assertEqual(len(pages[0]), Value.objects.filter(updated__date__gte=updated_after.date()).count())
+
+    def test_value_pages_updated_after_snapshot(self):
+        updated_after = now()
+
+        # the values copied for a new snapshot are reported, although they keep their updated timestamps
+        snapshot = Snapshot.objects.create(project=Project.objects.get(pk=1), title='snapshot')
+        pages, queries = self.get_pages('api-v1-projects:value-list', {'updated_after': updated_after.isoformat()})
+
+        value_ids = set(snapshot.values.values_list('id', flat=True))
+        self.assertTrue(value_ids)
+        self.assertEqual({value['id'] for page in pages for value in page}, value_ids)
+
+    def test_value_pages_invalid(self):
+        url = reverse('api-v1-projects:value-list')
+        self.assertEqual(self.client.get(url, {'cursor': 'invalid'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'updated_after': 'invalid'}).status_code, 400)
+
+    def test_project_pages(self):
+        self.get_pages('api-v1-projects:project-list')
+        pages, queries = self.get_pages('api-v1-projects:project-list', {'page_size': 2})
+
+        user = User.objects.get(username='author')
+        catalog = Project.objects.get(pk=1).catalog
+        for i in range(20):
+            project = Project.objects.create(title='project_%i' % i, catalog=catalog)
+            Membership.objects.create(project=project, user=user, role=('guest', 'author')[i % 2])
+
+        more_pages, more_queries = self.get_pages('api-v1-projects:project-list', {'page_size': 2})
+
+        # the members and snapshots of the projects are prefetched for each page
+        self.assertEqual(sum(len(page) for page in more_pages), Project.objects.count())
+        self.assertEqual(set(more_queries), {queries[0]})
+
+        members = {project['title']: project['members'] for page in more_pages for project in page}
+        self.assertEqual(len(members['project_0']['guest']), 1)
+        self.assertEqual(len(members['project_1']['author']), 1)
+        self.assertIn(reverse('api-v1-accounts:user-detail', args=[user.pk]), members['project_1']['author'][0])
@@ -2,6 +2,8 @@ from django.conf.urls import url, include
 
 from rest_framework import routers
 
+from rdmo.core.views import export_job
+
 from .views import (
     ProjectsView,
     ProjectExportXMLView,
@@ -53,6 +55,10 @@ projects_patterns = [
     url(r'^(?P<project_id>[0-9]+)/snapshots/(?P<pk>[0-9]+)/update/$', SnapshotUpdateView.as_view(), name='snapshot_update'),
     url(r'^(?P<project_id>[0-9]+)/snapshots/(?P<pk>[0-9]+)/rollback/$', SnapshotRollbackView.as_view(), name='snapshot_rollback'),
 
+    # status and download of export jobs, the projects urls are included by every instance,
+    # so the jobs of all exports (including domain, catalogs, etc.) use this url
+    url(r'^exports/(?P<job_id>[0-9a-f]{32})/$', export_job, name='export_job'),
+
     url(r'^(?P<pk>[0-9]+)/answers/$', ProjectAnswersView.as_view(), name='project_answers'),
     url(r'^(?P<pk>[0-9]+)/answers/export/(?P<format>[a-z]+)/$', ProjectAnswersExportView.as_view(), name='project_answers_export'),
 
@@ -1,13 +1,52 @@
+from django.template.loader import render_to_string
+
+from rdmo.core.models import Version
+from rdmo.domain.models import AttributeEntity
+from rdmo.questions.managers import STRUCTURE_VERSION_NAME
+from rdmo.questions.utils import get_compiled_catalog
+
+from .models import RENDERINGS_VERSION_NAME
+
+
+def render_answers_tree(project, snapshot=None):
+    def render():
+        return render_to_string('projects/project_answers_tree.html', {
+            'answers_tree': get_answers_tree(project, snapshot)
+        })
+
+    if snapshot is None:
+        return render()
+    else:
+        # the rendering of a snapshot only changes with the structure, the conditions and the options
+        return snapshot.get_rendering('answers', get_renderings_version(), render)
+
+
+def render_view(view, project, snapshot=None):
+    if snapshot is None:
+        return view.render(project)
+    else:
+        # the rendering of a snapshot only changes with the template, the structure, the conditions and the options
+        version = '%s_%s' % (view.get_template_hash(), get_renderings_version())
+        return snapshot.get_rendering('view_%s' % view.pk, version, lambda: view.render(project, snapshot))
+
+
+def get_renderings_version():
+    # both versions are stored in the database, so that all processes use the same version
+    return Version.objects.get_version(STRUCTURE_VERSION_NAME, RENDERINGS_VERSION_NAME)
+
+
 def get_answers_tree(project, snapshot=None):
 
     values = {}
     valuesets = {}
+    attributes = {}
 
     # first we loop over all values of this snapshot
     # the values are gathered in one nested dict {attribute_id: set_index: collection_index: value}
     # additionally all values with an attribute labeled 'id' are collected in a dict {attribute.parent.id: value.text}
+    # and the attributes of the values are collected in a dict {attribute.id: attribute}
 
-    for value in project.values.filter(snapshot=snapshot):
+    for value in project.values.filter(snapshot=snapshot).select_related('attribute', 'option'):
         if value.attribute:
             # put values in a dict labled by the values attibute id, the set_index and the collection_index
             if value.attribute.id not in values:
@@ -18,22 +57,27 @@ def get_answers_tree(project, snapshot=None):
                 values[value.attribute.id][value.set_index][value.collection_index] = {}
 
             values[value.attribute.id][value.set_index][value.collection_index] = value
+            attributes[value.attribute.id] = value.attribute
 
             # put all values with an attribute labeled 'id' in a valuesets dict labeled by the parent attribute entities id
             if value.attribute.key == 'id':
-                if value.attribute.parent.id not in valuesets:
-                    valuesets[value.attribute.parent.id] = {}
+                if value.attribute.parent_id not in valuesets:
+                    valuesets[value.attribute.parent_id] = {}
+
+                valuesets[value.attribute.parent_id][value.set_index] = value.text
 
-                valuesets[value.attribute.parent.id][value.set_index] = value.text
+    # then we loop over sections, subsections and entities to collect questions and answers,
+    # the structure of the catalog is taken from the cached compiled catalog
 
-    # then we loop over sections, subsections and entities to collect questions and answers
+    compiled_catalog = get_compiled_catalog(project.catalog_id)
 
     sections = []
-    for catalog_section in project.catalog.sections.order_by('order'):
+    set_entities = []
+    for catalog_section in compiled_catalog.sections:
         subsections = []
-        for catalog_subsection in catalog_section.subsections.order_by('order'):
+        for catalog_subsection in catalog_section.subsections:
             entities = []
-            for catalog_entity in catalog_subsection.entities.filter(question__parent=None).order_by('order'):
+            for catalog_entity in catalog_subsection.entities:
 
                 if catalog_entity.attribute_entity:
 
@@ -41,22 +85,22 @@ def get_answers_tree(project, snapshot=None):
 
                         attribute_entity = catalog_entity.attribute_entity
 
-                        if attribute_entity.parent_collection or attribute_entity.is_collection:
+                        if attribute_entity.parent_collection_id or attribute_entity.is_collection:
 
-                            if attribute_entity.parent_collection:
-                                collection = attribute_entity.parent_collection
+                            if attribute_entity.parent_collection_id:
+                                collection_id = attribute_entity.parent_collection_id
                             else:
-                                collection = attribute_entity
+                                collection_id = attribute_entity.id
 
                             questions = []
-                            for catalog_question in catalog_entity.questions.order_by('order'):
+                            for catalog_question in catalog_entity.questions:
 
                                 # for a questionset collection loop over valuesets
-                                if collection.id in valuesets:
+                                if collection_id in valuesets:
 
                                     sets = []
-                                    for set_index in valuesets[collection.id]:
-                                        valueset = valuesets[collection.id][set_index]
+                                    for set_index in valuesets[collection_id]:
+                                        valueset = valuesets[collection_id][set_index]
 
                                         # try to get the values for this question's attribute_entity and set_index
                                         answers = get_answers(values, catalog_question.attribute_entity.id, set_index)
@@ -71,14 +115,15 @@ def get_answers_tree(project, snapshot=None):
                                         questions.append({
                                             'sets': sets,
                                             'text': catalog_question.text,
-                                            'attribute': catalog_question.attribute_entity.attribute,
+                                            'attribute': attributes[catalog_question.attribute_entity.id],
                                             'is_collection': catalog_question.attribute_entity.is_collection or catalog_question.widget_type == 'checkbox'
                                         })
 
                             if questions:
+                                set_entities.append(catalog_entity.attribute_entity.id)
                                 entities.append({
                                     'questions': questions,
-                                    'attribute': catalog_entity.attribute_entity,
+                                    'attribute': catalog_entity.attribute_entity.id,
                                     'is_set': True,
                                     'is_collection': True,
                                 })
@@ -86,7 +131,7 @@ def get_answers_tree(project, snapshot=None):
                         else:
                             # # for a questionset loop over questions
                             questions = []
-                            for catalog_question in catalog_entity.questions.order_by('order'):
+                            for catalog_question in catalog_entity.questions:
 
                                 # try to get the values for this question's attribute_entity
                                 answers = get_answers(values, catalog_question.attribute_entity.id)
@@ -94,15 +139,16 @@ def get_answers_tree(project, snapshot=None):
                                 if answers:
                                     questions.append({
                                         'text': catalog_question.text,
-                                        'attribute': catalog_question.attribute_entity.attribute,
+                                        'attribute': attributes[catalog_question.attribute_entity.id],
                                         'answers': answers,
                                         'is_collection': catalog_question.attribute_entity.is_collection or catalog_question.widget_type == 'checkbox'
                                     })
 
                             if questions:
+                                set_entities.append(catalog_entity.attribute_entity.id)
                                 entities.append({
                                     'questions': questions,
-                                    'attribute': catalog_entity.attribute_entity,
+                                    'attribute': catalog_entity.attribute_entity.id,
                                     'is_set': True,
                                     'is_collection': False
                                 })
@@ -116,7 +162,7 @@ def get_answers_tree(project, snapshot=None):
                         if answers:
                             entities.append({
                                 'text': catalog_entity.question.text,
-                                'attribute': catalog_entity.attribute_entity.attribute,
+                                'attribute': attributes[catalog_entity.attribute_entity.id],
                                 'answers': answers,
                                 'is_set': False,
                                 'is_collection': catalog_entity.attribute_entity.is_collection or catalog_entity.question.widget_type == 'checkbox'
@@ -134,6 +180,16 @@ def get_answers_tree(project, snapshot=None):
                 'subsections': subsections
             })
 
+    # the attribute entities of the question sets are not part of the values,
+    # so they are fetched in one query and replace their ids in the tree
+    if set_entities:
+        attribute_entities = AttributeEntity.objects.in_bulk(set_entities)
+        for section in sections:
+            for subsection in section['subsections']:
+                for entity in subsection['entities']:
+                    if entity['is_set']:
+                        entity['attribute'] = attribute_entities[entity['attribute']]
+
     return {'sections': sections}
 
 
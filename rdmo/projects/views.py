@@ -1,19 +1,21 @@
 import logging
 
+from defusedxml import DefusedXmlException
+from defusedxml.ElementTree import ParseError
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse, reverse_lazy
 from django.db import models
-from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.http import HttpResponseRedirect, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.template import TemplateSyntaxError
 from django.views.generic import ListView, TemplateView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 
-from rdmo.core.exports import prettify_xml
-from rdmo.core.imports import handle_uploaded_file, validate_xml
+from rdmo.core.imports import get_xml_roottag
 from rdmo.core.utils import render_to_format
 from rdmo.core.views import ObjectPermissionMixin, RedirectViewMixin
 from rdmo.projects.imports import import_project
@@ -24,7 +26,7 @@ from .models import Project, Membership, Snapshot
 from .forms import ProjectForm, SnapshotCreateForm, MembershipCreateForm
 from .serializers.export import ProjectSerializer as ExportSerializer
 from .renderers import XMLRenderer
-from .utils import get_answers_tree
+from .utils import render_answers_tree, render_view
 
 log = logging.getLogger(__name__)
 
@@ -99,8 +101,7 @@ class ProjectExportXMLView(ObjectPermissionMixin, DetailView):
 
     def render_to_response(self, context, **response_kwargs):
         serializer = ExportSerializer(context['project'])
-        xmldata = XMLRenderer().render(serializer.data)
-        response = HttpResponse(prettify_xml(xmldata), content_type="application/xml")
+        response = StreamingHttpResponse(XMLRenderer().stream(serializer.data), content_type="application/xml")
         response['Content-Disposition'] = 'filename="%s.xml"' % context['project'].title
         return response
 
@@ -116,27 +117,29 @@ class ProjectImportXMLView(LoginRequiredMixin, TemplateView):
 
     def post(self, request, *args, **kwargs):
         try:
-            request.FILES['uuploaded_file']
+            uploaded_file = request.FILES['uploaded_file']
         except KeyError:
             return HttpResponseRedirect(self.success_url)
-        else:
-            tempfilename = handle_uploaded_file(request.FILES['uploaded_file'])
 
-        roottag, xmltree = validate_xml(tempfilename)
-        if roottag == 'project':
-            self.import_project(xmltree, request)
-            return HttpResponseRedirect(self.success_url)
-        else:
-            log.info('Xml parsing error. Import failed.')
+        try:
+            if get_xml_roottag(uploaded_file, settings.IMPORT_PROJECT_MAX_SIZE) == 'project':
+                # the uploaded file is parsed incrementally by import_project
+                self.import_project(uploaded_file, request)
+                return HttpResponseRedirect(self.success_url)
+        except (ParseError, DefusedXmlException) as e:
+            log.info('Xml parsing error. Import failed: ' + str(e))
             return render(request, self.parsing_error_template, status=400)
 
-    def import_project(self, xml_root, request):
+        log.info('Xml parsing error. Import failed: not a project file.')
+        return render(request, self.parsing_error_template, status=400)
+
+    def import_project(self, source, request):
         try:
             user = request.user
         except User.DoesNotExist:
             log.info('Unable to detect user name. Import failed.')
         else:
-            import_project(xml_root, user)
+            import_project(source, user)
 
 
 class SnapshotCreateView(ObjectPermissionMixin, RedirectViewMixin, CreateView):
@@ -237,7 +240,7 @@ class ProjectAnswersView(ObjectPermissionMixin, DetailView):
         context.update({
             'current_snapshot': current_snapshot,
             'snapshots': list(context['project'].snapshots.values('id', 'title')),
-            'answers_tree': get_answers_tree(context['project'], current_snapshot),
+            'rendered_answers_tree': render_answers_tree(context['project'], current_snapshot),
             'export_formats': settings.EXPORT_FORMATS
         })
 
@@ -259,7 +262,7 @@ class ProjectAnswersExportView(ObjectPermissionMixin, DetailView):
         context.update({
             'format': self.kwargs.get('format'),
             'title': context['project'].title,
-            'answers_tree': get_answers_tree(context['project'], current_snapshot)
+            'rendered_answers_tree': render_answers_tree(context['project'], current_snapshot)
         })
         return context
 
@@ -286,7 +289,7 @@ class ProjectViewView(ObjectPermissionMixin, DetailView):
             raise Http404
 
         try:
-            context['rendered_view'] = context['view'].render(context['project'], context['current_snapshot'])
+            context['rendered_view'] = render_view(context['view'], context['project'], context['current_snapshot'])
         except TemplateSyntaxError:
             context['rendered_view'] = None
 
@@ -316,7 +319,7 @@ class ProjectViewExportView(ObjectPermissionMixin, DetailView):
             raise Http404
 
         try:
-            context['rendered_view'] = context['view'].render(context['project'], context['current_snapshot'])
+            context['rendered_view'] = render_view(context['view'], context['project'], context['current_snapshot'])
         except TemplateSyntaxError:
             context['rendered_view'] = None
 
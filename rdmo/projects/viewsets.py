@@ -7,13 +7,16 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_404_NOT_FOUND
 from rest_framework.exceptions import ValidationError
 from rest_framework.authentication import SessionAuthentication, TokenAuthentication
-from rest_framework_extensions.cache.mixins import RetrieveCacheResponseMixin
 
 from django_filters.rest_framework import DjangoFilterBackend
 
+from rdmo.core.cache import RetrieveGenerationCacheResponseMixin
+from rdmo.core.filters import UpdatedAfterFilterBackend
+from rdmo.core.pagination import KeysetPagination
 from rdmo.core.permissions import HasModelPermission, HasObjectPermission
 from rdmo.conditions.models import Condition
 from rdmo.questions.models import Catalog, QuestionEntity
+from rdmo.questions.utils import get_compiled_catalog
 
 from .models import Project, Snapshot, Value
 
@@ -79,16 +82,24 @@ class ValueViewSet(ModelViewSet):
             except Snapshot.DoesNotExist as e:
                 raise ValidationError({'snapshot': [e.message]})
 
-    def get_condition(self, request):
-        condition_id = request.GET.get('condition')
+    def get_conditions(self, request):
+        condition_ids = request.GET.getlist('condition')
 
-        if condition_id is None:
+        if not condition_ids:
             raise ValidationError({'condition': [_('This field is required.')]})
         else:
             try:
-                return Condition.objects.get(pk=condition_id)
-            except Condition.DoesNotExist as e:
-                raise ValidationError({'condition': [e.message]})
+                condition_ids = set([int(condition_id) for condition_id in condition_ids])
+            except ValueError:
+                raise ValidationError({'condition': [_('A valid integer is required.')]})
+
+            conditions = Condition.objects.select_related('source').filter(pk__in=condition_ids)
+
+            missing_ids = condition_ids - set([condition.id for condition in conditions])
+            if missing_ids:
+                raise ValidationError({'condition': [_('Condition matching query does not exist.')]})
+
+            return conditions
 
     def get_permission_object(self):
         return self.project
@@ -103,16 +114,29 @@ class ValueViewSet(ModelViewSet):
     def resolve(self, request):
         self.project = self.get_project(request)
 
-        condition = self.get_condition(request)
-        return Response({'result': condition.resolve(self.project, self.snapshot)})
+        # resolve all requested conditions in one pass
+        conditions = self.get_conditions(request)
+        results = Condition.resolve_conditions(conditions, self.project, self.snapshot)
 
+        response = {'results': results}
+        if len(results) == 1:
+            # a single condition also yields the plain result
+            response['result'] = list(results.values())[0]
 
-class QuestionEntityViewSet(RetrieveCacheResponseMixin, ReadOnlyModelViewSet):
+        return Response(response)
+
+
+class QuestionEntityViewSet(RetrieveGenerationCacheResponseMixin, ReadOnlyModelViewSet):
     permission_classes = (IsAuthenticated, DjangoModelPermissions)
 
-    queryset = QuestionEntity.objects.filter(question__parent=None)
+    queryset = QuestionEntity.objects.filter(question__parent=None).select_related('subsection__section')
     serializer_class = QuestionEntitySerializer
 
+    def get_cache_generation_names(self):
+        # the response depends on the entity itself and on the navigation, the navigation generation is
+        # shared by all catalogs, so that the catalog of the entity does not need to be looked up
+        return ['questionentity_%s' % self.kwargs.get('pk'), 'questions_navigation']
+
     @list_route(methods=['get'], permission_classes=[DjangoModelPermissions])
     def first(self, request, pk=None):
         try:
@@ -138,19 +162,32 @@ class QuestionEntityViewSet(RetrieveCacheResponseMixin, ReadOnlyModelViewSet):
             return Response({'message': e.message}, status=HTTP_404_NOT_FOUND)
 
 
-class CatalogViewSet(RetrieveCacheResponseMixin, ReadOnlyModelViewSet):
+class CatalogViewSet(RetrieveGenerationCacheResponseMixin, ReadOnlyModelViewSet):
     permission_classes = (IsAuthenticated, )
     queryset = Catalog.objects.all()
     serializer_class = CatalogSerializer
 
+    def get_cache_generation_names(self):
+        return ['catalog_%s' % self.kwargs.get('pk')]
+
+    def get_object(self):
+        catalog = super(CatalogViewSet, self).get_object()
+        return get_compiled_catalog(catalog.pk)
+
+    def list(self, request, *args, **kwargs):
+        catalog_ids = self.filter_queryset(self.get_queryset()).values_list('pk', flat=True)
+        serializer = self.get_serializer([get_compiled_catalog(catalog_id) for catalog_id in catalog_ids], many=True)
+        return Response(serializer.data)
+
 
 class ProjectApiViewSet(ReadOnlyModelViewSet):
     permission_classes = (HasModelPermission, )
     authentication_classes = (SessionAuthentication, TokenAuthentication)
-    queryset = Project.objects.all()
+    queryset = Project.objects.prefetch_related('snapshots', 'membership_set')
     serializer_class = ProjectApiSerializer
+    pagination_class = KeysetPagination
 
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, UpdatedAfterFilterBackend)
     filter_fields = (
         'title',
         'user',
@@ -166,8 +203,9 @@ class SnapshotApiViewSet(ReadOnlyModelViewSet):
     authentication_classes = (SessionAuthentication, TokenAuthentication)
     queryset = Snapshot.objects.all()
     serializer_class = SnapshotApiSerializer
+    pagination_class = KeysetPagination
 
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, UpdatedAfterFilterBackend)
     filter_fields = (
         'title',
         'project'
@@ -179,8 +217,11 @@ class ValueApiViewSet(ReadOnlyModelViewSet):
     authentication_classes = (SessionAuthentication, TokenAuthentication)
     queryset = Value.objects.all()
     serializer_class = ValueApiSerializer
+    pagination_class = KeysetPagination
 
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, UpdatedAfterFilterBackend)
+    # the values copied for a snapshot keep their updated timestamp, they are new with the snapshot
+    updated_after_fields = ('updated', 'snapshot__created')
     filter_fields = (
         'project',
         'snapshot',
@@ -1,200 +1,307 @@
 import logging
+import time
 
-from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.encoding import force_text
+from django.utils.timezone import now
 
-from rdmo.core.utils import get_ns_map, get_ns_tag, get_uri
-from rdmo.core.imports import get_value_from_treenode
+from rdmo.core.cache import bump_generations
+from rdmo.core.imports import ImportRegistry, get_value_from_treenode
+from rdmo.core.utils import bulk_create_children, bulk_update, get_ns_map, get_ns_tag, get_uri, get_uri_prefix
 from rdmo.domain.models import AttributeEntity
 
-from .models import Catalog, Section, Subsection, QuestionEntity, Question
-from .validators import CatalogUniqueKeyValidator, SectionUniquePathValidator, SubsectionUniquePathValidator, QuestionEntityUniquePathValidator, QuestionUniquePathValidator
+from .managers import bump_structure_version
+from .models import Catalog, Section, Subsection, QuestionEntity, Question, update_descendant_paths
 
 log = logging.getLogger(__name__)
 
 
-def import_catalog(catalog_node):
-    nsmap = get_ns_map(catalog_node.getroot())
-    catalog_uri = get_uri(catalog_node, nsmap)
-    log.info('Importing catalog ' + catalog_uri)
-
-    try:
-        catalog = Catalog.objects.get(uri=catalog_uri)
-    except Catalog.DoesNotExist:
-        catalog = Catalog()
-        log.info('Catalog not in db. Created with uri ' + str(catalog_uri))
-    else:
-        log.info('Catalog does exist. Loaded from uri ' + str(catalog_uri))
-
-    catalog.uri_prefix = catalog_uri.split('/questions/')[0]
-    catalog.key = catalog_uri.split('/')[-1]
-    catalog.comment = get_value_from_treenode(catalog_node, get_ns_tag('dc:comment', nsmap))
-    catalog.order = get_value_from_treenode(catalog_node, 'order')
-
-    for element in catalog_node.findall('title'):
-        setattr(catalog, 'title_' + element.attrib['lang'], element.text)
-
-    try:
-        CatalogUniqueKeyValidator(catalog).validate()
-    except ValidationError:
-        log.info('Catalog not saving "' + str(catalog_uri) + '" due to validation error')
-        pass
-    else:
-        log.info('Catalog saving to "' + str(catalog_uri) + '"')
-        catalog.save()
-
-    for section_node in catalog_node.find('sections').findall('section'):
-        import_section(section_node, nsmap, catalog=catalog)
-
-
-def import_section(section_node, nsmap, catalog=None):
-    section_uri = get_uri(section_node, nsmap)
-    log.info('Importing section ' + section_uri)
-
-    try:
-        section = Section.objects.get(uri=section_uri)
-        log.info('Section not in db. Created with uri ' + str(section_uri))
-    except Section.DoesNotExist:
-        section = Section()
-    else:
-        log.info('Section does exist. Loaded from uri ' + str(section_uri))
-
-    section.uri_prefix = section_uri.split('/questions/')[0]
-    section.key = section_uri.split('/')[-1]
-    section.comment = get_value_from_treenode(section_node, get_ns_tag('dc:comment', nsmap))
-    section.catalog = catalog
-    section.order = get_value_from_treenode(section_node, 'order')
-
-    for element in section_node.findall('title'):
-        setattr(section, 'title_' + element.attrib['lang'], element.text)
-
-    try:
-        SectionUniquePathValidator(section).validate()
-    except ValidationError:
-        log.info('Section not saving "' + str(section_uri) + '" due to validation error')
-        pass
-    else:
-        log.info('Section saving to "' + str(section_uri) + '"')
-        section.save()
-
-    try:
-        for subsection_node in section_node.find('subsections').findall('subsection'):
-            import_subsection(subsection_node, nsmap, section=section)
-    except AttributeError:
-        pass
-
-
-def import_subsection(subsection_node, nsmap, section=None):
-    subsection_uri = get_uri(subsection_node, nsmap)
-    log.info('Importing subsection ' + subsection_uri)
-
-    try:
-        subsection = Subsection.objects.get(uri=subsection_uri)
-    except Subsection.DoesNotExist:
-        subsection = Subsection()
-        log.info('Subsection not in db. Created with uri ' + str(subsection_uri))
-    else:
-        log.info('Subsection does exist. Loaded from uri ' + str(subsection_uri))
-
-    subsection.uri_prefix = subsection_uri.split('/questions/')[0]
-    subsection.key = subsection_uri.split('/')[-1]
-    subsection.comment = get_value_from_treenode(subsection_node, get_ns_tag('dc:comment', nsmap))
-    subsection.section = section
-    subsection.order = get_value_from_treenode(subsection_node, 'order')
-
-    for element in subsection_node.findall('title'):
-        setattr(subsection, 'title_' + element.attrib['lang'], element.text)
-
-    try:
-        SubsectionUniquePathValidator(subsection).validate()
-    except ValidationError:
-        log.info('Subsection not saving "' + str(subsection_uri) + '" due to validation error')
-        pass
-    else:
-        log.info('Subsection saving to "' + str(subsection_uri) + '"')
-        subsection.save()
-
-    for questionset_node in subsection_node.find('entities').findall('questionset'):
-        import_questionset(questionset_node, nsmap, subsection=subsection)
-    for question_node in subsection_node.find('entities').findall('question'):
-        import_question(question_node, nsmap, subsection=subsection)
-
-
-def import_questionset(questionset_node, nsmap, subsection=None):
-    questionset_uri = get_uri(questionset_node, nsmap)
-    log.info('Importing questionset ' + questionset_uri)
-
-    try:
-        questionset = QuestionEntity.objects.get(uri=questionset_uri)
-    except QuestionEntity.DoesNotExist:
-        questionset = QuestionEntity()
-        log.info('Questionset not in db. Created with uri ' + str(questionset_uri))
-    else:
-        log.info('Questionset does exist. Loaded from uri ' + str(questionset_uri))
-
-    questionset.uri_prefix = questionset_uri.split('/questions/')[0]
-    questionset.key = questionset_uri.split('/')[-1]
-    questionset.comment = get_value_from_treenode(questionset_node, get_ns_tag('dc:comment', nsmap))
-    questionset.subsection = subsection
-    questionset.order = get_value_from_treenode(questionset_node, 'order')
-
-    for element in questionset_node.findall('help'):
-        setattr(questionset, 'help_' + element.attrib['lang'], element.text)
-
-    try:
-        urimap = questionset_node.find('attribute_entity').attrib
-        nstag = get_ns_tag('dc:uri', nsmap)
-        attribute_entity_uri = urimap[nstag]
-        questionset.attribute_entity = AttributeEntity.objects.get(uri=attribute_entity_uri)
-    except (AttributeError, AttributeEntity.DoesNotExist):
-        questionset.attribute_entity = None
-
-    try:
-        QuestionEntityUniquePathValidator(questionset).validate()
-    except ValidationError:
-        log.info('Questionset not saving "' + str(questionset_uri) + '" due to validation error')
-        pass
-    else:
-        log.info('Questionset saving to "' + str(questionset_uri) + '"')
-        questionset.save()
-
-    for question_node in questionset_node.find('questions').findall('question'):
-        import_question(question_node, nsmap, subsection=subsection, parent=questionset)
-
-
-def import_question(question_node, nsmap, subsection=None, parent=None):
-    question_uri = get_uri(question_node, nsmap)
-    try:
-        question = Question.objects.get(uri=question_uri)
-    except Question.DoesNotExist:
-        question = Question()
-        log.info('Question not in db. Created with uri ' + str(question_uri))
-    else:
-        log.info('Question does exist. Loaded from uri ' + str(question_uri))
-
-    question.uri_prefix = question_uri.split('/questions/')[0]
-    question.key = question_uri.split('/')[-1]
-    question.comment = get_value_from_treenode(question_node, get_ns_tag('dc:comment', nsmap))
-    question.subsection = subsection
-    question.parent = parent
-    question.order = get_value_from_treenode(question_node, 'order')
-    question.widget_type = get_value_from_treenode(question_node, 'widget_type')
-
-    for element in question_node.findall('text'):
-        setattr(question, 'text_' + element.attrib['lang'], element.text)
-    for element in question_node.findall('help'):
-        setattr(question, 'help_' + element.attrib['lang'], element.text)
-    try:
-        urimap = question_node.find('attribute_entity').attrib
-        nstag = get_ns_tag('dc:uri', nsmap)
-        attribute_entity_uri = urimap[nstag]
-        question.attribute_entity = AttributeEntity.objects.get(uri=attribute_entity_uri)
-    except (AttributeError, AttributeEntity.DoesNotExist):
-        question.attribute_entity = None
-    try:
-        QuestionUniquePathValidator(question).validate()
-    except ValidationError:
-        log.info('Question not saving "' + str(question_uri) + '" due to validation error')
-        pass
-    else:
-        log.info('Question saving to "' + str(question_uri) + '"')
-        question.save()
+class CatalogImport(object):
+    '''
+    Imports a catalog XML tree in bulk: existing catalogs, sections, subsections, question sets, questions
+    and attribute entities are resolved using prefetched dicts, the uniqueness of keys and paths is checked
+    against prefetched dicts as well, the elements are written level by level using bulk_create/bulk_update
+    and the caches are invalidated once at the end.
+    '''
+
+    catalog_fields = ('uri_prefix', 'key', 'uri', 'comment', 'order', 'title_en', 'title_de')
+    section_fields = ('uri_prefix', 'key', 'path', 'uri', 'comment', 'catalog', 'order', 'title_en', 'title_de')
+    subsection_fields = ('uri_prefix', 'key', 'path', 'uri', 'comment', 'section', 'order', 'title_en', 'title_de')
+    questionset_fields = ('uri_prefix', 'key', 'path', 'uri', 'comment', 'attribute_entity', 'subsection', 'order',
+                          'help_en', 'help_de')
+    question_fields = questionset_fields + ('parent', 'text_en', 'text_de', 'widget_type')
+
+    def __init__(self, registry=None):
+        self.nsmap = {}
+        self.registry = registry or ImportRegistry()
+
+        self.catalogs = {catalog.uri: catalog for catalog in Catalog.objects.all()}
+        self.sections = {section.uri: section for section in Section.objects.all()}
+        self.subsections = {subsection.uri: subsection for subsection in Subsection.objects.all()}
+        self.questionsets = {questionset.uri: questionset for questionset in QuestionEntity.objects.filter(question=None)}
+        self.questions = {question.uri: question for question in Question.objects.all()}
+        self.attribute_entities = self.registry.get_uris(AttributeEntity)
+
+        self.catalog_keys = dict(Catalog.objects.values_list('key', 'pk'))
+        self.section_paths = dict(Section.objects.values_list('path', 'pk'))
+        self.subsection_paths = dict(Subsection.objects.values_list('path', 'pk'))
+        self.questionentity_paths = dict(QuestionEntity.objects.values_list('path', 'pk'))
+
+        # the field values of the existing elements before the import, to find the changed elements
+        self.values = {}
+
+        self.section_list = []
+        self.subsection_list = []
+        self.questionset_list = []
+        self.question_list = []
+
+        self.created = []
+        self.updated = []
+        self.moved = []
+
+    def run(self, catalog_node):
+        start = time.time()
+        self.nsmap = get_ns_map(catalog_node)
+
+        catalog = self.import_catalog(catalog_node.getroot())
+        if catalog is None:
+            return
+
+        with transaction.atomic():
+            self.save_instances(Catalog, [catalog], self.catalog_fields, Catalog.objects.filter(uri=catalog.uri))
+
+            self.resolve(self.section_list, 'catalog')
+            self.save_instances(Section, self.section_list, self.section_fields,
+                                Section.objects.filter(catalog=catalog))
+
+            self.resolve(self.subsection_list, 'section')
+            self.save_instances(Subsection, self.subsection_list, self.subsection_fields,
+                                Subsection.objects.filter(section__catalog=catalog))
+
+            self.resolve(self.questionset_list, 'subsection')
+            self.save_instances(QuestionEntity, self.questionset_list, self.questionset_fields,
+                                QuestionEntity.objects.filter(subsection__section__catalog=catalog))
+
+            self.resolve(self.question_list, 'subsection')
+            self.resolve(self.question_list, 'parent')
+            self.save_instances(Question, self.question_list, self.question_fields,
+                                QuestionEntity.objects.filter(subsection__section__catalog=catalog))
+
+            # the descendants of moved elements, which are not part of the file, need new paths
+            for instance in self.moved:
+                update_descendant_paths(instance)
+
+        self.registry.add(Catalog, catalog.uri, catalog.pk)
+
+        if self.created or self.updated:
+            # no signals were sent, so the caches are invalidated once for the whole catalog
+            bump_structure_version()
+            bump_generations(self.get_cache_generation_names(catalog))
+
+        log.info('Imported catalog "%s" with %i new and %i updated elements in %.3fs.',
+                 catalog.uri, len(self.created), len(self.updated), time.time() - start)
+
+    def import_catalog(self, catalog_node):
+        catalog = self.get_instance(Catalog, self.catalogs, catalog_node, self.catalog_fields)
+        self.set_titles(catalog, catalog_node)
+        catalog.uri = get_uri_prefix(catalog) + '/questions/' + catalog.key
+
+        if not self.validate(self.catalog_keys, catalog.key, catalog):
+            log.info('Catalog not saving "' + str(catalog.uri) + '" due to validation error')
+            return
+
+        for section_node in self.get_child_nodes(catalog_node, 'sections', 'section'):
+            self.import_section(section_node, catalog)
+
+        return catalog
+
+    def import_section(self, section_node, catalog):
+        section = self.get_instance(Section, self.sections, section_node, self.section_fields)
+        section.catalog = catalog
+        self.set_titles(section, section_node)
+        self.set_path(section, Section.build_path(section.key, catalog))
+
+        if not self.validate(self.section_paths, section.path, section):
+            log.info('Section not saving "' + str(section.uri) + '" due to validation error')
+            return
+
+        self.section_list.append(section)
+
+        for subsection_node in self.get_child_nodes(section_node, 'subsections', 'subsection'):
+            self.import_subsection(subsection_node, section)
+
+    def import_subsection(self, subsection_node, section):
+        subsection = self.get_instance(Subsection, self.subsections, subsection_node, self.subsection_fields)
+        subsection.section = section
+        self.set_titles(subsection, subsection_node)
+        self.set_path(subsection, Subsection.build_path(subsection.key, section))
+
+        if not self.validate(self.subsection_paths, subsection.path, subsection):
+            log.info('Subsection not saving "' + str(subsection.uri) + '" due to validation error')
+            return
+
+        self.subsection_list.append(subsection)
+
+        for questionset_node in self.get_child_nodes(subsection_node, 'entities', 'questionset'):
+            self.import_questionset(questionset_node, subsection)
+        for question_node in self.get_child_nodes(subsection_node, 'entities', 'question'):
+            self.import_question(question_node, subsection)
+
+    def import_questionset(self, questionset_node, subsection):
+        questionset = self.get_instance(QuestionEntity, self.questionsets, questionset_node, self.questionset_fields)
+        questionset.subsection = subsection
+        self.set_attribute_entity(questionset, questionset_node)
+
+        for element in questionset_node.findall('help'):
+            setattr(questionset, 'help_' + element.attrib['lang'], element.text)
+
+        self.set_path(questionset, QuestionEntity.build_path(questionset.key, subsection))
+
+        if not self.validate(self.questionentity_paths, questionset.path, questionset):
+            log.info('Questionset not saving "' + str(questionset.uri) + '" due to validation error')
+            return
+
+        self.questionset_list.append(questionset)
+
+        for question_node in self.get_child_nodes(questionset_node, 'questions', 'question'):
+            self.import_question(question_node, subsection, parent=questionset)
+
+    def import_question(self, question_node, subsection, parent=None):
+        question = self.get_instance(Question, self.questions, question_node, self.question_fields)
+        question.subsection = subsection
+        question.parent = parent
+        question.widget_type = force_text(get_value_from_treenode(question_node, 'widget_type'))
+        self.set_attribute_entity(question, question_node)
+
+        for element in question_node.findall('text'):
+            setattr(question, 'text_' + element.attrib['lang'], element.text)
+        for element in question_node.findall('help'):
+            setattr(question, 'help_' + element.attrib['lang'], element.text)
+
+        self.set_path(question, QuestionEntity.build_path(question.key, subsection, parent))
+
+        if not self.validate(self.questionentity_paths, question.path, question):
+            log.info('Question not saving "' + str(question.uri) + '" due to validation error')
+            return
+
+        self.question_list.append(question)
+
+    def get_instance(self, model, instances, node, fields):
+        uri = get_uri(node, self.nsmap)
+
+        instance = instances.get(uri)
+        if instance is None:
+            instance = model()
+        else:
+            self.values[instance] = self.get_values(instance, fields)
+
+        instance.uri_prefix = uri.split('/questions/')[0]
+        instance.key = uri.split('/')[-1]
+        instance.comment = force_text(get_value_from_treenode(node, get_ns_tag('dc:comment', self.nsmap)))
+        instance.order = int(get_value_from_treenode(node, 'order') or 0)
+
+        return instance
+
+    def get_values(self, instance, fields):
+        return {field_name: getattr(instance, instance._meta.get_field(field_name).attname) for field_name in fields}
+
+    def get_child_nodes(self, node, tag, child_tag):
+        children_node = node.find(tag)
+        if children_node is None:
+            return []
+
+        return children_node.findall(child_tag)
+
+    def set_titles(self, instance, node):
+        for element in node.findall('title'):
+            setattr(instance, 'title_' + element.attrib['lang'], element.text)
+
+    def set_path(self, instance, path):
+        instance.path = path
+        instance.uri = get_uri_prefix(instance) + '/questions/' + path
+
+    def set_attribute_entity(self, instance, node):
+        attribute_entity_node = node.find('attribute_entity')
+        if attribute_entity_node is None:
+            instance.attribute_entity_id = None
+        else:
+            attribute_entity_uri = attribute_entity_node.get(get_ns_tag('dc:uri', self.nsmap))
+            instance.attribute_entity_id = self.attribute_entities.get(attribute_entity_uri)
+
+    def validate(self, values, value, instance):
+        # the key/path needs to be unique in the database and in the file, the dict maps it to the pk
+        # of the existing element or to the element from the file which uses it
+        owner = values.get(value)
+        if owner is not None and owner is not instance and owner != instance.pk:
+            return False
+
+        values[value] = instance
+        return True
+
+    def resolve(self, instances, field_name):
+        # the related elements might have been created after they were assigned,
+        # assigning them again sets the foreign key to their (new) primary key
+        for instance in instances:
+            setattr(instance, field_name, getattr(instance, field_name))
+
+    def save_instances(self, model, instances, fields, queryset):
+        timestamp = now()
+        created, updated = [], []
+
+        for instance in instances:
+            if instance.pk is None:
+                instance.created = instance.updated = timestamp
+                created.append(instance)
+            else:
+                values = self.values[instance]
+                if self.get_values(instance, fields) != values:
+                    instance.updated = timestamp
+                    updated.append(instance)
+
+                if not isinstance(instance, (Catalog, Question)) and values['path'] != instance.path:
+                    self.moved.append(instance)
+
+        if created:
+            if model is Question:
+                # bulk_create does not support multi-table inheritance, the rows of both tables are inserted separately
+                QuestionEntity.objects.bulk_create([
+                    QuestionEntity(**{
+                        field.attname: getattr(instance, field.attname) for field in QuestionEntity._meta.concrete_fields
+                    }) for instance in created
+                ])
+            else:
+                model.objects.bulk_create(created)
+
+            # bulk_create does not set the primary keys for every database, so they are fetched using the uris
+            pks = dict(queryset.values_list('uri', 'pk'))
+            for instance in created:
+                instance.pk = pks[instance.uri]
+
+            if model is Question:
+                # the rows of the questions table point to the rows of the question entities created above
+                for instance in created:
+                    instance.id = instance.pk
+                bulk_create_children(Question, created)
+
+            for instance in created:
+                instance._state.adding = False
+
+        bulk_update(model, updated, fields + ('updated', ))
+
+        self.created += created
+        self.updated += updated
+
+    def get_cache_generation_names(self, catalog):
+        names = {'catalog_%s' % catalog.pk, 'questions_navigation'}
+
+        for instance in self.created + self.updated:
+            if isinstance(instance, QuestionEntity):
+                names.add('questionentity_%s' % instance.pk)
+            if isinstance(instance, Question) and instance.parent_id:
+                names.add('questionentity_%s' % instance.parent_id)
+
+        return sorted(names)
+
+
+def import_catalog(catalog_node, registry=None):
+    CatalogImport(registry).run(catalog_node)
@@ -1,5 +1,41 @@
 from django.db import models
 
+from rdmo.core.models import Version
+
+STRUCTURE_VERSION_NAME = 'questions_structure'
+
+
+class CatalogNavigation(object):
+    '''
+    The ordered list of the question entities of a catalog (without the questions in question sets)
+    together with an index of their positions, so that prev/next/progress are simple lookups.
+    '''
+
+    def __init__(self, pk_list):
+        self.pk_list = pk_list
+        self.index = dict((pk, index) for index, pk in enumerate(pk_list))
+
+    def get_prev(self, pk):
+        current_index = self.index[pk]
+        return self.pk_list[current_index - 1] if current_index > 0 else None
+
+    def get_next(self, pk):
+        current_index = self.index[pk]
+        return self.pk_list[current_index + 1] if current_index < len(self.pk_list) - 1 else None
+
+    def get_progress(self, pk):
+        return (100.0 * (1 + self.index[pk])/len(self.pk_list))
+
+
+def get_structure_version():
+    # the version is stored in the database, so that a change in one process
+    # invalidates the compiled catalogs (see utils.py) of all processes
+    return Version.objects.get_version(STRUCTURE_VERSION_NAME)
+
+
+def bump_structure_version(**kwargs):
+    Version.objects.bump_version(STRUCTURE_VERSION_NAME)
+
 
 class QuestionEntityQuerySet(models.QuerySet):
     def order_by_catalog(self, catalog):
@@ -7,36 +43,40 @@ class QuestionEntityQuerySet(models.QuerySet):
                    .filter(question__parent=None) \
                    .order_by('subsection__section__order', 'subsection__order', 'order')
 
-    def _get_pk_list(self, pk):
-        catalog = self.get(pk=pk).subsection.section.catalog
+    def get_navigation(self, catalog_id):
+        from .utils import get_compiled_catalog
+        return get_compiled_catalog(catalog_id).navigation
+
+    def _get_navigation(self, pk):
+        try:
+            catalog_id = self.filter(pk=pk).values_list('subsection__section__catalog', flat=True)[0]
+        except IndexError:
+            raise self.model.DoesNotExist('QuestionEntity matching query does not exist.')
 
-        pk_list = list(self.order_by_catalog(catalog).values_list('pk', flat=True))
-        current_index = pk_list.index(int(pk))
+        navigation = self.get_navigation(catalog_id)
+        if int(pk) not in navigation.index:
+            raise self.model.DoesNotExist('QuestionEntity is not part of the navigation of its catalog.')
 
-        return pk_list, current_index
+        return navigation
 
     def get_prev(self, pk):
-        pk_list, current_index = self._get_pk_list(pk)
+        prev_pk = self._get_navigation(pk).get_prev(int(pk))
 
-        if current_index > 0:
-            prev_pk = pk_list[current_index - 1]
+        if prev_pk is not None:
             return self.get(pk=prev_pk)
         else:
             raise self.model.DoesNotExist('QuestionEntity has no previous QuestionEntity. It is the first one.')
 
     def get_next(self, pk):
-        pk_list, current_index = self._get_pk_list(pk)
+        next_pk = self._get_navigation(pk).get_next(int(pk))
 
-        if current_index < len(pk_list) - 1:
-            next_pk = pk_list[current_index + 1]
+        if next_pk is not None:
             return self.get(pk=next_pk)
         else:
             raise self.model.DoesNotExist('QuestionEntity has no next QuestionEntity. It is the last one.')
 
     def get_progress(self, pk):
-        pk_list, current_index = self._get_pk_list(pk)
-
-        return (100.0 * (1 + current_index)/len(pk_list))
+        return self._get_navigation(pk).get_progress(int(pk))
 
 
 class QuestionEntityManager(models.Manager):
@@ -47,6 +87,9 @@ class QuestionEntityManager(models.Manager):
     def order_by_catalog(self, catalog):
         return self.get_queryset().order_by_catalog(catalog)
 
+    def get_navigation(self, catalog_id):
+        return self.get_queryset().get_navigation(catalog_id)
+
     def get_prev(self, pk):
         return self.get_queryset().get_prev(pk)
 
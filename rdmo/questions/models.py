@@ -1,15 +1,18 @@
 from __future__ import unicode_literals
 
-from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models.signals import pre_save, post_delete, post_save
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
-from rdmo.core.utils import get_uri_prefix
+from rdmo.core.cache import bump_generations
+from rdmo.core.utils import bulk_update, get_uri_prefix
 from rdmo.core.models import Model, TranslationMixin
-from rdmo.domain.models import AttributeEntity
+from rdmo.domain.models import AttributeEntity, Attribute
 
-from .managers import QuestionEntityManager
+from .managers import QuestionEntityManager, bump_structure_version
 from .validators import (
     CatalogUniqueKeyValidator,
     SectionUniquePathValidator,
@@ -71,8 +74,7 @@ class Catalog(Model, TranslationMixin):
         self.uri = get_uri_prefix(self) + '/questions/%s' % self.key
         super(Catalog, self).save(*args, **kwargs)
 
-        for section in self.sections.all():
-            section.save()
+        update_descendant_paths(self)
 
     def clean(self):
         CatalogUniqueKeyValidator(self)()
@@ -146,8 +148,7 @@ class Section(Model, TranslationMixin):
 
         super(Section, self).save(*args, **kwargs)
 
-        for subsection in self.subsections.all():
-            subsection.save()
+        update_descendant_paths(self)
 
     def clean(self):
         self.path = Section.build_path(self.key, self.catalog)
@@ -226,8 +227,7 @@ class Subsection(Model, TranslationMixin):
 
         super(Subsection, self).save(*args, **kwargs)
 
-        for entity in self.entities.all():
-            entity.save()
+        update_descendant_paths(self)
 
     def clean(self):
         self.path = Subsection.build_path(self.key, self.section)
@@ -316,11 +316,7 @@ class QuestionEntity(Model, TranslationMixin):
 
         super(QuestionEntity, self).save(*args, **kwargs)
 
-        for question in self.questions.all():
-            question.save()
-
-        # invalidate the cache so that changes appear instantly
-        caches['api'].clear()
+        update_descendant_paths(self)
 
     def clean(self):
         try:
@@ -404,3 +400,123 @@ class Question(QuestionEntity):
     @property
     def text(self):
         return self.trans('text')
+
+
+def update_descendant_paths(instance):
+    '''
+    Recomputes path and uri for all descendants of a catalog, section, subsection or question set.
+    The descendants are loaded with one query per level, the paths are computed in memory and the
+    changed descendants are written using bulk updates. Since no signals are sent for the descendants,
+    the caches are invalidated only once, by the signals of the saved instance.
+    '''
+    changed_sections, changed_subsections, changed_entities = [], [], []
+
+    if isinstance(instance, Catalog):
+        sections = list(instance.sections.all())
+        for section in sections:
+            section.catalog = instance
+            update_path(section, Section.build_path(section.key, instance), changed_sections)
+    elif isinstance(instance, Section):
+        sections = [instance]
+    else:
+        sections = []
+
+    if sections:
+        sections_dict = {section.pk: section for section in sections}
+        subsections = list(Subsection.objects.filter(section__in=sections_dict.keys()))
+        for subsection in subsections:
+            subsection.section = sections_dict[subsection.section_id]
+            update_path(subsection, Subsection.build_path(subsection.key, subsection.section), changed_subsections)
+    elif isinstance(instance, Subsection):
+        subsections = [instance]
+    else:
+        subsections = []
+
+    if subsections:
+        subsections_dict = {subsection.pk: subsection for subsection in subsections}
+        entities = list(QuestionEntity.objects.filter(subsection__in=subsections_dict.keys())
+                                              .select_related('question').order_by('pk'))
+        for entity in entities:
+            entity.subsection = subsections_dict[entity.subsection_id]
+
+        # questions need the key of their question set, which is usually in the same list of entities
+        entities_dict = {entity.pk: entity for entity in entities}
+        for entity in entities:
+            try:
+                parent_id = entity.question.parent_id
+            except ObjectDoesNotExist:
+                parent_id = None
+
+            questionset = entities_dict.get(parent_id) or (entity.question.parent if parent_id else None)
+
+            update_path(entity, QuestionEntity.build_path(entity.key, entity.subsection, questionset), changed_entities)
+
+    elif isinstance(instance, QuestionEntity) and not isinstance(instance, Question):
+        for question in instance.questions.select_related('subsection__section__catalog'):
+            update_path(question, QuestionEntity.build_path(question.key, question.subsection, instance), changed_entities)
+
+    bulk_update(Section, changed_sections, ('path', 'uri', 'updated'))
+    bulk_update(Subsection, changed_subsections, ('path', 'uri', 'updated'))
+    bulk_update(QuestionEntity, changed_entities, ('path', 'uri', 'updated'))
+
+
+def update_path(instance, path, changed):
+    uri = get_uri_prefix(instance) + '/questions/' + path
+    if (instance.path, instance.uri) != (path, uri):
+        instance.path = path
+        instance.uri = uri
+        instance.updated = now()
+        changed.append(instance)
+
+
+# invalidate the compiled catalogs (see utils.py) when the structure of the catalogs changes
+for model in (Catalog, Section, Subsection, QuestionEntity, Question, AttributeEntity, Attribute):
+    post_save.connect(bump_structure_version, sender=model)
+    post_delete.connect(bump_structure_version, sender=model)
+
+
+def get_catalog_id(instance):
+    try:
+        if isinstance(instance, Catalog):
+            return instance.pk
+        elif isinstance(instance, Section):
+            return instance.catalog_id
+        elif isinstance(instance, Subsection):
+            return instance.section.catalog_id
+        else:
+            return instance.subsection.section.catalog_id
+    except ObjectDoesNotExist:
+        return None
+
+
+def check_question_entity_navigation(sender, instance, **kwargs):
+    # check if the entity is new or was moved, since this changes the navigation of its catalog
+    old = QuestionEntity.objects.filter(pk=instance.pk).values_list('subsection_id', 'order').first()
+    instance._navigation_changed = (old != (instance.subsection_id, instance.order))
+
+
+def invalidate_api_cache(sender, instance, **kwargs):
+    # invalidate only the cached api responses which depend on the saved or deleted instance
+    catalog_id = get_catalog_id(instance)
+    names = ['catalog_%s' % catalog_id]
+
+    if isinstance(instance, QuestionEntity):
+        names.append('questionentity_%s' % instance.pk)
+        if isinstance(instance, Question) and instance.parent_id:
+            names.append('questionentity_%s' % instance.parent_id)
+
+        if kwargs.get('signal') is post_delete or getattr(instance, '_navigation_changed', True):
+            names.append('questions_navigation')
+    else:
+        # catalogs, sections and subsections are part of the navigation
+        names.append('questions_navigation')
+
+    bump_generations(names)
+
+
+for model in (Catalog, Section, Subsection, QuestionEntity, Question):
+    post_save.connect(invalidate_api_cache, sender=model)
+    post_delete.connect(invalidate_api_cache, sender=model)
+
+for model in (QuestionEntity, Question):
+    pre_save.connect(check_question_entity_navigation, sender=model)
@@ -1,6 +1,14 @@
+import tempfile
+
+import defusedxml.ElementTree as ET
+
 from django.test import TestCase
 
 from rdmo.core.testing.mixins import TestImportManageMixin
+from rdmo.core.testing.utils import benchmark, measure
+
+from ..imports import CatalogImport, import_catalog
+from ..models import Catalog, Section, Subsection, QuestionEntity, Question
 
 
 class QuestionsManageTestCase(TestCase):
@@ -25,3 +33,131 @@ class ViewsImportManageTests(TestImportManageMixin, QuestionsManageTestCase):
     export_api = 'questions_catalog_export'
     export_api_kwargs = {'format': 'xml', 'pk': '1'}
     export_api_format_list = ['pdf', 'rtf', 'odt', 'docx', 'html', 'markdown', 'mediawiki', 'tex', 'xml']
+
+
+class CatalogImportTestCase(QuestionsManageTestCase):
+
+    import_file = 'testing/xml/questions.xml'
+
+    # the tasks section is not part of the import file
+    exclude_uri = 'http://example.com/terms/questions/catalog/tasks'
+
+    def get_entities(self):
+        return (
+            set(Section.objects.exclude(uri__startswith=self.exclude_uri)
+                               .values_list('uri', 'catalog__uri', 'order', 'title_en')),
+            set(Subsection.objects.exclude(uri__startswith=self.exclude_uri)
+                                  .values_list('uri', 'section__uri', 'order', 'title_en')),
+            set(QuestionEntity.objects.exclude(uri__startswith=self.exclude_uri).values_list('uri', 'subsection__uri', 'attribute_entity__uri', 'order',
+                                                   'question__parent__uri', 'question__widget_type', 'question__text_en'))
+        )
+
+    def assert_paths(self):
+        queryset = QuestionEntity.objects.exclude(uri__startswith=self.exclude_uri)
+        for entity in queryset.select_related('question', 'subsection__section__catalog'):
+            parent = entity.question.parent if hasattr(entity, 'question') else None
+            self.assertEqual(entity.path, QuestionEntity.build_path(entity.key, entity.subsection, parent))
+            self.assertEqual(entity.uri, 'http://example.com/terms/questions/' + entity.path)
+
+    def write_catalog_xml(self, f, key, sections, subsections, questions):
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write('<catalog xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                '<dc:uri>http://example.com/terms/questions/%s</dc:uri><dc:comment></dc:comment>'
+                '<order>1</order><title lang="en">%s</title><title lang="de">%s</title><sections>\n' % (key, key, key))
+        for i in range(sections):
+            f.write('<section><dc:uri>http://example.com/terms/questions/%s/section_%i</dc:uri>'
+                    '<dc:comment></dc:comment><order>%i</order><title lang="en">Section</title>'
+                    '<title lang="de">Abschnitt</title><subsections>' % (key, i, i))
+            for j in range(subsections):
+                f.write('<subsection><dc:uri>http://example.com/terms/questions/%s/section_%i/subsection_%i'
+                        '</dc:uri><dc:comment></dc:comment><order>%i</order><title lang="en">Subsection</title>'
+                        '<title lang="de">Unterabschnitt</title><entities>' % (key, i, j, j))
+                f.write('<questionset><dc:uri>http://example.com/terms/questions/%s/section_%i/subsection_%i'
+                        '/questionset</dc:uri><dc:comment></dc:comment><order>0</order><help lang="en"></help>'
+                        '<help lang="de"></help><attribute_entity dc:uri="http://example.com/terms/domain/set">'
+                        '</attribute_entity><questions>' % (key, i, j))
+                for k in range(questions):
+                    if k == questions // 2:
+                        f.write('</questions></questionset>')
+
+                    f.write('<question><dc:uri>http://example.com/terms/questions/%s/section_%i/'
+                            'subsection_%i/%squestion_%i</dc:uri><dc:comment></dc:comment><order>%i</order>'
+                            '<text lang="en">Question?</text><text lang="de">Frage?</text>'
+                            '<help lang="en"></help><help lang="de"></help><widget_type>text</widget_type>'
+                            '<attribute_entity dc:uri="http://example.com/terms/domain/individual/text">'
+                            '</attribute_entity></question>' % (
+                                key, i, j, 'questionset/' if k < questions // 2 else '', k, k
+                            ))
+                f.write('</entities></subsection>')
+            f.write('</subsections></section>\n')
+        f.write('</sections></catalog>\n')
+        f.flush()
+
+
+class CatalogImportTests(CatalogImportTestCase):
+
+    def test_import(self):
+        entities = self.get_entities()
+        Catalog.objects.all().delete()
+
+        import_catalog(ET.parse(self.import_file))
+
+        self.assertEqual(self.get_entities(), entities)
+        self.assert_paths()
+
+    def test_import_existing(self):
+        pk_list = list(QuestionEntity.objects.order_by('pk').values_list('pk', flat=True))
+        Question.objects.update(order=100, widget_type='range')
+
+        import_catalog(ET.parse(self.import_file))
+
+        self.assertEqual(list(QuestionEntity.objects.order_by('pk').values_list('pk', flat=True)), pk_list)
+        self.assertFalse(Question.objects.exclude(uri__startswith=self.exclude_uri).filter(order=100).exists())
+        self.assertFalse(Question.objects.exclude(uri__startswith=self.exclude_uri).filter(widget_type='range')
+                                                                                  .exclude(key='range').exists())
+        self.assert_paths()
+
+        # a second import does not change anything
+        catalog_import = CatalogImport()
+        catalog_import.run(ET.parse(self.import_file))
+        self.assertEqual(catalog_import.created, [])
+        self.assertEqual(catalog_import.updated, [])
+
+    def test_import_many(self):
+        with tempfile.NamedTemporaryFile(suffix='.xml', mode='w') as f:
+            self.write_catalog_xml(f, 'test', 2, 2, 4)
+            xmltree = ET.parse(f.name)
+
+        import_catalog(xmltree)
+        pk_list = list(QuestionEntity.objects.order_by('pk').values_list('pk', flat=True))
+
+        # a second import updates the elements
+        import_catalog(xmltree)
+
+        self.assertEqual(list(QuestionEntity.objects.order_by('pk').values_list('pk', flat=True)), pk_list)
+        self.assertEqual(Question.objects.filter(subsection__section__catalog__key='test').count(), 16)
+        self.assertEqual(Question.objects.filter(parent__key='questionset', path__startswith='test/').count(), 8)
+        self.assert_paths()
+
+
+@benchmark
+class CatalogImportBenchmarks(CatalogImportTestCase):
+
+    def test_import(self):
+        section_count, subsection_count, question_count = 10, 10, 50
+
+        with tempfile.NamedTemporaryFile(suffix='.xml', mode='w') as f:
+            self.write_catalog_xml(f, 'benchmark', section_count, subsection_count, question_count)
+            xmltree = ET.parse(f.name)
+
+        count = section_count * subsection_count * question_count
+        with measure('Import of a catalog with %i questions, create' % count):
+            import_catalog(xmltree)
+
+        with measure('Import of a catalog with %i questions, update' % count):
+            import_catalog(xmltree)
+
+        self.assertEqual(Question.objects.filter(subsection__section__catalog__key='benchmark').count(), count)
+        self.assertEqual(Question.objects.filter(parent__key='questionset', path__startswith='benchmark/').count(),
+                         section_count * subsection_count * (question_count // 2))
+        self.assert_paths()
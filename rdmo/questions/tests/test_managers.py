@@ -0,0 +1,117 @@
+from django.test import TestCase
+from django.utils.timezone import now
+
+from rdmo.core.managers import finish_request_versions, start_request_versions
+from rdmo.core.testing.utils import benchmark, measure
+
+from ..models import Catalog, Section, Subsection, QuestionEntity
+
+
+class QuestionsManagerTestCase(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'conditions.json',
+        'domain.json',
+        'options.json',
+        'questions.json',
+    )
+
+    def create_catalog(self, key, sections, subsections, entities):
+        catalog = Catalog(key=key, title_en=key, title_de=key)
+        catalog.save()
+
+        for i in range(sections):
+            section = Section(catalog=catalog, key='section%i' % i, order=i, title_en='section', title_de='section')
+            section.save()
+
+            for j in range(subsections):
+                subsection = Subsection(section=section, key='subsection%i' % j, order=j, title_en='subsection', title_de='subsection')
+                subsection.save()
+
+                QuestionEntity.objects.bulk_create([
+                    QuestionEntity(subsection=subsection, key='entity%i' % k, order=k, created=now(), updated=now())
+                    for k in range(entities)
+                ])
+
+        return catalog
+
+
+class QuestionEntityNavigationTests(QuestionsManagerTestCase):
+
+    def test_navigation(self):
+        for catalog in Catalog.objects.all():
+            pk_list = list(QuestionEntity.objects.order_by_catalog(catalog).values_list('pk', flat=True))
+
+            for index, pk in enumerate(pk_list):
+                try:
+                    self.assertEqual(QuestionEntity.objects.get_prev(pk).pk, pk_list[index - 1])
+                except QuestionEntity.DoesNotExist:
+                    self.assertEqual(index, 0)
+
+                try:
+                    self.assertEqual(QuestionEntity.objects.get_next(pk).pk, pk_list[index + 1])
+                except QuestionEntity.DoesNotExist:
+                    self.assertEqual(index, len(pk_list) - 1)
+
+                self.assertEqual(QuestionEntity.objects.get_progress(pk), 100.0 * (index + 1) / len(pk_list))
+
+    def test_navigation_invalidation(self):
+        catalog = Catalog.objects.first()
+        navigation = QuestionEntity.objects.get_navigation(catalog.pk)
+
+        # move the first entity to the end of its subsection
+        entity = QuestionEntity.objects.get(pk=navigation.pk_list[0])
+        entity.order = 1000
+        entity.save()
+
+        pk_list = list(QuestionEntity.objects.order_by_catalog(catalog).values_list('pk', flat=True))
+        self.assertNotEqual(pk_list, navigation.pk_list)
+        self.assertEqual(QuestionEntity.objects.get_navigation(catalog.pk).pk_list, pk_list)
+
+        # delete the entity
+        entity.delete()
+
+        pk_list = list(QuestionEntity.objects.order_by_catalog(catalog).values_list('pk', flat=True))
+        self.assertEqual(QuestionEntity.objects.get_navigation(catalog.pk).pk_list, pk_list)
+
+    def test_navigation_num_queries(self):
+        catalog = self.create_catalog('test', 2, 2, 5)
+        pk_list = list(QuestionEntity.objects.order_by_catalog(catalog).values_list('pk', flat=True))
+        QuestionEntity.objects.get_navigation(catalog.pk)
+
+        # within a request, the structure version is fetched only once
+        start_request_versions()
+        try:
+            with self.assertNumQueries(1):
+                QuestionEntity.objects.get_navigation(catalog.pk)
+
+            # with a warm cache, no queries are needed at all
+            with self.assertNumQueries(0):
+                for pk in pk_list:
+                    navigation = QuestionEntity.objects.get_navigation(catalog.pk)
+                    navigation.get_prev(pk)
+                    navigation.get_next(pk)
+                    navigation.get_progress(pk)
+        finally:
+            finish_request_versions()
+
+
+@benchmark
+class QuestionEntityNavigationBenchmarks(QuestionsManagerTestCase):
+
+    def test_navigation(self):
+        # 5 sections x 10 subsections x 10 entities = 500 question entities
+        catalog = self.create_catalog('benchmark', 5, 10, 10)
+        pk_list = list(QuestionEntity.objects.order_by_catalog(catalog).values_list('pk', flat=True))
+        self.assertEqual(len(pk_list), 500)
+
+        for label in ('cold', 'warm'):
+            with measure('Navigation for a catalog with 500 question entities, %s cache' % label):
+                navigation = QuestionEntity.objects.get_navigation(catalog.pk)
+                for pk in pk_list:
+                    navigation.get_prev(pk)
+                    navigation.get_next(pk)
+                    navigation.get_progress(pk)
@@ -0,0 +1,129 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rdmo.core.cache import get_generations
+from rdmo.core.testing.utils import benchmark, measure
+
+from ..models import Catalog, Section, Subsection, QuestionEntity, Question
+
+
+class QuestionsModelTestCase(TestCase):
+
+    fixtures = (
+        'conditions.json',
+        'domain.json',
+        'options.json',
+        'questions.json',
+    )
+
+
+class UpdateDescendantPathsTestCase(QuestionsModelTestCase):
+
+    def assert_paths(self, sections=None, subsections=None, entities=None):
+        # compare the stored paths and uris with the ones computed by build_path
+        for section in sections or []:
+            self.assertEqual(section.path, Section.build_path(section.key, section.catalog))
+            self.assertEqual(section.uri, 'http://example.com/terms/questions/' + section.path)
+
+        for subsection in subsections or []:
+            self.assertEqual(subsection.path, Subsection.build_path(subsection.key, subsection.section))
+            self.assertEqual(subsection.uri, 'http://example.com/terms/questions/' + subsection.path)
+
+        for entity in entities or []:
+            questionset = entity.question.parent if not entity.is_set else None
+            self.assertEqual(entity.path, QuestionEntity.build_path(entity.key, entity.subsection, questionset))
+            self.assertEqual(entity.uri, 'http://example.com/terms/questions/' + entity.path)
+
+    def create_questions(self, subsection, count):
+        for i in range(count):
+            Question(subsection=subsection, key='question_%i' % i, text_en='', text_de='', widget_type='text').save()
+
+
+class UpdateDescendantPathsTests(UpdateDescendantPathsTestCase):
+
+    def test_catalog(self):
+        catalog = Catalog.objects.first()
+        generation = get_generations(['catalog_%s' % catalog.pk])[0]
+
+        catalog.key = 'renamed'
+        catalog.save()
+
+        self.assert_paths(
+            Section.objects.filter(catalog=catalog),
+            Subsection.objects.filter(section__catalog=catalog),
+            QuestionEntity.objects.filter(subsection__section__catalog=catalog)
+        )
+        self.assertFalse(QuestionEntity.objects.filter(subsection__section__catalog=catalog)
+                                               .exclude(path__startswith='renamed/').exists())
+
+        # the caches were invalidated exactly once
+        self.assertEqual(get_generations(['catalog_%s' % catalog.pk])[0], generation + 1)
+
+    def test_section(self):
+        section = Section.objects.first()
+        section.key = 'renamed'
+        section.save()
+
+        self.assert_paths(
+            [section],
+            Subsection.objects.filter(section=section),
+            QuestionEntity.objects.filter(subsection__section=section)
+        )
+
+    def test_subsection(self):
+        subsection = Subsection.objects.first()
+        subsection.key = 'renamed'
+        subsection.save()
+
+        self.assert_paths(
+            subsections=[subsection],
+            entities=QuestionEntity.objects.filter(subsection=subsection)
+        )
+
+    def test_questionset(self):
+        questionset = Question.objects.exclude(parent=None).first().parent
+        questionset.key = 'renamed'
+        questionset.save()
+
+        self.assertTrue(questionset.questions.exists())
+        for question in questionset.questions.all():
+            self.assertTrue(question.path.endswith('/renamed/' + question.key))
+
+        self.assert_paths(entities=[questionset] + list(questionset.questions.all()))
+
+    def test_catalog_num_queries(self):
+        catalog = Catalog.objects.first()
+        subsection = Subsection.objects.filter(section__catalog=catalog).first()
+
+        num_queries = []
+        for count in (10, 20):
+            self.create_questions(subsection, count)
+
+            catalog.key = 'renamed_%i' % count
+            with CaptureQueriesContext(connection) as context:
+                catalog.save()
+
+            self.assert_paths(entities=QuestionEntity.objects.filter(subsection=subsection))
+            num_queries.append(len(context))
+
+        # the number of queries does not depend on the number of entities
+        self.assertEqual(num_queries[0], num_queries[1])
+        self.assertLess(num_queries[0], 30)
+
+
+@benchmark
+class UpdateDescendantPathsBenchmarks(UpdateDescendantPathsTestCase):
+
+    def test_catalog(self):
+        catalog = Catalog.objects.first()
+        subsection = Subsection.objects.filter(section__catalog=catalog).first()
+        self.create_questions(subsection, 1000)
+
+        count = QuestionEntity.objects.filter(subsection__section__catalog=catalog).count()
+
+        catalog.key = 'renamed'
+        with measure('Rename of a catalog with %i entities' % count):
+            catalog.save()
+
+        self.assert_paths(entities=QuestionEntity.objects.filter(subsection=subsection))
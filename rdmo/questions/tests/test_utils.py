@@ -0,0 +1,113 @@
+from django.test import TestCase
+from django.utils import translation
+
+from rdmo.core.models import Version
+from rdmo.core.testing.utils import benchmark, measure
+
+from ..managers import STRUCTURE_VERSION_NAME, bump_structure_version, get_structure_version
+from ..models import Catalog, Section, QuestionEntity
+from ..utils import compiled_catalogs, get_compiled_catalog
+
+
+class QuestionsUtilsTestCase(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'conditions.json',
+        'domain.json',
+        'options.json',
+        'questions.json',
+    )
+
+    def setUp(self):
+        translation.activate('en')
+
+
+class CompiledCatalogTests(QuestionsUtilsTestCase):
+
+    def test_get_compiled_catalog(self):
+        for catalog in Catalog.objects.all():
+            compiled_catalog = get_compiled_catalog(catalog.pk)
+
+            self.assertEqual(compiled_catalog.id, catalog.id)
+            self.assertEqual(compiled_catalog.title, catalog.title)
+            self.assertEqual([section.id for section in compiled_catalog.sections],
+                             list(catalog.sections.order_by('order').values_list('id', flat=True)))
+
+            entities = [entity.id for section in compiled_catalog.sections
+                        for subsection in section.subsections
+                        for entity in subsection.entities]
+            self.assertEqual(entities, list(QuestionEntity.objects.order_by_catalog(catalog).values_list('pk', flat=True)))
+            self.assertEqual(entities, compiled_catalog.navigation.pk_list)
+
+    def test_get_compiled_catalog_num_queries(self):
+        catalog = Catalog.objects.first()
+
+        # one query for the version, one for the catalog and one for each of the sections,
+        # subsections, entities and questions
+        bump_structure_version()
+        with self.assertNumQueries(6):
+            get_compiled_catalog(catalog.pk)
+
+        # only the version is fetched from the database
+        with self.assertNumQueries(1):
+            get_compiled_catalog(catalog.pk)
+
+        # the shared cache is used if the in-process cache is empty
+        compiled_catalogs.clear()
+        with self.assertNumQueries(1):
+            get_compiled_catalog(catalog.pk)
+
+    def test_get_compiled_catalog_invalidation(self):
+        catalog = Catalog.objects.first()
+        get_compiled_catalog(catalog.pk)
+
+        version = get_structure_version()
+        section = Section.objects.filter(catalog=catalog).first()
+        section.title_en = 'changed'
+        section.save()
+        self.assertNotEqual(get_structure_version(), version)
+
+        compiled_catalog = get_compiled_catalog(catalog.pk)
+        self.assertEqual(compiled_catalog.version, get_structure_version())
+        self.assertIn('changed', [section.title for section in compiled_catalog.sections])
+
+    def test_get_compiled_catalog_other_process(self):
+        catalog = Catalog.objects.first()
+        get_compiled_catalog(catalog.pk)
+
+        # another process changes the structure, which only updates the database
+        Section.objects.filter(catalog=catalog).update(title_en='changed')
+        Version.objects.filter(name=STRUCTURE_VERSION_NAME).update(value='other')
+
+        compiled_catalog = get_compiled_catalog(catalog.pk)
+        self.assertEqual(compiled_catalog.version, 'other')
+        self.assertIn('changed', [section.title for section in compiled_catalog.sections])
+
+    def test_get_compiled_catalog_eviction(self):
+        compiled_catalogs.clear()
+        Catalog(key='other', title_en='other', title_de='other').save()
+
+        catalogs = list(Catalog.objects.all())
+        for catalog in catalogs:
+            get_compiled_catalog(catalog.pk)
+        self.assertEqual(set(compiled_catalogs), set(catalog.pk for catalog in catalogs))
+
+        # the compiled catalogs of the old version are removed when another catalog is compiled
+        bump_structure_version()
+        get_compiled_catalog(catalogs[0].pk)
+        self.assertEqual(list(compiled_catalogs), [catalogs[0].pk])
+
+
+@benchmark
+class CompiledCatalogBenchmarks(QuestionsUtilsTestCase):
+
+    def test_get_compiled_catalog(self):
+        catalog = Catalog.objects.first()
+        bump_structure_version()
+
+        for label in ('cold', 'warm'):
+            with measure('Compiled catalog, %s cache' % label):
+                get_compiled_catalog(catalog.pk)
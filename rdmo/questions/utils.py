@@ -0,0 +1,203 @@
+from collections import namedtuple
+
+from django.core.cache import caches
+from django.db.models import Prefetch
+
+from rdmo.core.models import TranslationMixin
+
+from .managers import CatalogNavigation, get_structure_version
+from .models import Catalog, Section, Subsection, QuestionEntity, Question
+
+COMPILED_CATALOG_CACHE_KEY = 'questions_compiled_catalog_%s_%s'
+
+# in-process cache of the compiled catalogs by their id, the version of an entry is checked against the
+# current structure version on every access and the entries of other versions are removed when it changes
+compiled_catalogs = {}
+
+
+class CompiledAttributeEntity(namedtuple('CompiledAttributeEntity', (
+        'id', 'key', 'path', 'is_collection', 'is_attribute', 'parent_collection_id'))):
+    __slots__ = ()
+
+
+class CompiledQuestion(TranslationMixin, namedtuple('CompiledQuestion', (
+        'id', 'key', 'path', 'order', 'text_en', 'text_de', 'help_en', 'help_de', 'widget_type', 'attribute_entity'))):
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return self.trans('text')
+
+    @property
+    def help(self):
+        return self.trans('help')
+
+
+class CompiledQuestionEntity(TranslationMixin, namedtuple('CompiledQuestionEntity', (
+        'id', 'key', 'path', 'order', 'is_set', 'help_en', 'help_de', 'attribute_entity', 'question', 'questions'))):
+    __slots__ = ()
+
+    @property
+    def help(self):
+        return self.trans('help')
+
+
+class CompiledSubsection(TranslationMixin, namedtuple('CompiledSubsection', (
+        'id', 'key', 'path', 'order', 'title_en', 'title_de', 'entities'))):
+    __slots__ = ()
+
+    @property
+    def title(self):
+        return self.trans('title')
+
+
+class CompiledSection(TranslationMixin, namedtuple('CompiledSection', (
+        'id', 'key', 'path', 'order', 'title_en', 'title_de', 'subsections'))):
+    __slots__ = ()
+
+    @property
+    def title(self):
+        return self.trans('title')
+
+
+class CompiledCatalog(TranslationMixin, namedtuple('CompiledCatalog', (
+        'id', 'version', 'key', 'uri', 'order', 'title_en', 'title_de', 'sections', 'navigation'))):
+    '''
+    An immutable snapshot of the structure of a catalog (sections, subsections, question sets and
+    questions, including the relevant information about their attributes/entities), which can be
+    used instead of querying the database for each level of the catalog.
+    '''
+    __slots__ = ()
+
+    @property
+    def title(self):
+        return self.trans('title')
+
+
+def get_compiled_catalog(catalog_id):
+    version = get_structure_version()
+
+    # look in the in-process cache first
+    compiled_catalog = compiled_catalogs.get(catalog_id)
+    if compiled_catalog is not None and compiled_catalog.version == version:
+        return compiled_catalog
+
+    # then look in the shared cache and finally build the compiled catalog from the database
+    cache_key = COMPILED_CATALOG_CACHE_KEY % (catalog_id, version)
+    compiled_catalog = caches['default'].get(cache_key)
+    if compiled_catalog is None:
+        compiled_catalog = compile_catalog(catalog_id, version)
+        caches['default'].set(cache_key, compiled_catalog, None)
+
+    for stale_catalog_id in [key for key, value in compiled_catalogs.items() if value.version != version]:
+        compiled_catalogs.pop(stale_catalog_id, None)
+
+    compiled_catalogs[catalog_id] = compiled_catalog
+    return compiled_catalog
+
+
+def compile_catalog(catalog_id, version=None):
+    catalog = Catalog.objects.prefetch_related(
+        Prefetch('sections', queryset=Section.objects.order_by('order')),
+        Prefetch('sections__subsections', queryset=Subsection.objects.order_by('order')),
+        Prefetch('sections__subsections__entities', queryset=QuestionEntity.objects.filter(question__parent=None)
+                 .select_related('question', 'attribute_entity')
+                 .order_by('order')),
+        Prefetch('sections__subsections__entities__questions', queryset=Question.objects
+                 .select_related('attribute_entity')
+                 .order_by('order'))
+    ).get(pk=catalog_id)
+
+    pk_list = []
+    sections = []
+    for section in catalog.sections.all():
+        subsections = []
+        for subsection in section.subsections.all():
+            entities = []
+            for entity in subsection.entities.all():
+                pk_list.append(entity.pk)
+
+                attribute_entity = compile_attribute_entity(entity.attribute_entity)
+
+                if entity.is_set:
+                    question = None
+                    questions = tuple(compile_question(question, compile_attribute_entity(question.attribute_entity))
+                                      for question in entity.questions.all())
+                else:
+                    # the question shares the attribute entity with its question entity
+                    question = compile_question(entity.question, attribute_entity)
+                    questions = ()
+
+                entities.append(CompiledQuestionEntity(
+                    id=entity.id,
+                    key=entity.key,
+                    path=entity.path,
+                    order=entity.order,
+                    is_set=entity.is_set,
+                    help_en=entity.help_en,
+                    help_de=entity.help_de,
+                    attribute_entity=attribute_entity,
+                    question=question,
+                    questions=questions
+                ))
+
+            subsections.append(CompiledSubsection(
+                id=subsection.id,
+                key=subsection.key,
+                path=subsection.path,
+                order=subsection.order,
+                title_en=subsection.title_en,
+                title_de=subsection.title_de,
+                entities=tuple(entities)
+            ))
+
+        sections.append(CompiledSection(
+            id=section.id,
+            key=section.key,
+            path=section.path,
+            order=section.order,
+            title_en=section.title_en,
+            title_de=section.title_de,
+            subsections=tuple(subsections)
+        ))
+
+    return CompiledCatalog(
+        id=catalog.id,
+        version=version,
+        key=catalog.key,
+        uri=catalog.uri,
+        order=catalog.order,
+        title_en=catalog.title_en,
+        title_de=catalog.title_de,
+        sections=tuple(sections),
+        navigation=CatalogNavigation(pk_list)
+    )
+
+
+def compile_question(question, attribute_entity):
+    return CompiledQuestion(
+        id=question.id,
+        key=question.key,
+        path=question.path,
+        order=question.order,
+        text_en=question.text_en,
+        text_de=question.text_de,
+        help_en=question.help_en,
+        help_de=question.help_de,
+        widget_type=question.widget_type,
+        attribute_entity=attribute_entity
+    )
+
+
+def compile_attribute_entity(attribute_entity):
+    if attribute_entity is None:
+        return None
+
+    return CompiledAttributeEntity(
+        id=attribute_entity.id,
+        key=attribute_entity.key,
+        path=attribute_entity.path,
+        is_collection=attribute_entity.is_collection,
+        is_attribute=attribute_entity.is_attribute,
+        parent_collection_id=attribute_entity.parent_collection_id
+    )
@@ -5,7 +5,7 @@ from django.core.exceptions import ValidationError
 from rdmo.core.utils import get_ns_map, get_uri, get_ns_tag
 from rdmo.conditions.models import Condition
 from rdmo.domain.models import Attribute
-from rdmo.core.imports import get_value_from_treenode
+from rdmo.core.imports import ImportRegistry, get_value_from_treenode
 
 from .models import Task, TimeFrame
 from .validators import TaskUniqueKeyValidator
@@ -13,9 +13,12 @@ from .validators import TaskUniqueKeyValidator
 log = logging.getLogger(__name__)
 
 
-def import_tasks(tasks_node):
+def import_tasks(tasks_node, registry=None):
     log.info('Importing tasks')
-    nsmap = get_ns_map(tasks_node.getroot())
+    nsmap = get_ns_map(tasks_node)
+
+    if registry is None:
+        registry = ImportRegistry()
 
     for task_node in tasks_node.findall('task'):
         task_uri = get_uri(task_node, nsmap)
@@ -31,12 +34,6 @@ def import_tasks(tasks_node):
         task.uri_prefix = task_uri.split('/tasks/')[0]
         task.key = task_uri.split('/')[-1]
 
-        try:
-            attribute_uri = get_uri(task_node, nsmap, 'attrib')
-            task.attribute = Attribute.objects.get(uri=attribute_uri)
-        except (AttributeError, Attribute.DoesNotExist, KeyError):
-            task.attribute = None
-
         for element in task_node.findall('title'):
             setattr(task, 'title_' + element.attrib['lang'], element.text)
         for element in task_node.findall('text'):
@@ -50,6 +47,7 @@ def import_tasks(tasks_node):
         else:
             log.info('Task saving to "' + str(task_uri) + '"')
             task.save()
+            registry.add(Task, task.uri, task.pk)
 
         try:
             timeframe = TimeFrame.objects.get(task=task)
@@ -63,18 +61,16 @@ def import_tasks(tasks_node):
         timeframe_node = task_node.find('timeframe')
         do_save = False
         if timeframe_node.find('start_attribute') is not None:
-            try:
-                start_attribute_uri = timeframe_node.find('start_attribute').get(get_ns_tag('dc:uri', nsmap))
-                timeframe.start_attribute = Attribute.objects.get(uri=start_attribute_uri)
-            except Attribute.DoesNotExist:
-                pass
+            start_attribute_uri = timeframe_node.find('start_attribute').get(get_ns_tag('dc:uri', nsmap))
+            start_attribute_id = registry.get(Attribute, start_attribute_uri)
+            if start_attribute_id is not None:
+                timeframe.start_attribute_id = start_attribute_id
 
         if timeframe_node.find('end_attribute') is not None:
-            try:
-                end_attribute_uri = timeframe_node.find('end_attribute').get(get_ns_tag('dc:uri', nsmap))
-                timeframe.end_attribute = Attribute.objects.get(uri=end_attribute_uri)
-            except Attribute.DoesNotExist:
-                pass
+            end_attribute_uri = timeframe_node.find('end_attribute').get(get_ns_tag('dc:uri', nsmap))
+            end_attribute_id = registry.get(Attribute, end_attribute_uri)
+            if end_attribute_id is not None:
+                timeframe.end_attribute_id = end_attribute_id
 
         days_before = get_value_from_treenode(timeframe_node, 'days_before')
         if days_before.isdigit() is True:
@@ -91,9 +87,6 @@ def import_tasks(tasks_node):
 
         if hasattr(task_node, 'conditions'):
             for condition_node in task_node.find('condition').findall('conditions'):
-                try:
-                    condition_uri = get_uri(condition_node, nsmap)
-                    condition = Condition.objects.get(uri=condition_uri)
-                    task.conditions.add(condition)
-                except Condition.DoesNotExist:
-                    pass
+                condition_id = registry.get(Condition, get_uri(condition_node, nsmap))
+                if condition_id is not None:
+                    task.conditions.add(condition_id)
@@ -1,17 +1,27 @@
 from django.db import models
 
+from rdmo.conditions.models import Condition
+
 
 class TaskManager(models.Manager):
 
     def active_by_project(self, project):
         tasks = []
 
-        for task in self.get_queryset():
+        task_list = list(self.get_queryset().select_related('timeframe').prefetch_related('conditions__source'))
+
+        # resolve the conditions of all tasks at once
+        conditions = set()
+        for task in task_list:
+            conditions.update(task.conditions.all())
+        results = Condition.resolve_conditions(conditions, project)
+
+        for task in task_list:
             conditions = task.conditions.all()
 
             if conditions:
                 for condition in conditions:
-                    if condition.resolve(project):
+                    if results[condition.id]:
                         tasks.append(task)
                         break
 
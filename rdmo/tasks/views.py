@@ -8,7 +8,7 @@ from django.views.generic import TemplateView, ListView
 from django.urls import reverse_lazy
 
 from rdmo.core.exports import prettify_xml
-from rdmo.core.imports import handle_uploaded_file, validate_xml
+from rdmo.core.imports import validate_xml
 from rdmo.core.views import ModelPermissionMixin
 from rdmo.core.utils import get_model_field_meta, render_to_format
 
@@ -62,13 +62,11 @@ class TasksImportXMLView(ModelPermissionMixin, ListView):
     def post(self, request, *args, **kwargs):
         # context = self.get_context_data(**kwargs)
         try:
-            request.FILES['uploaded_file']
+            uploaded_file = request.FILES['uploaded_file']
         except KeyError:
             return HttpResponseRedirect(self.success_url)
-        else:
-            tempfilename = handle_uploaded_file(request.FILES['uploaded_file'])
 
-        roottag, xmltree = validate_xml(tempfilename)
+        roottag, xmltree = validate_xml(uploaded_file, settings.IMPORT_MAX_SIZE)
         if roottag == 'tasks':
             import_tasks(xmltree)
             return HttpResponseRedirect(self.success_url)
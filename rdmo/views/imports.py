@@ -2,6 +2,7 @@ import logging
 
 from django.core.exceptions import ValidationError
 
+from rdmo.core.imports import ImportRegistry
 from rdmo.core.utils import get_ns_map, get_uri
 
 from .models import View
@@ -10,9 +11,12 @@ from .validators import ViewUniqueKeyValidator
 log = logging.getLogger(__name__)
 
 
-def import_views(views_node):
+def import_views(views_node, registry=None):
     log.info('Importing views')
-    nsmap = get_ns_map(views_node.getroot())
+    nsmap = get_ns_map(views_node)
+
+    if registry is None:
+        registry = ImportRegistry()
 
     for view_node in views_node.findall('view'):
         view_uri = get_uri(view_node, nsmap)
@@ -42,3 +46,4 @@ def import_views(views_node):
             log.info('Optionset saving to "' + str(view.key) + '"')
             view.template = view_node.find('template').text
             view.save()
+            registry.add(View, view.uri, view.pk)
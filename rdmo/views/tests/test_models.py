@@ -0,0 +1,189 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+from django.utils.timezone import now
+
+from rdmo.conditions.models import Condition
+from rdmo.core.testing.utils import benchmark, measure
+from rdmo.domain.models import Attribute, AttributeEntity
+from rdmo.projects.models import Project, Value
+
+from ..models import View, compiled_templates
+from ..utils import LazyConditions, LazyValuesTree
+
+
+class ViewsModelTestCase(TestCase):
+
+    fixtures = (
+        'users.json',
+        'groups.json',
+        'accounts.json',
+        'conditions.json',
+        'domain.json',
+        'options.json',
+        'questions.json',
+        'tasks.json',
+        'views.json',
+        'projects.json',
+    )
+
+    project_id = 1
+
+    def setUp(self):
+        translation.activate('en')
+        compiled_templates.clear()
+
+
+class CompiledTemplateTests(ViewsModelTestCase):
+
+    def test_get_compiled_template(self):
+        view = View.objects.first()
+        compiled_template = view.get_compiled_template()
+
+        # the compiled template is reused, also by other instances of the same view
+        self.assertIs(view.get_compiled_template(), compiled_template)
+        self.assertIs(View.objects.get(pk=view.pk).get_compiled_template(), compiled_template)
+
+    def test_get_compiled_template_invalidation(self):
+        view = View.objects.first()
+        compiled_template = view.get_compiled_template()
+
+        view.template = '<p>{{ values.project.title }}</p>'
+        view.save()
+        self.assertNotIn(view.pk, compiled_templates)
+        self.assertIsNot(view.get_compiled_template(), compiled_template)
+
+        # a changed, but unsaved template is not taken from the cache either
+        other_view = View.objects.get(pk=view.pk)
+        other_view.template = '<p>changed</p>'
+        self.assertEqual(other_view.render(Project.objects.get(pk=self.project_id)), '<p>changed</p>')
+
+        view.delete()
+        self.assertFalse(compiled_templates)
+
+
+@benchmark
+class CompiledTemplateBenchmarks(ViewsModelTestCase):
+
+    def test_render(self):
+        project = Project.objects.get(pk=self.project_id)
+        view = View.objects.first()
+
+        # a large template with many loops
+        view.template = '\n'.join([view.template] * 50)
+        view.save()
+
+        for label in ('cold', 'warm'):
+            with measure('Rendering of a view with a template of %i characters, %s cache' % (len(view.template), label)):
+                view.render(project)
+
+
+class LazyContextTests(ViewsModelTestCase):
+
+    def render_num_queries(self, template):
+        project = Project.objects.get(pk=self.project_id)
+        view = View(key='test', template=template)
+
+        with CaptureQueriesContext(connection) as context:
+            view.render(project)
+
+        return len(context)
+
+    def test_render_conditions(self):
+        project = Project.objects.get(pk=self.project_id)
+        view = View(key='test', template='{% if conditions.text_equal %}yes{% else %}no{% endif %}')
+
+        condition = Condition.objects.get(key='text_equal')
+        self.assertEqual(view.render(project), 'yes' if condition.resolve(project) else 'no')
+
+    def test_render_num_queries(self):
+        template = '{{ values.individual.text }} {% if conditions.text_equal %}{% endif %}'
+        num_queries = self.render_num_queries(template)
+
+        # add conditions and attribute entities which are not used in the template
+        source = Attribute.objects.first()
+        for i in range(20):
+            Condition.objects.create(key='unused_%i' % i, source=source, relation='eq', target_text='unused')
+            AttributeEntity.objects.create(key='unused_%i' % i)
+
+        self.assertEqual(self.render_num_queries(template), num_queries)
+
+        # a template without values and conditions does not need any queries
+        self.assertEqual(self.render_num_queries('<p>no values</p>'), 0)
+
+    def test_conditions_items(self):
+        project = Project.objects.get(pk=self.project_id)
+        conditions = LazyConditions(project)
+
+        # all conditions are fetched in one query and resolved using one query for the values
+        with self.assertNumQueries(2):
+            items = conditions.items()
+
+        results = Condition.resolve_conditions(Condition.objects.all(), project)
+        self.assertEqual(items, [(condition.key, results[condition.id]) for condition in Condition.objects.all()])
+
+    def test_values_tree_duplicate_key(self):
+        project = Project.objects.get(pk=self.project_id)
+        root = AttributeEntity.objects.filter(parent=None).first()
+        AttributeEntity.objects.create(key=root.key)
+
+        # the last tree with this key wins
+        self.assertEqual(LazyValuesTree(project)[root.key], {})
+
+
+class ValuesTreeTestCase(ViewsModelTestCase):
+
+    def create_sets(self, project, count):
+        # create sets for the collection set/collection with the attributes id and text
+        attributes = Attribute.objects.filter(parent__path='set/collection', key__in=['id', 'text'])
+
+        Value.objects.bulk_create([Value(
+            project=project,
+            attribute=attribute,
+            set_index=set_index,
+            collection_index=0,
+            text='%s %i' % (attribute.key, set_index),
+            created=now(),
+            updated=now()
+        ) for set_index in range(count) for attribute in attributes])
+
+
+class ValuesTreeTests(ValuesTreeTestCase):
+
+    def test_values_tree_num_queries(self):
+        view = View(key='test', template='{% for set in values.set.collection %}{{ set.text }};{% endfor %}')
+
+        num_queries = []
+        for count in (10, 100):
+            project = Project.objects.get(pk=self.project_id)
+            project.values.filter(attribute__path__startswith='set/').delete()
+            self.create_sets(project, count)
+
+            with CaptureQueriesContext(connection) as context:
+                html = view.render(project)
+
+            self.assertEqual(html.split(';')[:-1], ['text %i' % i for i in range(count)])
+            num_queries.append(len(context))
+
+        # the number of queries does not depend on the number of sets
+        self.assertEqual(num_queries[0], num_queries[1])
+
+
+@benchmark
+class ValuesTreeBenchmarks(ValuesTreeTestCase):
+
+    set_counts = (10, 100, 1000)
+
+    def test_values_tree(self):
+        view = View(key='test', template='{% for set in values.set.collection %}{{ set.text }};{% endfor %}')
+
+        for count in self.set_counts:
+            project = Project.objects.get(pk=self.project_id)
+            project.values.filter(attribute__path__startswith='set/').delete()
+            self.create_sets(project, count)
+
+            with measure('Values tree for a collection with %i sets' % count):
+                html = view.render(project)
+
+            self.assertEqual(html.split(';')[:-1], ['text %i' % i for i in range(count)])
@@ -0,0 +1,164 @@
+from rdmo.conditions.models import Condition
+from rdmo.domain.models import AttributeEntity
+
+
+class LazyConditions(object):
+    '''
+    Mapping of the condition keys to their results for a project, which is passed to the
+    template of a view. A condition is only resolved when the template accesses it.
+    '''
+
+    def __init__(self, project, snapshot=None):
+        self.project = project
+        self.snapshot = snapshot
+        self.results = {}
+
+    def __getitem__(self, key):
+        if key not in self.results:
+            # for conditions with the same key, the last one (ordered by uri) wins
+            self._resolve(Condition.objects.filter(key=key))
+            if key not in self.results:
+                raise KeyError(key)
+
+        return self.results[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def keys(self):
+        return list(Condition.objects.values_list('key', flat=True))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        # fetch all conditions and resolve the ones which were not accessed yet in one go
+        conditions = list(Condition.objects.all())
+        self._resolve([condition for condition in conditions if condition.key not in self.results])
+
+        return [(condition.key, self.results[condition.key]) for condition in conditions]
+
+    def _resolve(self, conditions):
+        conditions = list(conditions)
+        results = Condition.resolve_conditions(conditions, self.project, self.snapshot)
+        for condition in conditions:
+            self.results[condition.key] = results[condition.id]
+
+
+class LazyValuesTree(object):
+    '''
+    Mapping of the keys of the root attribute entities to the trees of values of a project,
+    which is passed to the template of a view. The tree for a root attribute entity is only
+    built when the template accesses it, using only the entities and values of this tree.
+    '''
+
+    def __init__(self, project, snapshot=None):
+        self.project = project
+        self.snapshot = snapshot
+        self.trees = {}
+
+    def __getitem__(self, key):
+        if key not in self.trees:
+            # for root entities with the same key, the last tree wins, as in the former loop
+            # over AttributeEntity.objects.get_cached_trees()
+            root = AttributeEntity.objects.filter(parent=None, key=key).order_by('-tree_id').first()
+            if root is None:
+                raise KeyError(key)
+
+            self.trees[key] = self._build_tree(root)
+
+        return self.trees[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def keys(self):
+        return list(AttributeEntity.objects.filter(parent=None).values_list('key', flat=True))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def _build_tree(self, root):
+        # get the tree of entities below this root
+        entity_tree = root.get_descendants(include_self=True).get_cached_trees()[0]
+
+        # get the values for this tree in one query and index them by their attribute id and by
+        # (attribute id, set_index), additionally collect the set indexes of the parent collections
+        self.values_dict = {}
+        self.values_index = {}
+        self.set_index_dict = {}
+        set_index_seen = set()
+
+        values = self.project.values.filter(snapshot=self.snapshot, attribute__tree_id=root.tree_id) \
+                                    .select_related('attribute', 'option').order_by('pk')
+
+        for value in values:
+            self.values_dict.setdefault(value.attribute_id, []).append(value)
+            self.values_index.setdefault((value.attribute_id, value.set_index), []).append(value)
+
+            parent_collection_id = value.attribute.parent_collection_id
+            if parent_collection_id and (parent_collection_id, value.set_index) not in set_index_seen:
+                set_index_seen.add((parent_collection_id, value.set_index))
+                self.set_index_dict.setdefault(parent_collection_id, []).append(value.set_index)
+
+        # sort the lists of values once by their collection_index
+        for values_list in list(self.values_dict.values()) + list(self.values_index.values()):
+            values_list.sort(key=lambda value: value.collection_index)
+
+        # construct attribute/values tree from the entity_tree using recursion
+        return self._build_values_tree(entity_tree)
+
+    def _build_values_tree(self, entity_tree_node, set_index=None):
+
+        # check if this node is a collection entity or if the set_index is already set
+        if entity_tree_node.is_collection and not entity_tree_node.is_attribute and set_index is None:
+            node = []
+
+            # loop over the set from the set_index_dict and call the current recursion step again,
+            # but with the set_index set.
+            if entity_tree_node.id in self.set_index_dict:
+                for set_index in self.set_index_dict[entity_tree_node.id]:
+                    node.append(self._build_values_tree(entity_tree_node, set_index))
+
+            # return the list of set sub trees
+            return node
+
+        else:
+            node = {}
+
+            # use mptt's get_children() to walk the tree
+            for child in entity_tree_node.get_children():
+
+                if child.is_attribute:
+                    # for an attribute look up the (already sorted) values for this attribute, either all of them
+                    # (for attributes without parent collection) or the ones for the set_index set further up in the recursion
+                    if set_index is None:
+                        sorted_values = self.values_dict.get(child.id)
+                    else:
+                        sorted_values = self.values_index.get((child.id, set_index))
+
+                    if sorted_values:
+                        node_values = [value.value for value in sorted_values]
+
+                        # flatten the list if it is not a collection and append a the node for this attribute
+                        if child.is_collection:
+                            node[child.key] = node_values
+                        else:
+                            node[child.key] = node_values[0]
+
+                else:
+                    # for an entity proceed with the recursion
+                    node[child.key] = self._build_values_tree(child, set_index)
+
+            return node
@@ -101,3 +101,7 @@ LOGGING = {
         }
     }
 }
+
+# convert exports within the request and without cache, the export jobs and the cache are tested separately
+EXPORT_MAX_WORKERS = 0
+EXPORT_CACHE_MAX_SIZE = 0